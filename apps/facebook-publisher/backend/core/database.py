@@ -1,5 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy import text
 import os
 from dotenv import load_dotenv
 
@@ -19,3 +20,21 @@ class Base(DeclarativeBase):
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+# Migrations SQL idempotentes (colonnes ajoutées après la création de la table)
+MIGRATIONS = [
+    "ALTER TABLE video_jobs ADD COLUMN IF NOT EXISTS request JSON",
+    "ALTER TABLE video_jobs ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0",
+    "ALTER TABLE video_jobs ADD COLUMN IF NOT EXISTS locked_by VARCHAR",
+    "ALTER TABLE video_jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP",
+    "ALTER TABLE video_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP",
+]
+
+async def init_db():
+    """Tables + migrations (API et worker au démarrage)."""
+    # IMPORTANT — importer les modèles AVANT create_all
+    import models.db_video  # noqa: F401
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for sql in MIGRATIONS:
+            await conn.execute(text(sql))
@@ -4,10 +4,7 @@ from fastapi.staticfiles import StaticFiles
 from routes.generate import router as generate_router
 from routes.video import router as video_router
 from routes.publish import router as publish_router
-from core.database import engine, Base
-
-# IMPORTANT — importer les modèles AVANT create_all
-import models.db_video  # noqa: F401
+from core.database import init_db
 
 import os
 
@@ -23,8 +20,7 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await init_db()
     print("✅ Tables créées avec succès")
 
 app.include_router(generate_router, prefix="/api", tags=["Génération"])
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Text
+from sqlalchemy import Column, String, Integer, DateTime, Text, JSON
 from sqlalchemy.dialects.postgresql import ARRAY
 from core.database import Base
 from datetime import datetime
@@ -16,5 +16,12 @@ class VideoJob(Base):
     tags        = Column(ARRAY(String), nullable=True)
     format      = Column(String, nullable=True)
     duration    = Column(String, nullable=True)
+    request     = Column(JSON, nullable=True)       # VideoGenerationRequest sérialisée
+
+    # File d'attente (worker.py) — bail renouvelé par heartbeat
+    attempts         = Column(Integer, default=0)
+    locked_by        = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at     = Column(DateTime, nullable=True)
     created_at  = Column(DateTime, default=datetime.utcnow)
     updated_at  = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from models.video import PublishRequest
+from services.retention_service import find_video_file
 import httpx, os
 from dotenv import load_dotenv
 
@@ -9,14 +10,12 @@ router = APIRouter()
 
 N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL")
 BASE_URL = os.getenv("BASE_URL", "https://api.facebook.sterveshop.cloud")
-STORAGE_PATH = "/app/storage"
 
 @router.post("/publish")
 async def publish_to_tiktok(request: PublishRequest):
     """Déclenche le webhook n8n pour publier sur TikTok"""
 
-    video_path = f"{STORAGE_PATH}/videos/{request.video_id}.mp4"
-    if not os.path.exists(video_path):
+    if not find_video_file(request.video_id):
         raise HTTPException(status_code=404, detail="Vidéo introuvable")
 
     payload = {
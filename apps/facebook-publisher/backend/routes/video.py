@@ -1,5 +1,6 @@
-from fastapi import APIRouter
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
+from services.retention_service import run_retention, find_video_file
+from shared.file_response import ranged_file_response
 import os
 
 router = APIRouter()
@@ -7,26 +8,20 @@ router = APIRouter()
 STORAGE_PATH = "/app/storage"
 
 @router.get("/videos/{video_id}.mp4")
-async def stream_video(video_id: str):
-    """Sert le fichier vidéo généré"""
-    path = f"{STORAGE_PATH}/videos/{video_id}.mp4"
-    if not os.path.exists(path):
-        from fastapi import HTTPException
+async def stream_video(video_id: str, request: Request):
+    """Sert le fichier vidéo généré (Range → 206, ETag / If-None-Match → 304)"""
+    path = find_video_file(video_id)
+    if not path:
         raise HTTPException(status_code=404, detail="Vidéo introuvable")
-    return FileResponse(path, media_type="video/mp4")
+    return ranged_file_response(request, path, "video/mp4")
 
 @router.get("/download/{video_id}")
-async def download_video(video_id: str):
-    """Téléchargement forcé de la vidéo"""
-    path = f"{STORAGE_PATH}/videos/{video_id}.mp4"
-    if not os.path.exists(path):
-        from fastapi import HTTPException
+async def download_video(video_id: str, request: Request):
+    """Téléchargement forcé de la vidéo (reprise possible via Range)"""
+    path = find_video_file(video_id)
+    if not path:
         raise HTTPException(status_code=404, detail="Vidéo introuvable")
-    return FileResponse(
-        path,
-        media_type="video/mp4",
-        headers={"Content-Disposition": f"attachment; filename=tiktok-{video_id}.mp4"}
-    )
+    return ranged_file_response(request, path, "video/mp4", filename=f"tiktok-{video_id}.mp4")
 
 @router.get("/list")
 async def list_videos():
@@ -36,3 +31,19 @@ async def list_videos():
         return {"videos": []}
     files = [f for f in os.listdir(videos_dir) if f.endswith(".mp4")]
     return {"videos": files, "count": len(files)}
+
+@router.get("/retention")
+async def retention_report():
+    """Simulation de la rétention : fichiers qui seraient supprimés / archivés, orphelins, volume par dossier"""
+    report = await run_retention(dry_run=True)
+    if report is None:
+        raise HTTPException(status_code=409, detail="Passe de rétention déjà en cours")
+    return report
+
+@router.post("/retention")
+async def retention_run(dry_run: bool = False):
+    """Lance une passe de rétention immédiatement"""
+    report = await run_retention(dry_run=dry_run)
+    if report is None:
+        raise HTTPException(status_code=409, detail="Passe de rétention déjà en cours")
+    return report
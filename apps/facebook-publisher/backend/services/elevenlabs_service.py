@@ -1,16 +1,34 @@
 import os
 import httpx
-import aiofiles
 from dotenv import load_dotenv
+from shared.tts_cache import TTSCache, write_atomic
 
 load_dotenv()
 
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "pNInz6obpgDQGcFmaJgB")  # Adam par défaut
+MODEL_ID = "eleven_multilingual_v2"
+VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75,
+    "style": 0.4,
+    "use_speaker_boost": True
+}
+
+# Cache disque des voix off déjà générées (TTS_CACHE_MAX_MB=0 pour désactiver)
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "/app/storage/tts_cache")
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "1024"))
+tts_cache = TTSCache(TTS_CACHE_DIR, TTS_CACHE_MAX_MB * 1024 * 1024) if TTS_CACHE_MAX_MB > 0 else None
+
 
 async def generate_voiceover(script: str, output_path: str) -> str:
     """Génère la voix off via ElevenLabs et sauvegarde en MP3"""
 
+    cache_key = TTSCache.make_key(script, VOICE_ID, MODEL_ID, VOICE_SETTINGS)
+    if tts_cache and tts_cache.materialize(cache_key, output_path):
+        print(f"[elevenlabs] Voix off servie depuis le cache ({tts_cache.stats()['hits']} hits)")
+        return output_path
+
     url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}"
 
     headers = {
@@ -20,20 +38,18 @@ async def generate_voiceover(script: str, output_path: str) -> str:
 
     payload = {
         "text": script,
-        "model_id": "eleven_multilingual_v2",
-        "voice_settings": {
-            "stability": 0.5,
-            "similarity_boost": 0.75,
-            "style": 0.4,
-            "use_speaker_boost": True
-        }
+        "model_id": MODEL_ID,
+        "voice_settings": VOICE_SETTINGS
     }
 
     async with httpx.AsyncClient(timeout=60.0) as client:
         response = await client.post(url, headers=headers, json=payload)
         response.raise_for_status()
 
-        async with aiofiles.open(output_path, "wb") as f:
-            await f.write(response.content)
+        # Remplacement atomique : output_path peut être un lien vers une autre entrée du cache
+        if tts_cache:
+            tts_cache.store(cache_key, response.content, output_path)
+        else:
+            write_atomic(output_path, response.content)
 
     return output_path
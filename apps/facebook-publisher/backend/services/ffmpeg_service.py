@@ -1,33 +1,37 @@
 import asyncio
 import os
 import random
-import subprocess
+from shared.encode_scheduler import EncodeScheduler
+from shared.mediaprobe import probe_duration
+from shared.stills import StillCache, ken_burns_loop_filter
 
 MUSIC_DIR = "/app/storage/music"
 MUSIC_VOLUME = 0.15
 
+# Tous les processus FFmpeg / Remotion du processus passent par cet ordonnanceur
+# (slots = cœurs disponibles // FFMPEG_THREADS, FFMPEG_SLOTS > 0 pour forcer)
+encoder = EncodeScheduler(
+    threads=int(os.getenv("FFMPEG_THREADS", "2")),
+    slots=int(os.getenv("FFMPEG_SLOTS", "0")),
+    nice=int(os.getenv("FFMPEG_NICE", "10")),
+)
+
+# Images pré-redimensionnées une seule fois à la résolution de travail Ken Burns (1188x2112)
+still_cache = StillCache(
+    os.getenv("STILLS_CACHE_DIR", "/app/storage/cache/stills"),
+    int(os.getenv("STILLS_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    workers=int(os.getenv("STILLS_WORKERS", "2")),
+)
+
 
 async def run_ffmpeg(cmd: list) -> tuple[int, str, str]:
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await process.communicate()
-    return process.returncode, stdout.decode(), stderr.decode()
-
-
-def get_media_duration(path: str) -> float:
-    result = subprocess.run([
-        "ffprobe", "-v", "quiet",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        path
-    ], capture_output=True, text=True)
-    try:
-        return float(result.stdout.strip())
-    except:
-        return 8.0
+    returncode, stdout, stderr = await encoder.run(cmd)
+    return returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+
+async def get_media_duration(path: str) -> float:
+    """Durée via la sonde pur Python (ffprobe asynchrone en dernier recours) — 8s si illisible."""
+    return await probe_duration(path, default=8.0)
 
 
 def escape_srt_path(path: str) -> str:
@@ -120,7 +124,7 @@ async def merge_clips_with_subtitles(
     print(f"[ffmpeg-veo3] Assemblage de {len(clip_paths)} clips...")
 
     # Calculer la durée réelle totale des clips
-    total_clip_duration = sum(get_media_duration(p) for p in clip_paths)
+    total_clip_duration = sum(await asyncio.gather(*[get_media_duration(p) for p in clip_paths]))
     final_duration = min(total_clip_duration, float(target_duration) + 5.0)
 
     # ── Étape 1 : Normaliser chaque clip ─────────────────────────────────────
@@ -207,7 +211,7 @@ async def add_subtitles_to_video(
 ) -> str:
     """Ajoute des sous-titres sur une vidéo existante sans toucher à l'audio."""
 
-    video_duration = get_media_duration(video_path)
+    video_duration = await get_media_duration(video_path)
     final_duration = min(video_duration, float(duration) + 2.0)
 
     srt_path = output_path.replace(".mp4", ".srt")
@@ -242,7 +246,7 @@ async def assemble_video(
 ) -> str:
     """Assemble audio + visuels images + musique + sous-titres en MP4 1080x1920"""
 
-    audio_duration = get_media_duration(audio_path)
+    audio_duration = await get_media_duration(audio_path)
     final_duration = min(audio_duration, float(duration) + 1.0)
 
     srt_path = output_path.replace(".mp4", ".srt")
@@ -337,22 +341,25 @@ async def _assemble_multi_image(
     transition_dur = 0.5
     seg_duration = final_duration / n
 
+    # Décodage + redimensionnement 1188x2112 une seule fois par image (pool Pillow)
+    stills = await asyncio.gather(*[still_cache.prescale(p, 1188, 2112) for p in image_paths])
+
     segment_paths = []
-    for i, img_path in enumerate(image_paths):
+    for i, still_path in enumerate(stills):
         seg_path = output_path.replace(".mp4", f"_seg{i}.mp4")
         seg_frames = int(seg_duration * fps)
         y_expr = f"(2112-1920)*n/{seg_frames}" if i % 2 == 0 else f"(2112-1920)*(1-n/{seg_frames})"
 
+        # Image décodée une fois et répétée en mémoire : seul le crop est calculé par frame
         vf_seg = ",".join([
-            "scale=1188:2112:force_original_aspect_ratio=increase",
-            "crop=1188:2112",
+            ken_burns_loop_filter(fps),
             f"crop=1080:1920:x='(1188-1080)/2':y='{y_expr}'",
             "setsar=1"
         ])
         cmd_seg = [
-            "ffmpeg", "-y", "-loop", "1", "-framerate", str(fps),
-            "-i", img_path, "-vf", vf_seg,
-            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "18",
+            "ffmpeg", "-y",
+            "-i", still_path, "-vf", vf_seg,
+            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "18", "-pix_fmt", "yuv420p",
             "-t", str(seg_duration), "-r", str(fps), "-an", seg_path
         ]
         rc, _, stderr = await run_ffmpeg(cmd_seg)
@@ -380,7 +387,7 @@ async def _assemble_multi_image(
             "ffmpeg", "-y", *inputs,
             "-filter_complex", ";".join(filter_parts),
             "-map", "[vout]",
-            "-c:v", "libx264", "-preset", "fast", "-crf", "23",
+            "-c:v", "libx264", "-preset", "fast", "-crf", "23", "-pix_fmt", "yuv420p",
             "-r", str(fps), merged_path
         ]
         rc, _, stderr = await run_ffmpeg(cmd_merge)
@@ -397,7 +404,7 @@ async def _assemble_multi_image(
     else:
         cmd_final += ["-map", "0:v", "-map", "1:a"]
     cmd_final += [
-        "-c:v", "libx264", "-preset", "fast", "-crf", "23",
+        "-c:v", "libx264", "-preset", "fast", "-crf", "23", "-pix_fmt", "yuv420p",
         "-c:a", "aac", "-b:a", "128k",
         "-t", str(final_duration), "-movflags", "+faststart", output_path
     ]
@@ -0,0 +1,127 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, and_, or_
+from core.database import AsyncSessionLocal
+from models.db_video import VideoJob
+
+# File d'attente des vidéos = table video_jobs (SELECT … FOR UPDATE SKIP LOCKED)
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+async def create_video_job(video_id: str, request: dict) -> VideoJob:
+    async with AsyncSessionLocal() as session:
+        job = VideoJob(
+            video_id=video_id,
+            status="pending",
+            progress=0,
+            message="En attente...",
+            script=request.get("script"),
+            description=request.get("description"),
+            tags=request.get("tags"),
+            format=request.get("format"),
+            duration=request.get("duration"),
+            request=request,
+            attempts=0,
+        )
+        session.add(job)
+        await session.commit()
+        return job
+
+
+async def get_video_job(video_id: str) -> VideoJob | None:
+    async with AsyncSessionLocal() as session:
+        return await session.get(VideoJob, video_id)
+
+
+async def update_video_job(video_id: str, worker_id: str | None = None, **fields) -> bool:
+    """
+    Met à jour statut / progression (visible par GET /status/{video_id}).
+    worker_id : seulement si ce worker détient encore le bail (un job repris ailleurs
+    après expiration n'est pas écrasé). False si rien n'a été mis à jour.
+    """
+    fields["updated_at"] = datetime.utcnow()
+    query = update(VideoJob).where(VideoJob.video_id == video_id)
+    if worker_id is not None:
+        query = query.where(VideoJob.locked_by == worker_id)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(query.values(**fields))
+        await session.commit()
+        return result.rowcount == 1
+
+
+async def claim_video_job(worker_id: str) -> VideoJob | None:
+    """
+    Prend le prochain job : en attente, ou en cours avec un bail expiré (worker perdu).
+    Les jobs ayant épuisé leurs tentatives passent en erreur.
+    """
+    async with AsyncSessionLocal() as session:
+        while True:
+            now = datetime.utcnow()
+            result = await session.execute(
+                select(VideoJob)
+                .where(or_(
+                    VideoJob.status == "pending",
+                    and_(VideoJob.status == "processing", VideoJob.lease_expires_at < now),
+                ))
+                .order_by(VideoJob.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            job = result.scalar_one_or_none()
+            if not job:
+                await session.rollback()
+                return None
+
+            if job.status == "processing":
+                print(f"[queue] Job {job.video_id} — bail expiré (worker {job.locked_by}), reprise")
+
+            if (job.attempts or 0) >= JOB_MAX_ATTEMPTS:
+                job.status = "error"
+                job.message = f"Abandon après {job.attempts} tentatives (worker perdu)"
+                job.progress = 0
+                job.locked_by = None
+                job.lease_expires_at = None
+                await session.commit()
+                print(f"[queue] Job {job.video_id} abandonné")
+                continue
+
+            job.status = "processing"
+            job.attempts = (job.attempts or 0) + 1
+            job.locked_by = worker_id
+            job.heartbeat_at = now
+            job.lease_expires_at = now + timedelta(seconds=JOB_LEASE_SECONDS)
+            job.updated_at = now
+            await session.commit()
+            return job
+
+
+async def heartbeat_video_job(video_id: str, worker_id: str) -> bool:
+    """Prolonge le bail. False si le job a été repris par un autre worker."""
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(VideoJob)
+            .where(
+                VideoJob.video_id == video_id,
+                VideoJob.locked_by == worker_id,
+                VideoJob.status == "processing",
+            )
+            .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=JOB_LEASE_SECONDS))
+        )
+        await session.commit()
+        return result.rowcount == 1
+
+
+async def release_video_job(video_id: str, worker_id: str) -> None:
+    """Remet en attente un job interrompu par l'arrêt du worker (tentative non comptée)."""
+    async with AsyncSessionLocal() as session:
+        job = await session.get(VideoJob, video_id, with_for_update=True)
+        if not job or job.locked_by != worker_id or job.status != "processing":
+            return
+        job.status = "pending"
+        job.attempts = max((job.attempts or 1) - 1, 0)
+        job.locked_by = None
+        job.lease_expires_at = None
+        job.message = "En attente (reprise)..."
+        await session.commit()
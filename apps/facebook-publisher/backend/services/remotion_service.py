@@ -1,7 +1,7 @@
-import asyncio
 import json
 import os
 import random
+from services.ffmpeg_service import encoder
 
 REMOTION_DIR = "/app/remotion"
 OUTPUT_DIR = "/app/storage/videos"
@@ -76,15 +76,10 @@ async def render_video(
         "error",
     ]
 
-    proc = await asyncio.create_subprocess_exec(
-        *cmd,
-        cwd=REMOTION_DIR,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-    stdout, stderr = await proc.communicate()
+    # Rendu Chromium + encodage : occupe un slot de l'ordonnanceur comme un encodage FFmpeg
+    returncode, stdout, stderr = await encoder.run(cmd, cwd=REMOTION_DIR)
 
-    if proc.returncode != 0:
+    if returncode != 0:
         raise RuntimeError(f"Remotion render failed:\n{stderr.decode()}")
 
     return output_path
@@ -0,0 +1,69 @@
+import os
+import asyncio
+from sqlalchemy import select
+from core.database import AsyncSessionLocal
+from models.db_video import VideoJob
+from shared.retention import RetentionEngine, RetentionPolicy, REPORT_MAX_ACTIONS
+
+STORAGE_PATH = "/app/storage"
+
+# Rétention des fichiers générés (passe périodique du worker)
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "true").lower() == "true"
+RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "6"))
+RETENTION_DONE_HOURS = float(os.getenv("RETENTION_DONE_HOURS", "24"))   # voix off / images / temp après la vidéo
+RETENTION_FAILED_DAYS = int(os.getenv("RETENTION_FAILED_DAYS", "7"))
+RETENTION_ARCHIVE_DAYS = int(os.getenv("RETENTION_ARCHIVE_DAYS", "30"))  # 0 = jamais
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", f"{STORAGE_PATH}/archive")
+RETENTION_ORPHAN_HOURS = float(os.getenv("RETENTION_ORPHAN_HOURS", "24"))
+
+OWNER = r"(?P<owner>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+
+# Intermédiaires : inutiles une fois la vidéo prête, gardés quelques jours après une erreur
+_scratch = {"done": RETENTION_DONE_HOURS, "error": RETENTION_FAILED_DAYS * 24}
+
+engine = RetentionEngine(
+    [
+        RetentionPolicy("audio", f"{STORAGE_PATH}/audio", rf"{OWNER}\.mp3", expire_after=_scratch),
+        RetentionPolicy("images", f"{STORAGE_PATH}/images", rf"{OWNER}_img_\d+\.jpg", expire_after=_scratch),
+        RetentionPolicy("temp", f"{STORAGE_PATH}/temp", OWNER, expire_after=_scratch),
+        # Vidéos finales : déplacées vers le stockage froid (toujours servies via find_video_file)
+        RetentionPolicy(
+            "videos", f"{STORAGE_PATH}/videos", rf"{OWNER}\.mp4", action="archive",
+            expire_after={"done": RETENTION_ARCHIVE_DAYS * 24} if RETENTION_ARCHIVE_DAYS > 0 else {},
+        ),
+    ],
+    archive_dir=RETENTION_ARCHIVE_DIR,
+    orphan_grace_hours=RETENTION_ORPHAN_HOURS,
+    lock_path=f"{STORAGE_PATH}/temp/.retention.lock",
+)
+
+
+def find_video_file(video_id: str) -> str | None:
+    """Chemin de la vidéo finale : stockage courant, sinon archive froide. None si absente."""
+    for path in (
+        f"{STORAGE_PATH}/videos/{video_id}.mp4",
+        os.path.join(RETENTION_ARCHIVE_DIR, "videos", f"{video_id}.mp4"),
+    ):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+async def run_retention(dry_run: bool = False) -> dict | None:
+    """Passe de rétention sur /app/storage (statuts lus dans video_jobs). None si une passe est en cours."""
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(select(VideoJob.video_id, VideoJob.status))).all()
+    owners = {video_id: status for video_id, status in rows}
+
+    report = await asyncio.to_thread(engine.run, owners, None, dry_run)
+    if report is None:
+        return None
+    if not dry_run:
+        print(
+            f"[retention] {len(report['actions'])} action(s) — "
+            f"{report['freed_bytes'] // (1024 * 1024)} Mo libérés, "
+            f"{report['archived_bytes'] // (1024 * 1024)} Mo archivés"
+        )
+    report["actions_total"] = len(report["actions"])
+    report["actions"] = report["actions"][:REPORT_MAX_ACTIONS]
+    return report
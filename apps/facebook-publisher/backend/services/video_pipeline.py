@@ -0,0 +1,130 @@
+from models.video import VideoGenerationRequest
+from services.elevenlabs_service import generate_voiceover
+from services.kieai_service import generate_multiple_images, generate_video_veo3
+from services.ffmpeg_service import assemble_video, merge_clips_with_subtitles
+from services.job_queue import update_video_job
+import os
+
+STORAGE_PATH = "/app/storage"
+
+IMAGES_BY_DURATION = {
+    "15": 2,
+    "30": 3,
+    "60": 5,
+}
+
+# Veo3 génère ~8s par clip — nombre de clips selon durée souhaitée
+CLIPS_BY_DURATION = {
+    "15": 2,   # 2 clips ~8s = ~16s
+    "30": 4,   # 4 clips ~8s = ~32s
+    "60": 8,   # 8 clips ~8s = ~64s
+}
+
+
+async def process_video(video_id: str, request: VideoGenerationRequest, worker_id: str | None = None):
+    """
+    Pipeline complet de génération vidéo (progression persistée dans video_jobs).
+    worker_id : écritures conditionnées au bail de ce worker (None hors file).
+    """
+    duration = int(request.duration)
+
+    async def update_job(**fields) -> bool:
+        return await update_video_job(video_id, worker_id=worker_id, **fields)
+
+    try:
+        temp_dir = f"{STORAGE_PATH}/temp/{video_id}"
+        os.makedirs(temp_dir, exist_ok=True)
+        os.makedirs(f"{STORAGE_PATH}/audio", exist_ok=True)
+        os.makedirs(f"{STORAGE_PATH}/images", exist_ok=True)
+        os.makedirs(f"{STORAGE_PATH}/videos", exist_ok=True)
+
+        output_path = f"{STORAGE_PATH}/videos/{video_id}.mp4"
+
+        if request.format == "video_ia":
+            # ── VEO3 — génération multi-clips pour atteindre la durée voulue ─
+            nb_clips = CLIPS_BY_DURATION.get(request.duration, 2)
+
+            # Diviser le script en segments pour chaque clip
+            script_words = request.script.split()
+            words_per_clip = max(1, len(script_words) // nb_clips)
+            script_segments = []
+            for i in range(nb_clips):
+                start = i * words_per_clip
+                end = start + words_per_clip if i < nb_clips - 1 else len(script_words)
+                segment = " ".join(script_words[start:end])
+                script_segments.append(segment)
+
+            print(f"[pipeline] Veo3 — {nb_clips} clips × ~8s = ~{nb_clips * 8}s")
+
+            clip_paths = []
+            for i in range(nb_clips):
+                await update_job(
+                    progress=10 + int((i / nb_clips) * 65),
+                    message=f"Génération clip {i+1}/{nb_clips} (Veo3)...",
+                )
+
+                clip_path = os.path.join(temp_dir, f"{video_id}_clip_{i}.mp4")
+
+                await generate_video_veo3(
+                    prompt="",  # Le prompt est construit dans generate_video_veo3
+                    script=script_segments[i],
+                    output_path=clip_path,
+                    aspect_ratio="9:16",
+                    model="veo3_fast"
+                )
+                clip_paths.append(clip_path)
+                print(f"[pipeline] Clip {i+1}/{nb_clips} prêt")
+
+            # ── Assembler les clips + sous-titres ────────────────────────────
+            await update_job(progress=80, message="Assemblage des clips + sous-titres...")
+
+            await merge_clips_with_subtitles(
+                clip_paths=clip_paths,
+                captions=request.captions,
+                output_path=output_path,
+                target_duration=duration
+            )
+
+        else:
+            # ── Format standard — images Ken Burns + voix ElevenLabs ─────────
+            audio_path = f"{STORAGE_PATH}/audio/{video_id}.mp3"
+
+            await update_job(progress=10, message="Génération de la voix off...")
+            await generate_voiceover(request.script, audio_path)
+
+            nb_images = IMAGES_BY_DURATION.get(request.duration, 3)
+            await update_job(progress=30, message=f"Génération de {nb_images} visuels IA...")
+
+            visual_prompt = (
+                f"Cinematic vertical 9:16, {request.hook}, "
+                "African wellness aesthetic, natural herbs honey ginger, "
+                "warm golden tones, dramatic lighting, no text, no watermark"
+            )
+
+            image_paths = await generate_multiple_images(
+                base_prompt=visual_prompt,
+                output_dir=f"{STORAGE_PATH}/images",
+                video_id=video_id,
+                count=nb_images,
+            )
+
+            await update_job(progress=70, message="Assemblage vidéo + transitions + sous-titres...")
+            await assemble_video(audio_path, image_paths, request.captions, output_path, duration)
+
+        # ── Done ──────────────────────────────────────────────────────────────
+        applied = await update_job(
+            status="done",
+            progress=100,
+            message="Vidéo prête !",
+            video_url=f"/videos/{video_id}.mp4",
+            lease_expires_at=None,
+        )
+        if applied:
+            print(f"[pipeline] Terminé: {output_path}")
+        else:
+            print(f"[pipeline] {video_id} repris par un autre worker, résultat ignoré")
+
+    except Exception as e:
+        if not await update_job(status="error", message=str(e), progress=0, lease_expires_at=None):
+            print(f"[pipeline] {video_id} repris par un autre worker, erreur ignorée")
+        print(f"[pipeline] Erreur: {e}")
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+Worker de génération vidéo : consomme la table video_jobs.
+
+    python worker.py
+
+Plusieurs workers peuvent tourner en parallèle (SKIP LOCKED) ; un job dont le
+worker disparaît est repris à l'expiration de son bail.
+"""
+import os
+import socket
+import time
+import signal
+import asyncio
+from core.database import init_db
+from models.video import VideoGenerationRequest
+from services.job_queue import claim_video_job, heartbeat_video_job, release_video_job, update_video_job
+from services.video_pipeline import process_video
+from services.retention_service import RETENTION_ENABLED, RETENTION_INTERVAL_HOURS, run_retention
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+WORKER_SHUTDOWN_TIMEOUT = int(os.getenv("WORKER_SHUTDOWN_TIMEOUT", "25"))
+
+
+async def heartbeat(video_id: str, task: asyncio.Task):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            alive = await heartbeat_video_job(video_id, WORKER_ID)
+        except Exception as e:
+            print(f"[worker] Heartbeat {video_id} échoué : {e}")
+            continue
+        if not alive:
+            print(f"[worker] Job {video_id} repris par un autre worker, arrêt local")
+            task.cancel()
+            return
+
+
+async def run_job(video_id: str, request: dict | None):
+    print(f"[worker] ▶ Job {video_id}")
+    try:
+        # Jobs créés avant la file : requête non persistée (request NULL), rien à relancer
+        if not request:
+            raise ValueError("requête de génération absente (job antérieur à la file)")
+        generation = VideoGenerationRequest(**request)
+    except Exception as e:
+        await update_video_job(
+            video_id, worker_id=WORKER_ID, status="error", progress=0,
+            message=f"Job non relançable : {e}", lease_expires_at=None,
+        )
+        print(f"[worker] Job {video_id} invalide : {e}")
+        return
+
+    task = asyncio.create_task(process_video(video_id, generation, WORKER_ID))
+    beat = asyncio.create_task(heartbeat(video_id, task))
+    try:
+        await task
+        print(f"[worker] Job {video_id} terminé")
+    except asyncio.CancelledError:
+        await release_video_job(video_id, WORKER_ID)
+    finally:
+        beat.cancel()
+
+
+async def retention_pass():
+    try:
+        await run_retention()
+    except Exception as e:
+        print(f"[worker] Passe de rétention échouée : {e}")
+
+
+async def main():
+    await init_db()
+    print(f"[worker] {WORKER_ID} démarré (concurrence {WORKER_CONCURRENCY})")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    running: set[asyncio.Task] = set()
+    last_retention = None
+    retention_task = None
+    while not stop.is_set():
+        # Rétention périodique (verrou partagé entre workers sur /app/storage)
+        if (
+            RETENTION_ENABLED
+            and (last_retention is None or time.monotonic() - last_retention > RETENTION_INTERVAL_HOURS * 3600)
+            and (retention_task is None or retention_task.done())
+        ):
+            last_retention = time.monotonic()
+            retention_task = asyncio.create_task(retention_pass())
+
+        job = None
+        if len(running) < WORKER_CONCURRENCY:
+            try:
+                claimed = await claim_video_job(WORKER_ID)
+                if claimed:
+                    job = (claimed.video_id, claimed.request)
+            except Exception as e:
+                print(f"[worker] Lecture de la file échouée : {e}")
+
+        if job:
+            task = asyncio.create_task(run_job(*job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            continue
+
+        waiters = [asyncio.create_task(stop.wait()), *running]
+        await asyncio.wait(waiters, timeout=JOB_POLL_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+        waiters[0].cancel()
+
+    if running:
+        print(f"[worker] Arrêt — attente de {len(running)} job(s) ({WORKER_SHUTDOWN_TIMEOUT}s max)")
+        _, pending = await asyncio.wait(running, timeout=WORKER_SHUTDOWN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    print(f"[worker] {WORKER_ID} arrêté")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,97 +1,58 @@
-"""KIE API client — wraps Nano Banana 2 and Kling 2.6."""
+"""KIE API client — wraps Nano Banana 2 and Kling 2.6 (shared pooled client)."""
 import os
-import httpx
-from typing import Optional
+from shared.kie import get_client
 
-KIE_BASE = "https://api.kie.ai"
-
-def _headers() -> dict:
-    key = os.getenv("KIE_API_KEY", "")
-    return {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+# One pooled HTTP/2 client per process, rate-limited per API key
+_client = get_client(os.getenv("KIE_API_KEY", ""))
 
 
 async def create_image_text(prompt: str, aspect_ratio: str = "16:9", resolution: str = "2K") -> str:
     """Nano Banana 2 — text to image. Returns taskId."""
-    payload = {
-        "model": "nano-banana-2",
-        "input": {
-            "prompt": prompt,
-            "aspect_ratio": aspect_ratio,
-            "resolution": resolution,
-            "output_format": "jpg",
-        },
-    }
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.post(f"{KIE_BASE}/api/v1/jobs/createTask", json=payload, headers=_headers())
-        r.raise_for_status()
-        data = r.json()
-        if data.get("code") != 200:
-            raise ValueError(f"KIE error: {data.get('msg')}")
-        return data["data"]["taskId"]
+    return await _client.create_task("nano-banana-2", {
+        "prompt": prompt,
+        "aspect_ratio": aspect_ratio,
+        "resolution": resolution,
+        "output_format": "jpg",
+    })
 
 
 async def create_image_from_image(prompt: str, image_urls: list[str], aspect_ratio: str = "16:9", resolution: str = "2K") -> str:
     """Nano Banana 2 — image to image. Returns taskId."""
-    payload = {
-        "model": "nano-banana-2",
-        "input": {
-            "prompt": prompt,
-            "image_input": image_urls,
-            "aspect_ratio": aspect_ratio,
-            "resolution": resolution,
-            "output_format": "jpg",
-        },
-    }
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.post(f"{KIE_BASE}/api/v1/jobs/createTask", json=payload, headers=_headers())
-        r.raise_for_status()
-        data = r.json()
-        if data.get("code") != 200:
-            raise ValueError(f"KIE error: {data.get('msg')}")
-        return data["data"]["taskId"]
+    return await _client.create_task("nano-banana-2", {
+        "prompt": prompt,
+        "image_input": image_urls,
+        "aspect_ratio": aspect_ratio,
+        "resolution": resolution,
+        "output_format": "jpg",
+    })
 
 
 async def create_animation(image_url: str, prompt: str, duration: str = "5") -> str:
     """Kling 2.6 — image to video. Returns taskId."""
-    payload = {
-        "model": "kling-2.6/image-to-video",
-        "input": {
-            "prompt": prompt,
-            "image_urls": [image_url],
-            "sound": False,
-            "duration": duration,
-        },
-    }
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.post(f"{KIE_BASE}/api/v1/jobs/createTask", json=payload, headers=_headers())
-        r.raise_for_status()
-        data = r.json()
-        if data.get("code") != 200:
-            raise ValueError(f"KIE error: {data.get('msg')}")
-        return data["data"]["taskId"]
+    return await _client.create_task("kling-2.6/image-to-video", {
+        "prompt": prompt,
+        "image_urls": [image_url],
+        "sound": False,
+        "duration": duration,
+    })
 
 
 async def poll_task(task_id: str) -> dict:
-    """Poll task status. Returns dict with state + resultUrls if done."""
-    async with httpx.AsyncClient(timeout=15) as client:
-        r = await client.get(
-            f"{KIE_BASE}/api/v1/jobs/recordInfo",
-            params={"taskId": task_id},
-            headers=_headers(),
-        )
-        r.raise_for_status()
-        data = r.json()
-        if data.get("code") != 200:
-            raise ValueError(f"KIE poll error: {data.get('msg')}")
-        task = data["data"]
-        state = task.get("state", "waiting")
-        result_urls = []
-        if state == "success" and task.get("resultJson"):
-            import json
-            result = json.loads(task["resultJson"])
-            result_urls = result.get("resultUrls", [])
-        return {
-            "state": state,
-            "result_urls": result_urls,
-            "fail_msg": task.get("failMsg", ""),
-        }
+    """Poll task status once. Returns dict with state + resultUrls if done."""
+    result = await _client.record(task_id)
+    state = result.record.get("state", "waiting")
+    return {
+        "state": "fail" if result.state == "fail" else state,
+        "result_urls": result.urls,
+        "fail_msg": result.error or "",
+    }
+
+
+async def wait_task(task_id: str, model: str, timeout: int = 600) -> str:
+    """Wait for a task on the shared poll multiplexer. Returns first result URL."""
+    result = await _client.wait(task_id, model=model, timeout=timeout)
+    return result.urls[0]
+
+
+def stats() -> dict:
+    return _client.stats()
@@ -1,7 +1,6 @@
 """Sterve Studio — FastAPI backend proxy for KIE AI."""
 import os
 import uuid
-import asyncio
 import shutil
 from pathlib import Path
 from typing import Optional
@@ -140,15 +139,15 @@ async def _run_before_after(job_id: str, req: BeforeAfterRequest):
         db.update_job(job_id, "step2_apres")
 
         # Poll both until success
-        url_avant = await _poll_until_done(task_avant, timeout=600)
-        url_apres = await _poll_until_done(task_apres, timeout=600)
+        url_avant = await _poll_until_done(task_avant, "nano-banana-2", timeout=600)
+        url_apres = await _poll_until_done(task_apres, "nano-banana-2", timeout=600)
 
         # Step 3 — Animate the "après" image with Kling
         db.update_job(job_id, "step3_animate")
         task_video = await kie.create_animation(url_apres, req.animate_prompt, req.duration)
 
         # Poll animation
-        url_video = await _poll_until_done(task_video, timeout=600)
+        url_video = await _poll_until_done(task_video, "kling-2.6/image-to-video", timeout=600)
 
         # Done — store avant image + video as results
         db.update_job(job_id, "success", result_urls=[url_avant, url_apres, url_video])
@@ -157,23 +156,9 @@ async def _run_before_after(job_id: str, req: BeforeAfterRequest):
         db.update_job(job_id, "failed", fail_msg=str(e))
 
 
-async def _poll_until_done(task_id: str, timeout: int = 600) -> str:
-    """Poll KIE until success or timeout. Returns first result URL."""
-    elapsed = 0
-    interval = 4
-    while elapsed < timeout:
-        await asyncio.sleep(interval)
-        result = await kie.poll_task(task_id)
-        if result["state"] == "success":
-            urls = result["result_urls"]
-            if not urls:
-                raise ValueError(f"Task {task_id} succeeded but no result URL")
-            return urls[0]
-        if result["state"] == "fail":
-            raise ValueError(f"Task {task_id} failed: {result['fail_msg']}")
-        elapsed += interval
-        interval = min(interval + 2, 10)  # exponential backoff up to 10s
-    raise ValueError(f"Task {task_id} timed out after {timeout}s")
+async def _poll_until_done(task_id: str, model: str, timeout: int = 600) -> str:
+    """Wait for a KIE task (shared poll multiplexer). Returns first result URL."""
+    return await kie.wait_task(task_id, model, timeout=timeout)
 
 
 # ── Jobs / polling ────────────────────────────────────────────────────────────
@@ -218,4 +203,4 @@ def delete_history(job_id: str):
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "kie": kie.stats()}
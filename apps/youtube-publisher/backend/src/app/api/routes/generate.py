@@ -1,16 +1,78 @@
 import logging
 from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.video import Video, VideoStatus, VideoFormat
-from app.services.pipeline import run_pipeline, run_pipeline_from_audio, run_pipeline_from_assembly
+from app.models.season import Season, SeasonStatus
+from app.services.pipeline import resume_step
+from app.services.manifest import SceneManifest
+from app.services.video import check_visual_source
+from app.services.season import season_progress
+from app.services.jobs import JOB_HANDLERS, enqueue_job, job_argument
+from app.services.workspace import workspaces
+from shared.encode_scheduler import EncodeScheduler, PRIORITY_NORMAL, PRIORITY_HIGH
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/generate", tags=["Generate"])
 
 
+def require_room() -> None:
+    """
+    Sans file, un rendu lancé dans le process API est refusé (507) si l'espace disque
+    manque. À appeler avant tout commit : le refus ne doit laisser aucun état en base.
+    En file, le worker attend que l'espace se libère.
+    """
+    if settings.JOB_QUEUE_ENABLED:
+        return
+    if not workspaces.has_room():
+        raise HTTPException(status_code=507, detail="Espace disque insuffisant, réessayez plus tard")
+
+
+def dispatch_job(
+    background_tasks: BackgroundTasks,
+    db: Session,
+    kind: str,
+    video_id: int | None,
+    priority: int = PRIORITY_NORMAL,
+    payload: dict | None = None,
+) -> int | None:
+    """
+    Met le pipeline en file (worker) ou, si la file est désactivée, le lance dans le process API.
+    L'espace disque est vérifié en amont par require_room().
+    """
+    if settings.JOB_QUEUE_ENABLED:
+        return enqueue_job(db, kind, video_id, payload=payload, priority=priority).id
+
+    async def run():
+        with EncodeScheduler.priority(priority):
+            await JOB_HANDLERS[kind](job_argument(kind, video_id, payload))
+
+    background_tasks.add_task(run)
+    return None
+
+
+def find_previous_summary(db: Session, serie_id: str | None, episode_number: int) -> str | None:
+    """Résumé de l'épisode précédent de la série (vidéo READY), s'il existe."""
+    if episode_number <= 1 or not serie_id:
+        return None
+    prev_video = (
+        db.query(Video)
+        .filter(
+            Video.serie_id == serie_id,
+            Video.episode_number == episode_number - 1,
+            Video.status == VideoStatus.READY
+        )
+        .first()
+    )
+    if prev_video and prev_video.previous_summary:
+        logger.info(f"Résumé épisode {episode_number - 1} récupéré automatiquement")
+        return prev_video.previous_summary
+    return None
+
+
 class CreateVideoRequest(BaseModel):
     topic: str = Field(..., description="Sujet ou titre de l'épisode")
     style: str = Field(default="storytelling", description="Style visuel")
@@ -18,6 +80,7 @@ class CreateVideoRequest(BaseModel):
     serie_id: Optional[str] = Field(default="couple_virilite", description="ID de la série")
     episode_number: int = Field(default=1, description="Numéro de l'épisode")
     previous_summary: Optional[str] = Field(default=None, description="Résumé de l'épisode précédent")
+    preview_only: bool = Field(default=False, description="Aperçu 480p seulement, rendu final après validation")
 
 
 @router.post("/create")
@@ -27,22 +90,12 @@ async def create_video(
     db: Session = Depends(get_db)
 ):
     """Crée une nouvelle vidéo et lance le pipeline."""
+    require_room()
 
     # Auto-récupération du résumé du dernier épisode si non fourni
-    previous_summary = request.previous_summary
-    if not previous_summary and request.episode_number > 1 and request.serie_id:
-        prev_video = (
-            db.query(Video)
-            .filter(
-                Video.serie_id == request.serie_id,
-                Video.episode_number == request.episode_number - 1,
-                Video.status == VideoStatus.READY
-            )
-            .first()
-        )
-        if prev_video and prev_video.previous_summary:
-            previous_summary = prev_video.previous_summary
-            logger.info(f"Résumé épisode {request.episode_number - 1} récupéré automatiquement")
+    previous_summary = request.previous_summary or find_previous_summary(
+        db, request.serie_id, request.episode_number
+    )
 
     video = Video(
         topic=request.topic,
@@ -57,11 +110,12 @@ async def create_video(
     db.commit()
     db.refresh(video)
 
-    background_tasks.add_task(run_pipeline, video.id)
+    job_id = dispatch_job(background_tasks, db, "preview" if request.preview_only else "pipeline", video.id)
 
     return {
-        "message": "Pipeline lancé",
+        "message": "Aperçu lancé" if request.preview_only else "Pipeline lancé",
         "video_id": video.id,
+        "job_id": job_id,
         "format": request.format,
         "episode_number": request.episode_number,
         "serie_id": request.serie_id,
@@ -69,6 +123,97 @@ async def create_video(
     }
 
 
+class CreateSeasonRequest(BaseModel):
+    topics: List[str] = Field(..., min_length=1, max_length=20, description="Sujets des épisodes, dans l'ordre")
+    style: str = Field(default="storytelling", description="Style visuel")
+    format: VideoFormat = Field(default=VideoFormat.PREMIUM, description="Format de génération")
+    serie_id: Optional[str] = Field(default="couple_virilite", description="ID de la série")
+    start_episode: int = Field(default=1, ge=1, description="Numéro du premier épisode")
+    previous_summary: Optional[str] = Field(default=None, description="Résumé de l'épisode précédant la saison")
+
+
+@router.post("/season")
+async def create_season(
+    request: CreateSeasonRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Crée une saison complète : scripts enchaînés un par un (continuité),
+    médias des épisodes scriptés générés en parallèle.
+    """
+    require_room()
+    previous_summary = request.previous_summary or find_previous_summary(
+        db, request.serie_id, request.start_episode
+    )
+
+    season = Season(
+        serie_id=request.serie_id,
+        style=request.style,
+        format=request.format,
+        topics=request.topics,
+        start_episode=request.start_episode,
+        status=SeasonStatus.SCRIPTING,
+    )
+    db.add(season)
+    db.commit()
+    db.refresh(season)
+
+    videos = []
+    for offset, topic in enumerate(request.topics):
+        video = Video(
+            topic=topic,
+            style=request.style,
+            format=request.format,
+            serie_id=request.serie_id,
+            episode_number=request.start_episode + offset,
+            previous_summary=previous_summary if offset == 0 else None,
+            season_id=season.id,
+            status=VideoStatus.DRAFT
+        )
+        db.add(video)
+        videos.append(video)
+    db.commit()
+
+    job_id = dispatch_job(background_tasks, db, "season", None, payload={"season_id": season.id})
+
+    return {
+        "message": f"Saison lancée ({len(videos)} épisodes)",
+        "season_id": season.id,
+        "job_id": job_id,
+        "video_ids": [v.id for v in videos],
+        "serie_id": request.serie_id,
+        "has_previous_context": bool(previous_summary)
+    }
+
+
+@router.get("/season/{season_id}")
+def get_season(season_id: int, db: Session = Depends(get_db)):
+    """Avancement de la saison : scripts écrits, épisodes terminés, statut par épisode."""
+    season = db.query(Season).filter(Season.id == season_id).first()
+    if not season:
+        raise HTTPException(status_code=404, detail="Saison non trouvée")
+    return season_progress(db, season)
+
+
+@router.post("/season/{season_id}/resume")
+async def resume_season(
+    season_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Reprend une saison échouée au premier script manquant (épisodes déjà scriptés conservés)."""
+    season = db.query(Season).filter(Season.id == season_id).first()
+    if not season:
+        raise HTTPException(status_code=404, detail="Saison non trouvée")
+    if season.status != SeasonStatus.FAILED:
+        raise HTTPException(status_code=400, detail=f"Impossible de reprendre une saison avec le statut '{season.status}'")
+    require_room()
+
+    job_id = dispatch_job(background_tasks, db, "season", None, payload={"season_id": season.id})
+    return {"message": "Saison reprise", "season_id": season.id, "job_id": job_id}
+
+
 @router.post("/{video_id}")
 async def generate_video(
     video_id: int,
@@ -81,8 +226,9 @@ async def generate_video(
         raise HTTPException(status_code=404, detail="Vidéo non trouvée")
     if video.status not in [VideoStatus.DRAFT, VideoStatus.FAILED]:
         raise HTTPException(status_code=400, detail="La vidéo est déjà en cours de traitement")
-    background_tasks.add_task(run_pipeline, video_id)
-    return {"message": "Pipeline lancé depuis le début", "video_id": video_id, "from_step": "script"}
+    require_room()
+    job_id = dispatch_job(background_tasks, db, "pipeline", video_id)
+    return {"message": "Pipeline lancé depuis le début", "video_id": video_id, "job_id": job_id, "from_step": "script"}
 
 
 @router.post("/{video_id}/resume")
@@ -101,27 +247,128 @@ async def resume_video(
             status_code=400,
             detail=f"Impossible de reprendre une vidéo avec le statut '{video.status}'"
         )
+    require_room()
 
     has_script = bool(video.script)
     has_images = bool(video.scenes_images and len(video.scenes_images) > 0)
     has_audio  = bool(video.scenes_audio and len(video.scenes_audio) > 0)
 
-    if has_audio and has_images and has_script:
-        background_tasks.add_task(run_pipeline_from_assembly, video_id)
-        from_step = "assembly"
-    elif has_images and has_script:
-        background_tasks.add_task(run_pipeline_from_audio, video_id)
-        from_step = "audio"
-    else:
-        background_tasks.add_task(run_pipeline, video_id)
-        from_step = "script"
+    from_step = resume_step(video)
+    kind = "media" if from_step == "media" else "pipeline"
+    # Reprise : prioritaire sur les nouvelles vidéos (file et encodages)
+    job_id = dispatch_job(background_tasks, db, kind, video_id, priority=PRIORITY_HIGH)
 
     logger.info(f"Resume vidéo {video_id} depuis étape : {from_step}")
     return {
         "message": f"Pipeline repris depuis l'étape '{from_step}'",
         "video_id": video_id,
+        "job_id": job_id,
         "from_step": from_step,
         "has_script": has_script,
         "has_images": has_images,
         "has_audio": has_audio,
-    }
\ No newline at end of file
+        # Artefacts terminés par type (validité des fichiers vérifiée par le worker)
+        "completed_scenes": SceneManifest(video.scene_manifest).summary(len(video.script or [])),
+    }
+
+
+@router.post("/{video_id}/preview")
+async def preview_video(
+    video_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Aperçu 480p rapide (sans musique) à partir des mêmes artefacts de scène que le
+    rendu final. Le rendu final se lance ensuite via /resume (artefacts réutilisés).
+    """
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Vidéo non trouvée")
+    if video.status not in [VideoStatus.DRAFT, VideoStatus.FAILED, VideoStatus.READY]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Impossible de lancer un aperçu d'une vidéo avec le statut '{video.status}'"
+        )
+    require_room()
+
+    job_id = dispatch_job(background_tasks, db, "preview", video_id, priority=PRIORITY_HIGH)
+    return {
+        "message": "Aperçu lancé",
+        "video_id": video_id,
+        "job_id": job_id,
+        "preview_url": f"{settings.BASE_URL}/api/videos/{video_id}/preview",
+    }
+
+
+class EditSceneRequest(BaseModel):
+    narration: Optional[str] = Field(default=None, description="Nouvelle narration (TTS régénéré)")
+    image_prompt: Optional[str] = Field(default=None, description="Nouveau prompt (visuel régénéré)")
+    visual_url: Optional[str] = Field(default=None, description="Visuel de remplacement (URL ou chemin local)")
+
+    @field_validator("visual_url")
+    @classmethod
+    def visual_source(cls, value: Optional[str]) -> Optional[str]:
+        # URL http(s) ou fichier déjà généré par l'app : ni lecture de fichiers arbitraires, ni autres schémas
+        return check_visual_source(value) if value is not None else None
+
+
+@router.patch("/{video_id}/scenes/{scene_number}")
+async def edit_scene(
+    video_id: int,
+    scene_number: int,
+    request: EditSceneRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Modifie une scène puis relance le rendu : seuls la narration et/ou le visuel
+    modifiés et le clip de cette scène sont refaits ; les clips des autres scènes
+    sont réutilisés (manifeste), puis concat + sous-titres + musique.
+    """
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Vidéo non trouvée")
+    if video.status not in [VideoStatus.READY, VideoStatus.FAILED]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Impossible de modifier une vidéo avec le statut '{video.status}'"
+        )
+    if not video.script:
+        raise HTTPException(status_code=400, detail="Script manquant")
+
+    changes = request.model_dump(exclude_none=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Aucune modification (narration, image_prompt ou visual_url)")
+
+    script = [dict(scene) for scene in video.script]
+    index = next((i for i, s in enumerate(script) if s.get("scene_number") == scene_number), None)
+    if index is None:
+        raise HTTPException(status_code=404, detail=f"Scène {scene_number} introuvable")
+    require_room()
+
+    if "image_prompt" in changes and "visual_url" not in changes:
+        # Nouveau prompt : le visuel de remplacement éventuel ne s'applique plus
+        script[index].pop("visual_url", None)
+    script[index].update(changes)
+    video.script = script
+    # Vidéos antérieures au manifeste : la liste d'assets ne doit plus fournir l'artefact modifié
+    if video.scenes_images and index < len(video.scenes_images) and {"image_prompt", "visual_url"} & changes.keys():
+        video.scenes_images = [None if i == index else url for i, url in enumerate(video.scenes_images)]
+    if video.scenes_audio and index < len(video.scenes_audio) and "narration" in changes:
+        video.scenes_audio = [None if i == index else path for i, path in enumerate(video.scenes_audio)]
+    video.status = VideoStatus.ASSEMBLING
+    video.error_message = None
+    db.commit()
+
+    # Les empreintes du manifeste ne correspondent plus que pour les artefacts inchangés
+    job_id = dispatch_job(background_tasks, db, "media", video_id, priority=PRIORITY_HIGH)
+
+    logger.info(f"Vidéo {video_id} — scène {scene_number} modifiée ({', '.join(changes)}), re-rendu lancé")
+    return {
+        "message": f"Scène {scene_number} modifiée, re-rendu lancé",
+        "video_id": video_id,
+        "job_id": job_id,
+        "scene_number": scene_number,
+        "changed": sorted(changes),
+    }
@@ -0,0 +1,44 @@
+import hmac
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import get_db
+from app.services.kie_tasks import resolve_task, notify_task, callbacks_enabled
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/kie", tags=["Kie.ai"])
+
+
+@router.post("/callback")
+async def kie_callback(request: Request, token: str = "", db: Session = Depends(get_db)):
+    """
+    Callback de fin de tâche Kie.ai (callBackUrl du createTask).
+    Seul le taskId est utilisé : l'état et le résultat sont relus via recordInfo
+    (le corps d'une requête publique n'est jamais cru). Réveille l'attente locale
+    et relaie aux workers via pg_notify.
+    """
+    if not callbacks_enabled():
+        raise HTTPException(status_code=403, detail="Callbacks Kie.ai désactivés (KIE_CALLBACK_TOKEN requis)")
+    if not hmac.compare_digest(token, settings.KIE_CALLBACK_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de callback invalide")
+
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="JSON invalide")
+
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Objet JSON attendu")
+    data = body.get("data") if isinstance(body.get("data"), dict) else body
+    task_id = data.get("taskId")
+    if not task_id or not isinstance(task_id, (str, int)):
+        raise HTTPException(status_code=400, detail="taskId manquant")
+
+    # Poll immédiat de la tâche (ici et dans les workers) au lieu d'attendre le polling de secours
+    resolved = resolve_task(str(task_id), None)
+    if settings.JOB_QUEUE_ENABLED:
+        notify_task(db, str(task_id), None)
+
+    logger.info(f"Callback Kie.ai tâche {task_id}{' — attente locale réveillée' if resolved else ''}")
+    return {"received": True}
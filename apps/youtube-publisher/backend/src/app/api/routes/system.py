@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.services.audio import tts_cache
+from app.services.assembly import encoder
+from app.services.jobs import queue_stats, read_worker_stats
+from app.services.remotion import still_cache, breaker
+from app.services import kie_tasks
+from app.services.image import reference_cache
+from app.services.workspace import workspaces
+from app.services import retention
+
+router = APIRouter(prefix="/system", tags=["System"])
+
+
+@router.get("/stats")
+def get_stats(db: Session = Depends(get_db)):
+    """Compteurs internes du processus API (caches, files d'attente)."""
+    return {
+        "tts_cache": tts_cache.stats() if tts_cache else None,
+        "jobs": queue_stats(db),
+        "encoder": encoder.stats(),
+        "stills": still_cache.stats(),
+        "remotion": breaker.stats(),
+        "kie": kie_tasks.kie.stats(),
+        "kie_uploads": reference_cache.stats(),
+        "workspace": workspaces.stats(),
+        "retention": retention.engine.stats(),
+        "workers": read_worker_stats(),
+    }
+
+
+@router.get("/retention")
+def retention_report():
+    """Simulation de la rétention : ce qui serait supprimé ou archivé, orphelins, volume par classe."""
+    report = retention.run_retention(dry_run=True)
+    if report is None:
+        raise HTTPException(status_code=409, detail="Passe de rétention déjà en cours")
+    return report
+
+
+@router.post("/retention")
+def retention_run(dry_run: bool = False):
+    """Lance une passe de rétention immédiatement (sans attendre la passe périodique du worker)."""
+    report = retention.run_retention(dry_run=dry_run)
+    if report is None:
+        raise HTTPException(status_code=409, detail="Passe de rétention déjà en cours")
+    return report
@@ -1,6 +1,7 @@
+import re
 import logging
 import httpx
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -9,6 +10,9 @@ from app.core.database import get_db
 from app.core.config import settings
 from app.models.video import Video, VideoStatus
 from app.schemas.video import VideoCreateRequest, VideoResponse, VideoPatchRequest
+from app.services.video import caption_files
+from app.services.retention import purge_video_files
+from shared.file_response import ranged_file_response, CACHE_IMMUTABLE, CACHE_NO_CACHE
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/videos", tags=["Videos"])
@@ -68,6 +72,11 @@ async def publish_video(video_id: int, db: Session = Depends(get_db)):
                 "thumbnail_path": video.thumbnail_path,
                 "download_url":   f"{settings.BASE_URL}/api/videos/{video.id}/download",
                 "thumbnail_url":  f"{settings.BASE_URL}/api/videos/{video.id}/thumbnail" if video.thumbnail_path else None,
+                # Captions YouTube (SUBTITLES_MODE=soft), vide sinon
+                "captions":       {
+                    fmt: f"{settings.BASE_URL}/api/videos/{video.id}/captions/{fmt}"
+                    for fmt in caption_files(video.id)
+                },
             })
     except Exception as e:
         logger.error(f"Erreur webhook n8n pour vidéo {video_id}: {e}")
@@ -93,7 +102,7 @@ def get_video_thumbnail(video_id: int, db: Session = Depends(get_db)):
     return FileResponse(path=video.thumbnail_path, media_type="image/jpeg")
 
 @router.get("/{video_id}/download")
-def download_video(video_id: int, db: Session = Depends(get_db)):
+def download_video(video_id: int, request: Request, db: Session = Depends(get_db)):
     video = db.query(Video).filter(Video.id == video_id).first()
     if not video:
         raise HTTPException(status_code=404, detail="Vidéo non trouvée")
@@ -101,10 +110,55 @@ def download_video(video_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Vidéo pas encore générée")
     if not os.path.exists(video.final_video_path):
         raise HTTPException(status_code=404, detail="Fichier vidéo introuvable sur le serveur")
+    # Range (206) : le lecteur démarre et se positionne sans télécharger tout le MP4
+    return ranged_file_response(
+        request, video.final_video_path, "video/mp4", filename=f"verites-cachees-{video_id}.mp4"
+    )
+
+@router.get("/{video_id}/captions/{fmt}")
+def download_captions(video_id: int, fmt: str, db: Session = Depends(get_db)):
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Vidéo non trouvée")
+    path = caption_files(video_id).get(fmt)
+    if not path:
+        raise HTTPException(status_code=404, detail="Sous-titres introuvables")
     return FileResponse(
-        path=video.final_video_path,
-        media_type="video/mp4",
-        filename=f"verites-cachees-{video_id}.mp4"
+        path=path,
+        media_type="text/vtt" if fmt == "vtt" else "application/x-subrip",
+        filename=f"verites-cachees-{video_id}.{fmt}"
+    )
+
+@router.get("/{video_id}/preview")
+def download_preview(video_id: int, request: Request, db: Session = Depends(get_db)):
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Vidéo non trouvée")
+    if not video.preview_path or not os.path.exists(video.preview_path):
+        raise HTTPException(status_code=404, detail="Aperçu pas encore généré")
+    return ranged_file_response(request, video.preview_path, "video/mp4")
+
+HLS_FILE_RE = re.compile(r"[\w-]+\.(m3u8|m4s|mp4)")
+HLS_MEDIA_TYPES = {"m3u8": "application/vnd.apple.mpegurl", "m4s": "video/iso.segment", "mp4": "video/mp4"}
+
+@router.get("/{video_id}/hls/{name}")
+def get_hls_file(video_id: int, name: str, request: Request, db: Session = Depends(get_db)):
+    """Échelle HLS du rendu final (master.m3u8 puis playlists et segments relatifs)."""
+    match = HLS_FILE_RE.fullmatch(name)
+    if not match:
+        raise HTTPException(status_code=404, detail="Fichier HLS introuvable")
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Vidéo non trouvée")
+    if not video.hls_path:
+        raise HTTPException(status_code=404, detail="Échelle HLS non générée")
+    path = os.path.join(os.path.dirname(video.hls_path), name)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Fichier HLS introuvable")
+    # Playlists revalidées à chaque lecture ; segments et init versionnés par rendu
+    ext = match.group(1)
+    return ranged_file_response(
+        request, path, HLS_MEDIA_TYPES[ext], cache_control=CACHE_NO_CACHE if ext == "m3u8" else CACHE_IMMUTABLE
     )
 
 @router.patch("/{video_id}", response_model=VideoResponse)
@@ -125,4 +179,6 @@ def delete_video(video_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Vidéo non trouvée")
     db.delete(video)
     db.commit()
-    return {"success": True, "message": "Vidéo supprimée"}
+    # Fichiers générés (narrations, visuels, clips, rendus, archives) supprimés avec la ligne
+    freed = purge_video_files(video)
+    return {"success": True, "message": "Vidéo supprimée", "freed_mb": freed // (1024 * 1024)}
@@ -14,6 +14,9 @@ class Settings(BaseSettings):
     KIE_AI_API_KEY: str
     ELEVENLABS_API_KEY: str
     ELEVENLABS_VOICE_ID: str = "21m00Tcm4TlvDq8ikWAM"
+    TTS_CONCURRENCY: int = 3   # requêtes ElevenLabs simultanées max
+    TTS_CACHE_DIR: str = "/app/outputs/cache/tts"
+    TTS_CACHE_MAX_MB: int = 2048   # 0 = cache désactivé
     N8N_WEBHOOK_URL: str = ""
     YOUTUBE_CLIENT_ID: str = ""
     YOUTUBE_CLIENT_SECRET: str = ""
@@ -23,6 +26,57 @@ class Settings(BaseSettings):
     BASE_URL: str = "https://api.youtube.sterveshop.cloud"
     AFFILIATE_LINK: str = "https://rituel.sterveshop.cloud"
     REMOTION_SERVICE_URL: str = ""
+    REMOTION_FAILURE_THRESHOLD: int = 2    # échecs consécutifs avant ouverture du disjoncteur
+    REMOTION_COOLDOWN_SECONDS: int = 300   # rendus directement sur FFmpeg pendant ce délai
+
+    # Sous-titres : "burn" (incrustés, second encodage vidéo) ou "soft" (piste mov_text + SRT/VTT,
+    # vidéo copiée : chaque image n'est encodée qu'une fois, dans son clip de scène)
+    SUBTITLES_MODE: str = "burn"
+    # Clips premium répétés sur la narration : "loop" (boucle simple) ou "boomerang" (aller-retour)
+    PREMIUM_LOOP_MODE: str = "loop"
+    # Échelle HLS fMP4 (480p/240p) du rendu final pour la lecture dans le dashboard
+    HLS_PREVIEW_ENABLED: bool = False
+
+    # Dossiers de travail par rendu (intermédiaires supprimés après succès) : peut être un tmpfs
+    WORKSPACE_DIR: str = "/app/outputs/temp/work"
+    WORKSPACE_MIN_FREE_MB: int = 2048  # en dessous, plus aucun nouveau job (0 = pas de seuil)
+
+    # Rétention des sorties (passe périodique du worker, voir services/retention.py)
+    RETENTION_ENABLED: bool = True
+    RETENTION_INTERVAL_HOURS: float = 6
+    RETENTION_FAILED_DAYS: int = 14    # intermédiaires d'une vidéo en échec conservés pour la reprise
+    RETENTION_ARCHIVE_DAYS: int = 30   # rendus finaux publiés archivés après ce délai (0 = jamais)
+    RETENTION_ARCHIVE_DIR: str = "/app/outputs/archive"  # stockage froid (volume séparé possible)
+    RETENTION_ORPHAN_HOURS: int = 24   # fichiers sans ligne en base supprimés après ce délai
+
+    # Ordonnanceur FFmpeg : slots = cœurs disponibles // FFMPEG_THREADS (FFMPEG_SLOTS > 0 pour forcer)
+    FFMPEG_THREADS: int = 2
+    FFMPEG_SLOTS: int = 0
+    FFMPEG_NICE: int = 10              # 0 = pas de nice/ionice
+
+    # Images Ken Burns pré-redimensionnées (cache par hash de contenu)
+    STILLS_CACHE_DIR: str = "/app/outputs/cache/stills"
+    STILLS_CACHE_MAX_MB: int = 1024
+    STILLS_WORKERS: int = 2            # processus Pillow
+
+    # Tâches Kie.ai : callback (POST {BASE_URL}/api/kie/callback) + polling lent en filet de sécurité
+    KIE_CALLBACK_ENABLED: bool = True
+    KIE_CALLBACK_TOKEN: str = ""       # secret ajouté à l'URL de callback (vide = callbacks désactivés)
+    KIE_FALLBACK_POLL_SECONDS: int = 30  # polling de secours quand le callback est actif
+    KIE_TASK_TIMEOUT: int = 600
+    KIE_RATE_PER_SECOND: float = 2.0   # requêtes API Kie.ai/s (token bucket par clé)
+    KIE_RATE_BURST: int = 10
+    KIE_UPLOAD_CACHE_PATH: str = "/app/outputs/cache/kie_uploads.json"
+    KIE_UPLOAD_TTL_HOURS: int = 48     # Kie.ai supprime les fichiers uploadés après 3 jours
+
+    # File d'attente des pipelines (table jobs, consommée par `python -m app.worker`)
+    JOB_QUEUE_ENABLED: bool = True     # False = BackgroundTasks dans le process API (dev)
+    WORKER_CONCURRENCY: int = 2        # pipelines simultanés par worker
+    JOB_LEASE_SECONDS: int = 120       # bail d'un job sans heartbeat avant reprise par un autre worker
+    JOB_HEARTBEAT_SECONDS: int = 30
+    JOB_POLL_SECONDS: float = 2.0
+    JOB_MAX_ATTEMPTS: int = 3          # reprises max après perte de worker (crash, redéploiement)
+    WORKER_SHUTDOWN_TIMEOUT: int = 25  # attente des jobs en cours sur SIGTERM avant remise en file
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -13,3 +13,25 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Migrations SQL idempotentes (ADD COLUMN IF NOT EXISTS)
+_MIGRATIONS = [
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS youtube_video_id VARCHAR(200)",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS season_id INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_videos_season_id ON videos (season_id)",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS scene_manifest JSON",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS preview_path VARCHAR(500)",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS hls_path VARCHAR(500)",
+]
+
+def init_db():
+    """Crée les tables + applique les migrations (API et worker au démarrage)."""
+    import app.models.video  # noqa: F401
+    import app.models.job  # noqa: F401
+    import app.models.season  # noqa: F401
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        for sql in _MIGRATIONS:
+            conn.execute(text(sql))
+        conn.commit()
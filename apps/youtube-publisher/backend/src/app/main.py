@@ -2,27 +2,17 @@ import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text
 from app.core.config import settings
-from app.core.database import Base, engine
-from app.api.routes import videos, generate
+from app.core.database import init_db
+from app.api.routes import videos, generate, system, kie
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Migrations SQL idempotentes (ADD COLUMN IF NOT EXISTS)
-_MIGRATIONS = [
-    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS youtube_video_id VARCHAR(200)",
-]
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Initialisation de la base de données...")
-    Base.metadata.create_all(bind=engine)
-    with engine.connect() as conn:
-        for sql in _MIGRATIONS:
-            conn.execute(text(sql))
-        conn.commit()
+    init_db()
     logger.info("Tables et migrations OK")
     yield
     logger.info("Application arrêtée proprement")
@@ -43,6 +33,8 @@ app.add_middleware(
 
 app.include_router(videos.router, prefix="/api")
 app.include_router(generate.router, prefix="/api")
+app.include_router(system.router, prefix="/api")
+app.include_router(kie.router, prefix="/api")
 
 @app.get("/")
 def root():
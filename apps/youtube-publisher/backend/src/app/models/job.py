@@ -0,0 +1,39 @@
+import enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, JSON, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED  = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE    = "DONE"
+    FAILED  = "FAILED"
+
+
+class Job(Base):
+    """File d'attente durable des pipelines (consommée par app.worker)."""
+    __tablename__ = "jobs"
+
+    id                = Column(Integer, primary_key=True, index=True)
+    kind              = Column(String(100), nullable=False)   # ex: "pipeline", "resume_audio"
+    video_id          = Column(Integer, nullable=True, index=True)
+    payload           = Column(JSON, nullable=True)
+    priority          = Column(Integer, default=0)            # plus grand = traité avant
+
+    # Statut & bail (lease)
+    status            = Column(Enum(JobStatus), default=JobStatus.QUEUED, index=True)
+    attempts          = Column(Integer, default=0)
+    max_attempts      = Column(Integer, default=3)
+    locked_by         = Column(String(200), nullable=True)    # identifiant du worker
+    lease_expires_at  = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at      = Column(DateTime(timezone=True), nullable=True)
+    error_message     = Column(Text, nullable=True)
+
+    created_at        = Column(DateTime(timezone=True), server_default=func.now())
+    started_at        = Column(DateTime(timezone=True), nullable=True)
+    finished_at       = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_claim", "status", "priority", "id"),
+    )
@@ -0,0 +1,31 @@
+import enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, JSON
+from sqlalchemy.sql import func
+from app.core.database import Base
+from app.models.video import VideoFormat
+
+
+class SeasonStatus(str, enum.Enum):
+    SCRIPTING = "SCRIPTING"   # scripts générés un par un (continuité)
+    RENDERING = "RENDERING"   # tous les scripts écrits, médias en cours
+    DONE      = "DONE"
+    FAILED    = "FAILED"
+
+
+class Season(Base):
+    """Saison générée en lot : un plan de N sujets → N vidéos (videos.season_id)."""
+    __tablename__ = "seasons"
+
+    id                = Column(Integer, primary_key=True, index=True)
+    serie_id          = Column(String(100), nullable=True)
+    style             = Column(String(100), default="storytelling")
+    format            = Column(Enum(VideoFormat), default=VideoFormat.PREMIUM)
+    topics            = Column(JSON, nullable=False)
+    start_episode     = Column(Integer, default=1)
+
+    status            = Column(Enum(SeasonStatus), default=SeasonStatus.SCRIPTING)
+    scripted          = Column(Integer, default=0)            # épisodes dont le script est écrit
+    error_message     = Column(Text, nullable=True)
+
+    created_at        = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at        = Column(DateTime(timezone=True), onupdate=func.now())
@@ -33,6 +33,7 @@ class Video(Base):
     serie_id          = Column(String(100), nullable=True)   # ex: "couple_virilite"
     episode_number    = Column(Integer, default=1)
     previous_summary  = Column(Text, nullable=True)          # résumé épisode précédent
+    season_id         = Column(Integer, nullable=True, index=True)  # saison générée en lot
 
     # Métadonnées générées
     title             = Column(String(500), nullable=True)
@@ -47,7 +48,10 @@ class Video(Base):
     # Assets générés
     scenes_images     = Column(JSON, nullable=True)   # URLs ou chemins locaux
     scenes_audio      = Column(JSON, nullable=True)   # chemins MP3
+    scene_manifest    = Column(JSON, nullable=True)   # artefacts par scène (voir services/manifest.py)
     final_video_path  = Column(String(500), nullable=True)
+    preview_path      = Column(String(500), nullable=True)   # aperçu 480p
+    hls_path          = Column(String(500), nullable=True)   # master playlist HLS du rendu final
     thumbnail_path    = Column(String(500), nullable=True)
     subtitles_path    = Column(String(500), nullable=True)
     youtube_url       = Column(String(500), nullable=True)
@@ -36,12 +36,15 @@ class VideoResponse(BaseModel):
     format: VideoFormat
     serie_id: Optional[str] = None
     episode_number: int
+    season_id: Optional[int] = None
     title: Optional[str] = None
     description: Optional[str] = None
     script: Optional[List[dict]] = None
     tags: Optional[List[str]] = None
-    scenes_images: Optional[List[str]] = None
+    scenes_images: Optional[List[Optional[str]]] = None
     final_video_path: Optional[str] = None
+    preview_path: Optional[str] = None
+    hls_path: Optional[str] = None
     thumbnail_path: Optional[str] = None
     youtube_url: Optional[str] = None
     youtube_video_id: Optional[str] = None
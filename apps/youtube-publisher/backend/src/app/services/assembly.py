@@ -0,0 +1,239 @@
+import json
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from app.core.config import settings
+from shared.encode_scheduler import EncodeScheduler
+
+logger = logging.getLogger(__name__)
+
+# Tous les processus FFmpeg du processus passent par cet ordonnanceur
+encoder = EncodeScheduler(
+    threads=settings.FFMPEG_THREADS,
+    slots=settings.FFMPEG_SLOTS,
+    nice=settings.FFMPEG_NICE,
+)
+
+# Paramètres de sortie communs (1080p 25fps H.264/AAC)
+OUTPUT_WIDTH = 1920
+OUTPUT_HEIGHT = 1080
+OUTPUT_FPS = 25
+AUDIO_SAMPLE_RATE = 48000
+
+VOICE_VOLUME = 1.0
+MUSIC_VOLUME = 0.12
+
+# Paramètres d'encodage imposés à chaque clip de scène : des clips identiques
+# (résolution, fps, GOP, timebase, pix_fmt, AAC) peuvent être concaténés en -c copy
+SCENE_GOP = OUTPUT_FPS * 2
+SCENE_TIMESCALE = 12800
+SCENE_VIDEO_FILTER = (
+    f"scale={OUTPUT_WIDTH}:{OUTPUT_HEIGHT}:force_original_aspect_ratio=increase,"
+    f"crop={OUTPUT_WIDTH}:{OUTPUT_HEIGHT},setsar=1,fps={OUTPUT_FPS},format=yuv420p"
+)
+SCENE_VIDEO_ARGS = [
+    "-c:v", "libx264", "-preset", "ultrafast",
+    "-pix_fmt", "yuv420p",
+    "-r", str(OUTPUT_FPS),
+    "-g", str(SCENE_GOP), "-keyint_min", str(SCENE_GOP), "-sc_threshold", "0",
+    "-video_track_timescale", str(SCENE_TIMESCALE),
+]
+SCENE_AUDIO_ARGS = [
+    "-c:a", "aac", "-ar", str(AUDIO_SAMPLE_RATE), "-ac", "2", "-b:a", "192k",
+]
+
+# Profil d'aperçu (relecture avant le rendu final) : 480p, fps réduit, qualité moindre.
+# Mêmes contraintes que SCENE_* entre clips d'aperçu : concat en -c copy
+PREVIEW_WIDTH = 854
+PREVIEW_HEIGHT = 480
+PREVIEW_FPS = 15
+PREVIEW_GOP = PREVIEW_FPS * 2
+PREVIEW_VIDEO_FILTER = (
+    f"scale={PREVIEW_WIDTH}:{PREVIEW_HEIGHT}:force_original_aspect_ratio=increase,"
+    f"crop={PREVIEW_WIDTH}:{PREVIEW_HEIGHT},setsar=1,fps={PREVIEW_FPS},format=yuv420p"
+)
+PREVIEW_VIDEO_ARGS = [
+    "-c:v", "libx264", "-preset", "ultrafast", "-crf", "30",
+    "-pix_fmt", "yuv420p",
+    "-r", str(PREVIEW_FPS),
+    "-g", str(PREVIEW_GOP), "-keyint_min", str(PREVIEW_GOP), "-sc_threshold", "0",
+    "-video_track_timescale", str(SCENE_TIMESCALE),
+]
+PREVIEW_AUDIO_ARGS = [
+    "-c:a", "aac", "-ar", str(AUDIO_SAMPLE_RATE), "-ac", "2", "-b:a", "96k",
+]
+
+# Échelle HLS fMP4 pour la lecture dans le dashboard : (hauteur, débit vidéo, débit audio).
+# Images clés toutes les HLS_SEGMENT_SECONDS : chaque segment démarre sur une image clé
+HLS_LADDER = [(480, "900k", "96k"), (240, "300k", "64k")]
+HLS_SEGMENT_SECONDS = 4
+HLS_MASTER = "master.m3u8"
+
+
+def hls_ladder_command(input_path: str, out_dir: str, version: str) -> list:
+    """
+    Une commande pour toute l'échelle : décodage unique, split + scale par variante.
+    Segments et init préfixés par `version` (noms propres au rendu, cache immuable).
+    """
+    splits = "".join(f"[v{i}]" for i in range(len(HLS_LADDER)))
+    scales = ";".join(
+        f"[v{i}]scale=-2:{height},setsar=1[o{i}]" for i, (height, _, _) in enumerate(HLS_LADDER)
+    )
+    cmd = [
+        "ffmpeg", "-y", "-i", input_path,
+        "-filter_complex", f"[0:v]split={len(HLS_LADDER)}{splits};{scales}",
+    ]
+    for i in range(len(HLS_LADDER)):
+        cmd += ["-map", f"[o{i}]", "-map", "0:a"]
+    cmd += ["-c:v", "libx264", "-preset", "veryfast", "-profile:v", "main", "-pix_fmt", "yuv420p"]
+    for i, (_, video_rate, audio_rate) in enumerate(HLS_LADDER):
+        cmd += [f"-b:v:{i}", video_rate, f"-maxrate:v:{i}", video_rate, f"-bufsize:v:{i}", video_rate,
+                f"-b:a:{i}", audio_rate]
+    cmd += [
+        "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})", "-sc_threshold", "0",
+        "-c:a", "aac", "-ac", "2",
+        "-f", "hls", "-hls_time", str(HLS_SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", f"{version}_%v_init.mp4",
+        "-hls_segment_filename", f"{out_dir}/{version}_%v_%03d.m4s",
+        "-master_pl_name", HLS_MASTER,
+        "-var_stream_map", " ".join(f"v:{i},a:{i}" for i in range(len(HLS_LADDER))),
+        f"{out_dir}/stream_%v.m3u8",
+    ]
+    return cmd
+
+
+# Tolérance de durée (secondes par scène) pour valider une concat en stream copy
+CONCAT_DURATION_TOLERANCE = 0.5
+
+
+class StageTimer:
+    """Chronomètre les étapes d'un assemblage — durées en secondes par étape."""
+
+    def __init__(self, video_id: int):
+        self.video_id = video_id
+        self.timings: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 3)
+
+    def log(self) -> None:
+        total = sum(self.timings.values())
+        details = ", ".join(f"{k}={v:.1f}s" for k, v in self.timings.items())
+        logger.info(f"⏱ Vidéo {self.video_id} — étapes : {details} (total {total:.1f}s)")
+
+
+async def run_ffmpeg(cmd: list) -> tuple[int, str]:
+    """Lance FFmpeg via l'ordonnanceur global (slot CPU, priorité du contexte, nice)."""
+    returncode, _, stderr = await encoder.run(cmd)
+    return returncode, stderr.decode(errors="replace")
+
+
+async def probe_streams(path: str) -> dict:
+    """ffprobe JSON (streams + format) avec hash de l'extradata (SPS/PPS H.264)."""
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error", "-print_format", "json",
+        "-show_streams", "-show_format", "-show_data_hash", "SHA256",
+        path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise Exception(f"ffprobe error ({path}): {stderr.decode(errors='replace')[:300]}")
+    return json.loads(stdout)
+
+
+def stream_signature(info: dict) -> tuple:
+    """Paramètres qui doivent être identiques pour concaténer en stream copy."""
+    signature = []
+    for stream in sorted(info.get("streams", []), key=lambda s: s.get("index", 0)):
+        if stream.get("codec_type") == "video":
+            signature.append((
+                "video", stream.get("codec_name"), stream.get("profile"),
+                stream.get("width"), stream.get("height"), stream.get("pix_fmt"),
+                stream.get("r_frame_rate"), stream.get("time_base"),
+                stream.get("extradata_hash"),
+            ))
+        elif stream.get("codec_type") == "audio":
+            signature.append((
+                "audio", stream.get("codec_name"), stream.get("profile"),
+                stream.get("sample_rate"), stream.get("channels"),
+                stream.get("time_base"),
+            ))
+    return tuple(signature)
+
+
+def _format_duration(info: dict) -> float:
+    try:
+        return float(info.get("format", {}).get("duration", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+async def concat_scenes(scene_videos: list, concat_file: str, output_path: str) -> bool:
+    """
+    Concatène les clips de scène.
+    - Paramètres d'encodage identiques → concat demuxer en -c copy (aucun ré-encodage)
+    - Sinon, ou si le résultat copié est incohérent → ré-encodage complet
+
+    Retourne True si la concaténation a été faite en stream copy.
+    """
+    with open(concat_file, "w") as f:
+        for sv in scene_videos:
+            f.write(f"file '{sv}'\n")
+
+    try:
+        infos = await asyncio.gather(*[probe_streams(sv) for sv in scene_videos])
+        signatures = {stream_signature(info) for info in infos}
+        expected_duration = sum(_format_duration(info) for info in infos)
+    except Exception as e:
+        logger.warning(f"Probe des scènes impossible, concat avec ré-encodage : {e}")
+        signatures = set()
+
+    if len(signatures) == 1:
+        cmd_copy = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0", "-i", concat_file,
+            "-map", "0", "-c", "copy",
+            "-movflags", "+faststart",
+            output_path
+        ]
+        returncode, stderr = await run_ffmpeg(cmd_copy)
+        if returncode == 0:
+            try:
+                result = await probe_streams(output_path)
+                drift = abs(_format_duration(result) - expected_duration)
+                if stream_signature(result) in signatures and drift <= CONCAT_DURATION_TOLERANCE * len(scene_videos):
+                    logger.info(f"Concat en stream copy ✅ ({len(scene_videos)} scènes)")
+                    return True
+                logger.warning(f"Concat copy incohérente (écart {drift:.2f}s), ré-encodage")
+            except Exception as e:
+                logger.warning(f"Vérification concat copy échouée, ré-encodage : {e}")
+        else:
+            logger.warning(f"Concat copy échouée, ré-encodage : {stderr[-300:]}")
+    elif signatures:
+        logger.info(f"Paramètres de scènes hétérogènes ({len(signatures)} variantes), concat avec ré-encodage")
+
+    cmd_concat = [
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0", "-i", concat_file,
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac",
+        "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart",
+        output_path
+    ]
+    returncode, stderr = await run_ffmpeg(cmd_concat)
+    if returncode != 0:
+        raise Exception(f"FFmpeg concat error: {stderr}")
+    return False
+
+
+def escape_filter_path(path: str) -> str:
+    return path.replace("\\", "/").replace(":", "\\:")
@@ -1,27 +1,62 @@
 import httpx
 import os
 import json
+import random
 import asyncio
 import logging
 from app.core.config import settings
+from shared.tts_cache import TTSCache, write_atomic
 
 logger = logging.getLogger(__name__)
 
 MAX_RETRIES = 3
 RETRY_DELAYS = [5, 15, 30]  # backoff exponentiel en secondes
 
+# HTTP 429 (trop de requêtes simultanées) : backoff dédié, ne consomme pas les tentatives
+MAX_RATE_LIMIT_RETRIES = 5
+RATE_LIMIT_BASE_DELAY = 2
+RATE_LIMIT_MAX_DELAY = 60
+
+TTS_MODEL_ID = "eleven_multilingual_v2"
+VOICE_SETTINGS = {"stability": 0.5, "similarity_boost": 0.8}
+
+# Limite globale de requêtes ElevenLabs simultanées (toutes vidéos confondues)
+_tts_semaphore = asyncio.Semaphore(settings.TTS_CONCURRENCY)
+
+# Cache disque des narrations déjà synthétisées (TTS_CACHE_MAX_MB=0 pour désactiver)
+tts_cache = (
+    TTSCache(settings.TTS_CACHE_DIR, settings.TTS_CACHE_MAX_MB * 1024 * 1024)
+    if settings.TTS_CACHE_MAX_MB > 0 else None
+)
+
+
+def tts_cache_key(narration: str) -> str:
+    return TTSCache.make_key(narration, settings.ELEVENLABS_VOICE_ID, TTS_MODEL_ID, VOICE_SETTINGS)
+
+
+class QuotaExceededError(Exception):
+    """Quota ElevenLabs épuisé — inutile de réessayer."""
+
+
+def _rate_limit_delay(response: httpx.Response, retry: int) -> float:
+    retry_after = response.headers.get("retry-after")
+    if retry_after:
+        try:
+            return min(float(retry_after), RATE_LIMIT_MAX_DELAY)
+        except ValueError:
+            pass
+    delay = min(RATE_LIMIT_BASE_DELAY * 2 ** (retry - 1), RATE_LIMIT_MAX_DELAY)
+    return delay + random.uniform(0, delay / 2)
+
 
 async def generate_single_audio(client: httpx.AsyncClient, scene: dict, output_path: str) -> str:
     scene_num = scene["scene_number"]
     last_exception = None
+    rate_limited = 0
+    attempt = 0
 
-    for attempt in range(MAX_RETRIES):
+    while attempt < MAX_RETRIES:
         try:
-            if attempt > 0:
-                delay = RETRY_DELAYS[attempt - 1]
-                logger.info(f"Audio scène {scene_num} — retry {attempt}/{MAX_RETRIES - 1} dans {delay}s...")
-                await asyncio.sleep(delay)
-
             response = await client.post(
                 f"https://api.elevenlabs.io/v1/text-to-speech/{settings.ELEVENLABS_VOICE_ID}",
                 headers={
@@ -30,12 +65,23 @@ async def generate_single_audio(client: httpx.AsyncClient, scene: dict, output_p
                 },
                 json={
                     "text": scene["narration"],
-                    "model_id": "eleven_multilingual_v2",
-                    "voice_settings": {"stability": 0.5, "similarity_boost": 0.8}
+                    "model_id": TTS_MODEL_ID,
+                    "voice_settings": VOICE_SETTINGS
                 },
                 timeout=30
             )
 
+            # Rate limit — attendre puis relancer sans consommer de tentative
+            if response.status_code == 429 and rate_limited < MAX_RATE_LIMIT_RETRIES:
+                rate_limited += 1
+                delay = _rate_limit_delay(response, rate_limited)
+                logger.warning(
+                    f"Audio scène {scene_num} — HTTP 429, pause {delay:.1f}s "
+                    f"({rate_limited}/{MAX_RATE_LIMIT_RETRIES})"
+                )
+                await asyncio.sleep(delay)
+                continue
+
             # Vérifier si ElevenLabs a retourné une erreur JSON
             content_type = response.headers.get("content-type", "")
             if "application/json" in content_type or response.status_code != 200:
@@ -47,7 +93,7 @@ async def generate_single_audio(client: httpx.AsyncClient, scene: dict, output_p
 
                     # Quota épuisé — inutile de retry
                     if status == "quota_exceeded":
-                        raise Exception(
+                        raise QuotaExceededError(
                             f"ElevenLabs quota épuisé : {message}. "
                             f"Rechargez vos crédits sur https://elevenlabs.io"
                         )
@@ -78,37 +124,47 @@ async def generate_single_audio(client: httpx.AsyncClient, scene: dict, output_p
                         f"(premiers bytes: {content[:20].hex()})"
                     )
 
-            with open(output_path, "wb") as f:
-                f.write(content)
+            # Remplacement atomique : output_path peut être un lien vers une autre entrée du cache
+            if tts_cache:
+                tts_cache.store(tts_cache_key(scene["narration"]), content, output_path)
+            else:
+                write_atomic(output_path, content)
 
             logger.info(f"Audio scène {scene_num} généré ✅ : {len(content)} bytes (tentative {attempt + 1})")
             return output_path
 
+        except QuotaExceededError:
+            # Ne pas retry sur quota épuisé
+            logger.error(f"Audio scène {scene_num} — quota épuisé, abandon immédiat")
+            raise
         except Exception as e:
             last_exception = e
-            error_str = str(e)
+            logger.warning(f"Audio scène {scene_num} — tentative {attempt + 1}/{MAX_RETRIES} échouée : {e}")
 
-            # Ne pas retry sur quota épuisé
-            if "quota_épuisé" in error_str or "quota_exceeded" in error_str:
-                logger.error(f"Audio scène {scene_num} — quota épuisé, abandon immédiat")
-                raise
-
-            logger.warning(f"Audio scène {scene_num} — tentative {attempt + 1}/{MAX_RETRIES} échouée : {error_str}")
+        attempt += 1
+        if attempt < MAX_RETRIES:
+            delay = RETRY_DELAYS[attempt - 1]
+            logger.info(f"Audio scène {scene_num} — retry {attempt}/{MAX_RETRIES - 1} dans {delay}s...")
+            await asyncio.sleep(delay)
 
     logger.error(f"Audio scène {scene_num} — échec après {MAX_RETRIES} tentatives")
     raise Exception(f"Audio scène {scene_num} échouée après {MAX_RETRIES} tentatives : {last_exception}")
 
 
-async def generate_audio(video_id: int, scenes: list) -> list:
-    audio_dir = f"/app/outputs/audio/video_{video_id}"
-    os.makedirs(audio_dir, exist_ok=True)
-    audio_files = []
+AUDIO_ROOT = "/app/outputs/audio"
+
 
-    async with httpx.AsyncClient() as client:
-        for scene in scenes:
-            scene_num = scene["scene_number"]
-            output_path = f"{audio_dir}/scene_{scene_num}.mp3"
-            result = await generate_single_audio(client, scene, output_path)
-            audio_files.append(result)
+def audio_dir_for(video_id: int) -> str:
+    return f"{AUDIO_ROOT}/video_{video_id}"
 
-    return audio_files
\ No newline at end of file
+
+async def generate_scene_audio(client: httpx.AsyncClient, video_id: int, scene: dict) -> str:
+    """Narration d'une scène : cache TTS d'abord, sinon ElevenLabs (max TTS_CONCURRENCY global)."""
+    audio_dir = audio_dir_for(video_id)
+    os.makedirs(audio_dir, exist_ok=True)
+    output_path = f"{audio_dir}/scene_{scene['scene_number']}.mp3"
+    if tts_cache and tts_cache.materialize(tts_cache_key(scene["narration"]), output_path):
+        logger.info(f"Audio scène {scene['scene_number']} — cache TTS ✅")
+        return output_path
+    async with _tts_semaphore:
+        return await generate_single_audio(client, scene, output_path)
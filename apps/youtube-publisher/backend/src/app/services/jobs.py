@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.job import Job, JobStatus
+from app.models.video import Video, VideoStatus
+from shared.encode_scheduler import PRIORITY_NORMAL
+from app.services.pipeline import run_pipeline, run_pipeline_media, run_pipeline_preview, run_pipeline_resume
+from app.services.season import run_season
+
+logger = logging.getLogger(__name__)
+
+# Type de job → coroutine exécutée par le worker (argument : video_id, ou season_id pour "season")
+JOB_HANDLERS = {
+    "pipeline": run_pipeline,
+    "resume": run_pipeline_resume,
+    "media": run_pipeline_media,
+    "preview": run_pipeline_preview,
+    # Anciens types de reprise (jobs déjà en file) : reprise scène par scène via le manifeste
+    "resume_audio": run_pipeline_media,
+    "resume_assembly": run_pipeline_media,
+    "season": run_season,
+}
+
+# Types repris via run_pipeline_resume après une perte de worker (pas de retour au script)
+RESUMABLE_KINDS = {"pipeline", "resume", "media", "resume_audio", "resume_assembly"}
+
+ACTIVE_STATUSES = [JobStatus.QUEUED, JobStatus.RUNNING]
+
+
+def job_argument(kind: str, video_id: int | None, payload: dict | None) -> int | None:
+    """Argument du handler : season_id (payload) pour une saison, video_id sinon."""
+    if kind == "season":
+        return (payload or {}).get("season_id")
+    return video_id
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    video_id: int | None = None,
+    payload: dict | None = None,
+    priority: int = PRIORITY_NORMAL,
+) -> Job:
+    """Ajoute un job en file. Un seul job actif par vidéo : le job existant est renvoyé."""
+    if kind not in JOB_HANDLERS:
+        raise Exception(f"Type de job inconnu : {kind}")
+
+    if video_id is not None:
+        active = (
+            db.query(Job)
+            .filter(Job.video_id == video_id, Job.status.in_(ACTIVE_STATUSES))
+            .first()
+        )
+        if active:
+            logger.info(f"Job {active.id} déjà actif pour vidéo {video_id}, pas de doublon")
+            return active
+
+    job = Job(
+        kind=kind,
+        video_id=video_id,
+        payload=payload,
+        priority=priority,
+        status=JobStatus.QUEUED,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    logger.info(f"Job {job.id} ({kind}) en file pour vidéo {video_id}")
+    return job
+
+
+def claim_job(db: Session, worker_id: str) -> Job | None:
+    """
+    Prend le prochain job disponible (SELECT … FOR UPDATE SKIP LOCKED) :
+    en file, ou en cours avec un bail expiré (worker perdu).
+    Les jobs qui ont épuisé leurs tentatives sont marqués FAILED au passage.
+    """
+    while True:
+        now = _now()
+        job = (
+            db.query(Job)
+            .filter(or_(
+                Job.status == JobStatus.QUEUED,
+                and_(Job.status == JobStatus.RUNNING, Job.lease_expires_at < now),
+            ))
+            .order_by(Job.priority.desc(), Job.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not job:
+            db.rollback()
+            return None
+
+        if job.status == JobStatus.RUNNING:
+            logger.warning(f"Job {job.id} — bail expiré (worker {job.locked_by}), reprise")
+
+        if job.attempts >= job.max_attempts:
+            job.status = JobStatus.FAILED
+            job.error_message = f"Abandon après {job.attempts} tentatives (worker perdu)"
+            job.finished_at = now
+            job.locked_by = None
+            _fail_video(db, job.video_id, job.error_message)
+            db.commit()
+            logger.error(f"Job {job.id} abandonné : {job.error_message}")
+            continue
+
+        job.status = JobStatus.RUNNING
+        job.attempts = (job.attempts or 0) + 1
+        job.locked_by = worker_id
+        job.heartbeat_at = now
+        job.lease_expires_at = now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        job.started_at = now
+        db.commit()
+        db.refresh(job)
+        return job
+
+
+def heartbeat_job(db: Session, job_id: int, worker_id: str) -> bool:
+    """Prolonge le bail. False si le job a été repris par un autre worker."""
+    now = _now()
+    updated = (
+        db.query(Job)
+        .filter(Job.id == job_id, Job.locked_by == worker_id, Job.status == JobStatus.RUNNING)
+        .update(
+            {
+                Job.heartbeat_at: now,
+                Job.lease_expires_at: now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated == 1
+
+
+def finish_job(db: Session, job_id: int, worker_id: str, error: str | None = None) -> None:
+    job = db.query(Job).filter(Job.id == job_id, Job.locked_by == worker_id).first()
+    if not job:
+        logger.warning(f"Job {job_id} n'appartient plus au worker {worker_id}, résultat ignoré")
+        return
+    job.status = JobStatus.FAILED if error else JobStatus.DONE
+    job.error_message = error
+    job.finished_at = _now()
+    job.lease_expires_at = None
+    db.commit()
+
+
+def release_job(db: Session, job_id: int, worker_id: str) -> None:
+    """Remet un job interrompu (arrêt du worker) en file sans consommer de tentative."""
+    job = db.query(Job).filter(Job.id == job_id, Job.locked_by == worker_id).first()
+    if not job or job.status != JobStatus.RUNNING:
+        return
+    job.status = JobStatus.QUEUED
+    job.attempts = max((job.attempts or 1) - 1, 0)
+    job.locked_by = None
+    job.lease_expires_at = None
+    db.commit()
+    logger.info(f"Job {job_id} remis en file")
+
+
+def _fail_video(db: Session, video_id: int | None, error: str) -> None:
+    if video_id is None:
+        return
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if video:
+        video.status = VideoStatus.FAILED
+        video.error_message = error
+
+
+def queue_stats(db: Session) -> dict:
+    counts = dict(db.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+    return {status.value.lower(): counts.get(status, 0) for status in JobStatus}
+
+
+# Statistiques publiées par chaque worker (volume partagé avec l'API)
+WORKER_STATS_DIR = "/app/outputs/stats"
+WORKER_STATS_MAX_AGE = 120
+
+
+def write_worker_stats(worker_id: str, stats: dict) -> None:
+    os.makedirs(WORKER_STATS_DIR, exist_ok=True)
+    path = os.path.join(WORKER_STATS_DIR, f"worker_{worker_id}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"worker_id": worker_id, "updated_at": _now().isoformat(), **stats}, f)
+    os.replace(tmp, path)
+
+
+def read_worker_stats() -> list:
+    """Stats des workers vivants (fichier mis à jour depuis moins de WORKER_STATS_MAX_AGE)."""
+    if not os.path.isdir(WORKER_STATS_DIR):
+        return []
+    workers = []
+    now = time.time()
+    for name in sorted(os.listdir(WORKER_STATS_DIR)):
+        path = os.path.join(WORKER_STATS_DIR, name)
+        if not name.endswith(".json"):
+            continue
+        try:
+            if now - os.path.getmtime(path) > WORKER_STATS_MAX_AGE:
+                continue
+            with open(path) as f:
+                workers.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return workers
@@ -0,0 +1,111 @@
+import json
+import asyncio
+import logging
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import engine
+from shared.kie import TaskResult, get_client
+
+logger = logging.getLogger(__name__)
+
+# Client Kie.ai du processus (HTTP/2, débit limité, polling multiplexé)
+kie = get_client(
+    settings.KIE_AI_API_KEY,
+    rate=settings.KIE_RATE_PER_SECOND,
+    burst=settings.KIE_RATE_BURST,
+)
+
+# Canal Postgres : l'API reçoit les callbacks, les workers attendent les tâches
+KIE_CHANNEL = "kie_tasks"
+NOTIFY_MAX_BYTES = 7900   # limite pg_notify : 8000 octets
+
+
+def callbacks_enabled() -> bool:
+    """Callbacks actifs seulement avec un secret : sans lui l'endpoint public les refuse."""
+    return settings.KIE_CALLBACK_ENABLED and bool(settings.KIE_CALLBACK_TOKEN)
+
+
+def callback_url() -> str | None:
+    """URL à passer en callBackUrl au createTask (None si les callbacks sont désactivés)."""
+    if not callbacks_enabled():
+        return None
+    return f"{settings.BASE_URL.rstrip('/')}/api/kie/callback?token={settings.KIE_CALLBACK_TOKEN}"
+
+
+def resolve_task(task_id: str | None, record: dict | None) -> bool:
+    """
+    Termine l'attente d'une tâche de ce processus. `record` = données de la tâche
+    (state, resultJson, failMsg) ; None = relire l'état via recordInfo.
+    """
+    if not task_id:
+        return False
+    return kie.resolve(task_id, record)
+
+
+async def wait_for_task(task_id: str, model: str) -> TaskResult:
+    """
+    Attend la fin d'une tâche Kie.ai : résolue par le callback en quelques ms,
+    avec le polling multiplexé du client partagé en filet de sécurité
+    (espacé à KIE_FALLBACK_POLL_SECONDS quand le callback est actif).
+    """
+    return await kie.wait(
+        task_id,
+        model=model,
+        timeout=settings.KIE_TASK_TIMEOUT,
+        poll_floor=settings.KIE_FALLBACK_POLL_SECONDS if callbacks_enabled() else None,
+    )
+
+
+# ══════════════════════════════════════════════════════
+# 📡 RELAIS API → WORKERS (LISTEN / NOTIFY)
+# ══════════════════════════════════════════════════════
+
+def notify_task(db, task_id: str, record: dict | None) -> None:
+    """Relaie un callback reçu par l'API aux workers (pg_notify)."""
+    if engine.dialect.name != "postgresql":
+        return
+    payload = json.dumps({"taskId": task_id, "record": record})
+    if len(payload.encode()) > NOTIFY_MAX_BYTES:
+        # Trop gros pour NOTIFY : le worker relira recordInfo
+        payload = json.dumps({"taskId": task_id, "record": None})
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": KIE_CHANNEL, "payload": payload})
+    db.commit()
+
+
+def start_task_listener():
+    """
+    Worker : écoute le canal KIE_CHANNEL sur une connexion dédiée et résout
+    les tâches en attente. En cas de perte de la connexion, le polling de
+    secours prend le relais. Retourne la connexion (None hors Postgres).
+    """
+    if engine.dialect.name != "postgresql":
+        return None
+    import psycopg2.extensions
+
+    raw = engine.raw_connection()
+    raw.detach()
+    conn = raw.driver_connection
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {KIE_CHANNEL}")
+
+    loop = asyncio.get_running_loop()
+
+    def on_notify():
+        try:
+            conn.poll()
+        except Exception as e:
+            logger.warning(f"Écoute des callbacks Kie.ai interrompue, polling de secours seul : {e}")
+            loop.remove_reader(conn.fileno())
+            return
+        while conn.notifies:
+            notification = conn.notifies.pop(0)
+            try:
+                data = json.loads(notification.payload)
+            except ValueError:
+                continue
+            resolve_task(data.get("taskId"), data.get("record"))
+
+    loop.add_reader(conn.fileno(), on_notify)
+    logger.info(f"Écoute des callbacks Kie.ai (canal {KIE_CHANNEL})")
+    return conn
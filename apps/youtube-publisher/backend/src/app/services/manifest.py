@@ -0,0 +1,115 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Version du format : un manifeste d'une autre version est ignoré (tout est régénéré)
+MANIFEST_VERSION = 1
+ARTIFACT_KINDS = ("image", "audio", "clip", "preview")
+
+
+def fingerprint(*parts) -> str:
+    """Empreinte courte des entrées d'un artefact (prompt, narration, paramètres d'encodage...)."""
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()[:16]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _artifact_intact(entry: dict) -> bool:
+    """
+    Fichier présent et identique à celui enregistré. Taille + mtime inchangés :
+    fichier considéré intact sans relecture ; sinon le hash du contenu tranche.
+    """
+    path = entry.get("path")
+    if not path or not entry.get("sha256"):
+        return False
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if st.st_size != entry.get("size"):
+        return False
+    if st.st_mtime_ns == entry.get("mtime_ns"):
+        return True
+    return file_sha256(path) == entry["sha256"]
+
+
+class SceneManifest:
+    """
+    Manifeste des artefacts par scène (visuel, narration, clip encodé, clip d'aperçu) :
+    statut, chemin, hash du contenu, durée, task_id fournisseur et empreinte
+    des entrées. Un artefact est réutilisable à la reprise si son empreinte
+    correspond toujours à la scène et que le fichier est intact ; un clip
+    l'est en plus seulement si le visuel et la narration dont il est issu
+    n'ont pas changé.
+    """
+
+    def __init__(self, data: dict | None = None):
+        data = data or {}
+        scenes = data.get("scenes", {}) if data.get("version") == MANIFEST_VERSION else {}
+        self.scenes = {str(k): {kind: dict(e) for kind, e in v.items()} for k, v in scenes.items()}
+
+    def entry(self, index: int, kind: str) -> dict | None:
+        return self.scenes.get(str(index), {}).get(kind)
+
+    async def reusable(self, index: int, kind: str, expected: str, inputs: dict | None = None) -> dict | None:
+        """Entrée réutilisable telle quelle, None si l'artefact doit être (re)produit."""
+        entry = self.entry(index, kind)
+        if not entry or entry.get("status") != "done" or entry.get("fingerprint") != expected:
+            return None
+        if inputs is not None and entry.get("inputs") != inputs:
+            return None
+        if not await asyncio.to_thread(_artifact_intact, entry):
+            logger.info(f"Manifeste — {kind} scène {index + 1} absent ou modifié, régénération")
+            return None
+        return entry
+
+    async def record(self, index: int, kind: str, path: str, expected: str, **fields) -> dict:
+        """Enregistre un artefact terminé (hash calculé hors boucle d'événements)."""
+        sha256 = await asyncio.to_thread(file_sha256, path)
+        st = os.stat(path)
+        entry = {
+            "status": "done",
+            "path": path,
+            "sha256": sha256,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "fingerprint": expected,
+            "updated_at": int(time.time()),
+            **fields,
+        }
+        self.scenes.setdefault(str(index), {})[kind] = entry
+        return entry
+
+    def fail(self, index: int, kind: str, error: str) -> None:
+        self.scenes.setdefault(str(index), {})[kind] = {
+            "status": "failed",
+            "error": error[:500],
+            "updated_at": int(time.time()),
+        }
+
+    def to_json(self) -> dict:
+        """Nouvel objet à chaque appel : la colonne JSON est bien marquée modifiée."""
+        return {
+            "version": MANIFEST_VERSION,
+            "scenes": {k: {kind: dict(e) for kind, e in v.items()} for k, v in self.scenes.items()},
+        }
+
+    def summary(self, scene_count: int) -> dict:
+        """Nombre de scènes terminées par type d'artefact (sans vérifier les fichiers)."""
+        return {
+            kind: sum(
+                1 for i in range(scene_count)
+                if (self.entry(i, kind) or {}).get("status") == "done"
+            )
+            for kind in ARTIFACT_KINDS
+        }
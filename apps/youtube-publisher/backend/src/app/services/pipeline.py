@@ -1,11 +1,23 @@
+import os
+import asyncio
 import logging
 import httpx
 from app.core.database import SessionLocal
 from app.models.video import Video, VideoStatus
-from app.services.script import generate_script
-from app.services.image import generate_images
-from app.services.audio import generate_audio
-from app.services.video import assemble_video
+from app.services.script import stream_script
+from app.services.image import upload_character_references, generate_scene_visual
+from app.services.audio import generate_scene_audio, tts_cache_key, QuotaExceededError
+from app.services.video import (
+    TEMP_DIR, fetch_visual, build_scene_clip, finalize_video, get_audio_duration, caption_files,
+)
+from app.services.assembly import (
+    SCENE_VIDEO_FILTER, SCENE_VIDEO_ARGS, SCENE_AUDIO_ARGS,
+    PREVIEW_VIDEO_FILTER, PREVIEW_VIDEO_ARGS, PREVIEW_AUDIO_ARGS,
+)
+from app.services.manifest import SceneManifest, fingerprint
+from app.services.task_graph import TaskGraph
+from app.services.remotion import render_ken_burns_batch
+from app.services.workspace import workspaces
 from app.services.telegram import notify_video_ready, notify_video_failed
 from app.core.config import settings
 
@@ -29,6 +41,10 @@ async def trigger_n8n_webhook(video_id: int, title: str, description: str, tags:
                     "thumbnail_path": thumbnail_path,
                     "download_url": f"{settings.BASE_URL}/api/videos/{video_id}/download",
                     "thumbnail_url": f"{settings.BASE_URL}/api/videos/{video_id}/thumbnail" if thumbnail_path else None,
+                    "captions": {
+                        fmt: f"{settings.BASE_URL}/api/videos/{video_id}/captions/{fmt}"
+                        for fmt in caption_files(video_id)
+                    },
                 },
                 timeout=30
             )
@@ -37,30 +53,21 @@ async def trigger_n8n_webhook(video_id: int, title: str, description: str, tags:
         logger.warning(f"Webhook n8n échoué (non bloquant): {e}")
 
 
-async def _assemble_and_publish(video_id: int, video, images, audio_files, db):
-    """Étapes communes : assemblage FFmpeg + notifications + webhook n8n"""
-    video.status = VideoStatus.ASSEMBLING
-    db.commit()
-
-    result = await assemble_video(
-        video_id=video.id,
-        scenes=video.script,
-        image_urls=images,
-        audio_files=audio_files,
-        style=video.style or "storytelling",
-        title=video.title or video.topic,
-        video_format=video.format or "premium",
-    )
-
+async def _publish_result(video_id: int, video, result: dict, db):
+    """Enregistre les fichiers produits, passe la vidéo en READY et notifie."""
     video.final_video_path = result["video_path"]
     if hasattr(video, "thumbnail_path") and result.get("thumbnail_path"):
         video.thumbnail_path = result["thumbnail_path"]
     if hasattr(video, "subtitles_path") and result.get("subtitles_path"):
         video.subtitles_path = result["subtitles_path"]
+    # Rendu régénéré sans échelle HLS : l'ancienne ne correspond plus
+    video.hls_path = result.get("hls_path")
 
     video.status = VideoStatus.READY
     db.commit()
 
+    # Intermédiaires du rendu supprimés (conservés en cas d'échec pour la reprise)
+    await asyncio.to_thread(workspaces.release, video_id)
     logger.info(f"✅ Pipeline terminé pour vidéo {video_id}")
 
     await notify_video_ready(
@@ -70,50 +77,321 @@ async def _assemble_and_publish(video_id: int, video, images, audio_files, db):
     )
 
 
-async def run_pipeline(video_id: int):
-    """Pipeline complet depuis le début."""
-    db = SessionLocal()
-    try:
-        video = db.query(Video).filter(Video.id == video_id).first()
+def save_script(video, script_data: dict, db) -> None:
+    video.title = script_data["title"]
+    video.description = script_data["description"]
+    video.script = script_data["scenes"]
+    video.tags = script_data["tags"]
+
+    # Sauvegarder le résumé de cet épisode pour le suivant
+    if script_data.get("episode_summary"):
+        video.previous_summary = script_data["episode_summary"]
+
+    db.commit()
 
-        video.status = VideoStatus.SCRIPTING
+
+# Empreinte des paramètres d'encodage d'un clip de scène : les changer invalide les clips du manifeste
+CLIP_PROFILE = fingerprint(SCENE_VIDEO_FILTER, *SCENE_VIDEO_ARGS, *SCENE_AUDIO_ARGS)
+PREVIEW_PROFILE = fingerprint(PREVIEW_VIDEO_FILTER, *PREVIEW_VIDEO_ARGS, *PREVIEW_AUDIO_ARGS)
+
+
+def clip_inputs(visual: dict, narration: dict) -> dict:
+    """Entrées d'un clip de scène au manifeste : il n'est réutilisable que si elles sont inchangées."""
+    return {"image": visual["sha256"], "audio": narration["sha256"], "duration": narration["duration"]}
+
+
+async def _run_scene_graph(video_id: int, video, db, with_script: bool = True, preview: bool = False) -> dict:
+    """
+    Script, visuels, narrations et encodage par scène sous forme de graphe :
+      script ──▶ (scènes ajoutées au fil du streaming)
+      image:i ─┐
+               ├─▶ clip:i ─┐
+      audio:i ─┘           ├─▶ final
+                    ...    ┘
+    Chaque scène est ajoutée au graphe dès que Claude a fini de l'écrire :
+    son visuel et sa narration partent pendant que les scènes suivantes sont
+    encore en cours de génération. Le nœud final n'est ajouté qu'une fois le
+    script complet. Le statut suit l'étape la moins avancée
+    (script → images → audio → assemblage).
+
+    Chaque artefact terminé est inscrit au manifeste de la vidéo (scene_manifest).
+    Depuis un script existant, les visuels, narrations et clips encore valides
+    sont réutilisés : seules les scènes manquantes ou invalides sont refaites.
+
+    preview=True : mêmes visuels et narrations, clips et sortie au profil d'aperçu
+    (480p) — inscrits au manifeste sous "preview", sans toucher aux clips finaux.
+    """
+    video_format = video.format or "premium"
+    is_premium = (video_format == "premium")
+    os.makedirs(TEMP_DIR, exist_ok=True)
+
+    # Nouveau script : nouveau manifeste ; sinon reprise sur les artefacts déjà produits
+    manifest = SceneManifest(None if with_script else video.scene_manifest)
+    legacy_images = [] if with_script or video.scene_manifest else (video.scenes_images or [])
+    legacy_audio = [] if with_script or video.scene_manifest else (video.scenes_audio or [])
+    clip_kind = "preview" if preview else "clip"
+    clip_profile = PREVIEW_PROFILE if preview else CLIP_PROFILE
+    clip_key = fingerprint(clip_profile, is_premium)
+    # Format économique : Ken Burns de tout l'épisode en un seul rendu Remotion, une fois le script complet
+    batch_ken_burns = not is_premium and not preview and bool(settings.REMOTION_SERVICE_URL)
+    deferred_clips = []
+    reused = {"image": 0, "audio": 0, clip_kind: 0}
+
+    images = []
+    audio_files = []
+    audio_durations = []
+    visual_files = []
+    script_done = False
+    persisted = set()
+
+    def save_manifest():
+        video.scene_manifest = manifest.to_json()
         db.commit()
 
-        # Générer le script avec contexte épisode
-        script_data = await generate_script(
-            topic=video.topic,
-            style=video.style or "cinematique",
-            episode_number=video.episode_number or 1,
-            previous_summary=video.previous_summary
-        )
+    def sync_status():
+        if not script_done:
+            status = VideoStatus.SCRIPTING
+        elif any(img is None for img in images):
+            status = VideoStatus.GENERATING_IMAGES
+        elif any(a is None for a in audio_files):
+            status = VideoStatus.GENERATING_AUDIO
+        else:
+            status = VideoStatus.ASSEMBLING
+        if video.status != status:
+            video.status = status
+            db.commit()
+
+    def persist_media():
+        if not script_done:
+            return
+        if "images" not in persisted and all(img is not None for img in images):
+            persisted.add("images")
+            video.scenes_images = list(images)
+            db.commit()
+            logger.info(f"Vidéo {video_id} — {len(images)} visuels générés")
+        if "audio" not in persisted and all(a is not None for a in audio_files):
+            persisted.add("audio")
+            video.scenes_audio = list(audio_files)
+            db.commit()
+            logger.info(f"Vidéo {video_id} — {len(audio_files)} narrations générées")
+
+    def on_complete(key: str, result):
+        kind, _, index = key.partition(":")
+        if kind in ("image", "audio", "clip"):
+            save_manifest()
+        persist_media()
+        sync_status()
+
+    async def tracked(index: int, kind: str, coro):
+        """Inscrit l'échec d'un artefact au manifeste avant de propager l'erreur."""
+        try:
+            return await coro
+        except Exception as e:
+            manifest.fail(index, kind, str(e))
+            save_manifest()
+            raise
+
+    # Un échec n'interrompt pas les autres scènes : leurs artefacts sont acquis pour la reprise.
+    # Quota ElevenLabs épuisé : toutes les narrations échoueraient, le graphe est annulé
+    graph = TaskGraph(
+        f"video_{video_id}", on_complete=on_complete, keep_going=True, fatal=(QuotaExceededError,)
+    )
+
+    async def references() -> list:
+        return await upload_character_references() if is_premium else []
+
+    graph.add("references", references)
+
+    async with httpx.AsyncClient(follow_redirects=True, timeout=120) as download_client, \
+            httpx.AsyncClient() as tts_client:
+
+        def add_scene(scene: dict):
+            i = len(images)
+            images.append(None)
+            audio_files.append(None)
+            audio_durations.append(0.0)
+            visual_files.append(None)
+            image_key = fingerprint(video_format, scene.get("image_prompt", ""), scene.get("visual_url", ""))
+            audio_key = tts_cache_key(scene.get("narration", ""))
+
+            async def image(reference_urls: list) -> dict:
+                entry = await manifest.reusable(i, "image", image_key)
+                if entry:
+                    reused["image"] += 1
+                    images[i] = entry["url"]
+                    visual_files[i] = entry["path"]
+                    return entry
+
+                url = path = None
+                if scene.get("visual_url"):
+                    # Visuel de remplacement choisi par l'opérateur (PATCH de la scène)
+                    url = scene["visual_url"]
+                    path = await fetch_visual(download_client, video_id, i, url, is_premium)
+                elif i < len(legacy_images) and legacy_images[i]:
+                    # Vidéo antérieure au manifeste : visuel déjà généré, s'il est encore récupérable
+                    try:
+                        url = legacy_images[i]
+                        path = await fetch_visual(download_client, video_id, i, url, is_premium)
+                    except Exception as e:
+                        logger.warning(f"Scène {i + 1} — visuel existant irrécupérable, régénération : {e}")
+                        url = path = None
+
+                task_ids = []
+                if path is None:
+                    url = await generate_scene_visual(scene, video_format, reference_urls, on_task=task_ids.append)
+                    path = await fetch_visual(download_client, video_id, i, url, is_premium)
+                images[i] = url
+                visual_files[i] = path
+                return await manifest.record(
+                    i, "image", path, image_key, url=url, task_id=task_ids[-1] if task_ids else None,
+                )
+
+            async def audio() -> dict:
+                entry = await manifest.reusable(i, "audio", audio_key)
+                if entry:
+                    reused["audio"] += 1
+                else:
+                    if i < len(legacy_audio) and legacy_audio[i] and os.path.exists(legacy_audio[i]):
+                        path = legacy_audio[i]
+                    else:
+                        path = await generate_scene_audio(tts_client, video_id, scene)
+                    duration = await get_audio_duration(path)
+                    entry = await manifest.record(i, "audio", path, audio_key, duration=duration)
+                audio_files[i] = entry["path"]
+                audio_durations[i] = entry["duration"]
+                return entry
+
+            async def clip(visual: dict, narration: dict, ken_burns: dict | None = None) -> str:
+                inputs = clip_inputs(visual, narration)
+                entry = await manifest.reusable(i, clip_kind, clip_key, inputs)
+                if entry:
+                    reused[clip_kind] += 1
+                    return entry["path"]
+                path = await build_scene_clip(
+                    video_id, i, visual["path"], narration["path"], narration["duration"], is_premium, preview,
+                    ken_burns_segment=(ken_burns or {}).get(i), visual_sha256=visual["sha256"],
+                )
+                await manifest.record(i, clip_kind, path, clip_key, inputs=inputs, duration=narration["duration"])
+                return path
+
+            graph.add(
+                f"image:{i}",
+                lambda reference_urls: tracked(i, "image", image(reference_urls)),
+                deps=["references"],
+            )
+            graph.add(f"audio:{i}", lambda: tracked(i, "audio", audio()))
+            if batch_ken_burns:
+                deferred_clips.append((i, clip))
+            else:
+                graph.add(
+                    f"clip:{i}",
+                    lambda visual, narration: tracked(i, clip_kind, clip(visual, narration)),
+                    deps=[f"image:{i}", f"audio:{i}"],
+                )
+
+        async def ken_burns(*entries) -> dict:
+            """Un seul rendu Remotion pour les scènes dont le clip n'est pas réutilisable."""
+            count = len(entries) // 2
+            pending = []
+            for i, (visual, narration) in enumerate(zip(entries[:count], entries[count:])):
+                if not await manifest.reusable(i, clip_kind, clip_key, clip_inputs(visual, narration)):
+                    pending.append((i, visual, narration))
+            if not pending:
+                return {}
+
+            segments = await render_ken_burns_batch(
+                [
+                    {"image_path": visual["path"], "duration_ms": int(narration["duration"] * 1000), "direction": i % 3}
+                    for i, visual, narration in pending
+                ],
+                f"{workspaces.shared_path(video_id)}/kb_batch.mp4",
+            )
+            if segments is None:
+                # Service indisponible : rendu par scène (FFmpeg via le disjoncteur)
+                return {}
+            return {i: segment for (i, _, _), segment in zip(pending, segments)}
+
+        def add_final():
+            """Nœuds dépendant du script complet : Ken Burns groupé, clips différés, assemblage final."""
+            count = len(images)
+            if batch_ken_burns:
+                graph.add(
+                    "ken_burns", ken_burns,
+                    deps=[f"image:{i}" for i in range(count)] + [f"audio:{i}" for i in range(count)],
+                )
+                for i, clip in deferred_clips:
+                    graph.add(
+                        f"clip:{i}",
+                        lambda visual, narration, segments, i=i, clip=clip: tracked(
+                            i, clip_kind, clip(visual, narration, segments)
+                        ),
+                        deps=[f"image:{i}", f"audio:{i}", "ken_burns"],
+                    )
+            graph.add("final", final, deps=[f"clip:{i}" for i in range(count)])
+
+        async def final(*scene_clips) -> dict:
+            if not with_script:
+                logger.info(
+                    f"Vidéo {video_id} — reprise : {reused['image']} visuels, {reused['audio']} narrations "
+                    f"et {reused[clip_kind]} clips réutilisés sur {len(scene_clips)} scènes"
+                )
+            return await finalize_video(
+                video_id=video_id,
+                scenes=video.script,
+                scene_clips=list(scene_clips),
+                visual_files=visual_files,
+                audio_durations=audio_durations,
+                style=video.style or "storytelling",
+                title=video.title or video.topic,
+                preview=preview,
+            )
 
-        video.title = script_data["title"]
-        video.description = script_data["description"]
-        video.script = script_data["scenes"]
-        video.tags = script_data["tags"]
+        async def script() -> dict:
+            nonlocal script_done
+            # Générer le script avec contexte épisode, scène par scène
+            script_data = await stream_script(
+                topic=video.topic,
+                style=video.style or "cinematique",
+                episode_number=video.episode_number or 1,
+                previous_summary=video.previous_summary,
+                on_scene=add_scene,
+            )
 
-        # Sauvegarder le résumé de cet épisode pour le suivant
-        if script_data.get("episode_summary"):
-            video.previous_summary = script_data["episode_summary"]
+            save_script(video, script_data, db)
+            logger.info(f"Vidéo {video_id} — script terminé ({len(images)} scènes)")
+
+            script_done = True
+            persist_media()
+            add_final()
+            return script_data
+
+        if with_script:
+            graph.add("script", script)
+            video.status = VideoStatus.SCRIPTING
+            video.scene_manifest = manifest.to_json()
+        else:
+            for scene in video.script:
+                add_scene(scene)
+            script_done = True
+            add_final()
+            video.status = VideoStatus.GENERATING_IMAGES
+            video.error_message = None
 
         db.commit()
+        results = await graph.run()
 
-        video.status = VideoStatus.GENERATING_IMAGES
-        db.commit()
+    return results["final"]
 
-        # Générer les visuels selon le format
-        video_format = video.format or "premium"
-        images = await generate_images(video.script, format=video_format)
-        video.scenes_images = images
-        db.commit()
 
-        video.status = VideoStatus.GENERATING_AUDIO
-        db.commit()
-        audio_files = await generate_audio(video_id, video.script)
-        video.scenes_audio = audio_files
-        db.commit()
+async def run_pipeline(video_id: int):
+    """Pipeline complet depuis le début."""
+    db = SessionLocal()
+    try:
+        video = db.query(Video).filter(Video.id == video_id).first()
 
-        await _assemble_and_publish(video_id, video, images, audio_files, db)
+        # Script en streaming, visuels, narrations et clips de scène en graphe de dépendances
+        result = await _run_scene_graph(video_id, video, db)
+        await _publish_result(video_id, video, result, db)
 
     except Exception as e:
         logger.error(f"Pipeline échoué pour vidéo {video_id}: {e}")
@@ -130,32 +408,21 @@ async def run_pipeline(video_id: int):
         db.close()
 
 
-async def run_pipeline_from_audio(video_id: int):
-    """Reprend depuis l'audio — script + images déjà sauvegardés."""
+async def run_pipeline_media(video_id: int):
+    """Visuels, narrations et assemblage depuis un script déjà sauvegardé."""
     db = SessionLocal()
     try:
         video = db.query(Video).filter(Video.id == video_id).first()
 
         if not video.script:
-            raise Exception("Script manquant, impossible de reprendre depuis l'audio")
-        if not video.scenes_images:
-            raise Exception("Images manquantes, impossible de reprendre depuis l'audio")
-
-        logger.info(f"▶ Resume vidéo {video_id} depuis l'audio ({len(video.scenes_images)} images récupérées)")
+            raise Exception("Script manquant, impossible de lancer les médias")
 
-        images = video.scenes_images
-        video.status = VideoStatus.GENERATING_AUDIO
-        video.error_message = None
-        db.commit()
-
-        audio_files = await generate_audio(video_id, video.script)
-        video.scenes_audio = audio_files
-        db.commit()
-
-        await _assemble_and_publish(video_id, video, images, audio_files, db)
+        logger.info(f"▶ Médias vidéo {video_id} depuis le script ({len(video.script)} scènes)")
+        result = await _run_scene_graph(video_id, video, db, with_script=False)
+        await _publish_result(video_id, video, result, db)
 
     except Exception as e:
-        logger.error(f"Resume (audio) échoué pour vidéo {video_id}: {e}")
+        logger.error(f"Médias échoués pour vidéo {video_id}: {e}")
         video = db.query(Video).filter(Video.id == video_id).first()
         video.status = VideoStatus.FAILED
         video.error_message = str(e)
@@ -169,30 +436,28 @@ async def run_pipeline_from_audio(video_id: int):
         db.close()
 
 
-async def run_pipeline_from_assembly(video_id: int):
-    """Reprend depuis l'assemblage — script + images + audio déjà sauvegardés."""
+async def run_pipeline_preview(video_id: int):
+    """
+    Aperçu 480p (video_{id}_preview.mp4) : script et médias manquants générés,
+    artefacts existants réutilisés. Le rendu final reste à lancer (reprise).
+    """
     db = SessionLocal()
     try:
         video = db.query(Video).filter(Video.id == video_id).first()
 
-        if not video.script:
-            raise Exception("Script manquant")
-        if not video.scenes_images:
-            raise Exception("Images manquantes")
-        if not video.scenes_audio:
-            raise Exception("Audio manquant")
-
-        logger.info(f"▶ Resume vidéo {video_id} depuis l'assemblage")
+        logger.info(f"▶ Aperçu vidéo {video_id}")
+        result = await _run_scene_graph(video_id, video, db, with_script=not video.script, preview=True)
 
-        images = video.scenes_images
-        audio_files = video.scenes_audio
-        video.error_message = None
+        video.preview_path = result["video_path"]
+        # Rendu final déjà disponible : la vidéo reste prête ; sinon en attente de validation
+        has_final = bool(video.final_video_path and os.path.exists(video.final_video_path))
+        video.status = VideoStatus.READY if has_final else VideoStatus.DRAFT
         db.commit()
-
-        await _assemble_and_publish(video_id, video, images, audio_files, db)
+        await asyncio.to_thread(workspaces.release, video_id, True)
+        logger.info(f"✅ Aperçu prêt pour vidéo {video_id} : {result['video_path']}")
 
     except Exception as e:
-        logger.error(f"Resume (assembly) échoué pour vidéo {video_id}: {e}")
+        logger.error(f"Aperçu échoué pour vidéo {video_id}: {e}")
         video = db.query(Video).filter(Video.id == video_id).first()
         video.status = VideoStatus.FAILED
         video.error_message = str(e)
@@ -203,4 +468,31 @@ async def run_pipeline_from_assembly(video_id: int):
             error=str(e)
         )
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def resume_step(video) -> str:
+    """
+    Étape de reprise : 'media' dès que le script existe (visuels, narrations et
+    clips encore valides au manifeste réutilisés), sinon 'script'.
+    """
+    if video.script:
+        # Script conservé : indispensable à la continuité des épisodes suivants
+        return "media"
+    return "script"
+
+
+async def run_pipeline_resume(video_id: int):
+    """Reprend le pipeline depuis l'étape la plus avancée disponible."""
+    db = SessionLocal()
+    try:
+        video = db.query(Video).filter(Video.id == video_id).first()
+        step = resume_step(video) if video else "script"
+    finally:
+        db.close()
+
+    logger.info(f"Resume vidéo {video_id} depuis étape : {step}")
+    if step == "media":
+        await run_pipeline_media(video_id)
+    else:
+        await run_pipeline(video_id)
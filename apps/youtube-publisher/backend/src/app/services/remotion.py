@@ -1,14 +1,130 @@
+import time
 import logging
 import asyncio
-import subprocess
 from pathlib import Path
 import httpx
 from app.core.config import settings
+from app.services.assembly import run_ffmpeg
+from shared.stills import StillCache, ken_burns_loop_filter
 
 logger = logging.getLogger(__name__)
 
-# Limite globale : max 2 FFmpeg Ken Burns simultanés (économie mémoire)
-_ffmpeg_semaphore = asyncio.Semaphore(2)
+# Résolution de travail Ken Burns : 110% de 1920x1080 pour la marge de pan
+KB_WIDTH = 2112
+KB_HEIGHT = 1188
+KB_FPS = 25
+
+# Images pré-redimensionnées une seule fois à KB_WIDTH x KB_HEIGHT (Pillow, pool de processus)
+still_cache = StillCache(
+    settings.STILLS_CACHE_DIR,
+    settings.STILLS_CACHE_MAX_MB * 1024 * 1024,
+    workers=settings.STILLS_WORKERS,
+)
+
+# Rendus Remotion simultanés max (le service a sa propre charge CPU)
+_remotion_semaphore = asyncio.Semaphore(2)
+
+# Connexion refusée ou service muet : inutile d'attendre le timeout de rendu
+RENDER_TIMEOUT = httpx.Timeout(180, connect=5)
+BATCH_TIMEOUT_PER_SCENE = 60  # s ajoutées au timeout de rendu par scène d'un lot
+HEALTH_TIMEOUT = 3
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur du service Remotion :
+      closed ──(N échecs consécutifs)──▶ open ──(cooldown écoulé)──▶ sonde /health
+        ▲                                  ▲                            │
+        └────── succès ◀── half_open ◀── OK └─────────── KO ◀──────────┘
+    Ouvert, les rendus partent directement sur FFmpeg sans appel réseau. Une seule
+    sonde à la fois : les scènes concurrentes attendent son résultat au lieu de
+    sonder chacune. Un échec en half_open rouvre pour un nouveau cooldown.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.cooldown_seconds = cooldown_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.short_circuited = 0
+        self.trips = 0
+        self.last_probe = None
+        self._probe_lock = asyncio.Lock()
+
+    def _cooling_down(self) -> bool:
+        return self.state == "open" and time.monotonic() - self.opened_at < self.cooldown_seconds
+
+    async def allow(self) -> bool:
+        """True si un rendu peut être tenté sur le service."""
+        if self.state != "open":
+            return True
+        if not self._cooling_down():
+            async with self._probe_lock:
+                # Re-vérifié sous le verrou : une autre scène a peut-être déjà sondé
+                if self.state == "open" and not self._cooling_down():
+                    healthy = await _probe_health()
+                    self.last_probe = {"at": int(time.time()), "healthy": healthy}
+                    if healthy:
+                        self.state = "half_open"
+                        logger.info("Remotion /health OK — disjoncteur semi-ouvert")
+                    else:
+                        self._open("sonde /health en échec")
+        if self.state == "open":
+            self.short_circuited += 1
+            return False
+        return True
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Remotion rétabli — disjoncteur fermé")
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self, reason: str) -> None:
+        self.failures += 1
+        # Déjà ouvert (échecs de rendus lancés avant l'ouverture) : le cooldown n'est pas prolongé
+        if self.state == "open":
+            return
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self._open(reason)
+
+    def _open(self, reason: str) -> None:
+        self.trips += 1
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        logger.warning(
+            f"Disjoncteur Remotion ouvert {self.cooldown_seconds:.0f}s ({reason}) — Ken Burns FFmpeg"
+        )
+
+    def stats(self) -> dict:
+        retry_in = 0.0
+        if self.state == "open":
+            retry_in = max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "short_circuited": self.short_circuited,
+            "retry_in_seconds": round(retry_in, 1),
+            "last_probe": self.last_probe,
+        }
+
+
+breaker = CircuitBreaker(
+    failure_threshold=settings.REMOTION_FAILURE_THRESHOLD,
+    cooldown_seconds=settings.REMOTION_COOLDOWN_SECONDS,
+)
+
+
+async def _probe_health() -> bool:
+    try:
+        async with httpx.AsyncClient(timeout=HEALTH_TIMEOUT) as client:
+            resp = await client.get(f"{settings.REMOTION_SERVICE_URL}/health")
+        return resp.status_code == 200
+    except Exception as e:
+        logger.warning(f"Remotion /health injoignable : {e}")
+        return False
 
 
 async def render_ken_burns(image_path: str, duration_ms: int, output_path: str, direction: int = 0) -> str:
@@ -30,85 +146,116 @@ async def render_ken_burns(image_path: str, duration_ms: int, output_path: str,
         return await _ffmpeg_ken_burns(image_path, duration_ms, output_path, direction)
 
     try:
-        async with httpx.AsyncClient(timeout=180) as client:
-            resp = await client.post(
-                f"{settings.REMOTION_SERVICE_URL}/render",
-                json={
-                    "image_path": image_path,
-                    "duration_ms": duration_ms,
-                    "output_path": output_path,
-                    "direction": direction,
-                },
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            if data.get("success"):
-                logger.info(f"Remotion Ken Burns OK: {output_path}")
-                return output_path
-            raise RuntimeError(data.get("error", "Remotion error inconnu"))
+        async with _remotion_semaphore:
+            # Vérifié une fois le slot obtenu : le disjoncteur a pu s'ouvrir pendant l'attente
+            allowed = await breaker.allow()
+            if allowed:
+                async with httpx.AsyncClient(timeout=RENDER_TIMEOUT) as client:
+                    resp = await client.post(
+                        f"{settings.REMOTION_SERVICE_URL}/render",
+                        json={
+                            "image_path": image_path,
+                            "duration_ms": duration_ms,
+                            "output_path": output_path,
+                            "direction": direction,
+                        },
+                    )
+                    resp.raise_for_status()
+                    data = resp.json()
+                    if data.get("success"):
+                        breaker.record_success()
+                        logger.info(f"Remotion Ken Burns OK: {output_path}")
+                        return output_path
+                    raise RuntimeError(data.get("error", "Remotion error inconnu"))
     except Exception as e:
+        breaker.record_failure(str(e)[:200] or type(e).__name__)
         logger.warning(f"Remotion indisponible ({e}), Ken Burns FFmpeg pour {image_path}")
-        return await _ffmpeg_ken_burns(image_path, duration_ms, output_path, direction)
+    return await _ffmpeg_ken_burns(image_path, duration_ms, output_path, direction)
 
 
-async def _ffmpeg_ken_burns(image_path: str, duration_ms: int, output_path: str, direction: int = 0) -> str:
-    """FFmpeg Ken Burns rapide : scale oversized + crop linéaire.
-    Limité à 3 processus simultanés via semaphore global.
+async def render_ken_burns_batch(scenes: list, output_path: str) -> list | None:
     """
-    async with _ffmpeg_semaphore:
-        return await _ffmpeg_ken_burns_inner(image_path, duration_ms, output_path, direction)
+    Ken Burns de toutes les scènes d'un épisode en un seul rendu Remotion (/render-batch) :
+    navigateur, composition et encodeur initialisés une fois par épisode.
+
+    Args:
+        scenes: [{"image_path", "duration_ms", "direction"}] dans l'ordre
+        output_path: MP4 muet unique, scènes bout à bout
 
+    Returns:
+        [(output_path, début en secondes)] par scène, ou None si le service est
+        indisponible (l'appelant rend alors scène par scène, FFmpeg en secours)
+    """
+    if not settings.REMOTION_SERVICE_URL or not scenes:
+        return None
 
-async def _ffmpeg_ken_burns_inner(image_path: str, duration_ms: int, output_path: str, direction: int = 0) -> str:
+    try:
+        async with _remotion_semaphore:
+            if not await breaker.allow():
+                return None
+            timeout = httpx.Timeout(RENDER_TIMEOUT.read + BATCH_TIMEOUT_PER_SCENE * len(scenes), connect=5)
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                resp = await client.post(
+                    f"{settings.REMOTION_SERVICE_URL}/render-batch",
+                    json={"scenes": scenes, "output_path": output_path},
+                )
+                resp.raise_for_status()
+                data = resp.json()
+        if not data.get("success") or len(data.get("scenes", [])) != len(scenes):
+            raise RuntimeError(data.get("error", "Remotion batch : réponse incomplète"))
+    except Exception as e:
+        breaker.record_failure(str(e)[:200] or type(e).__name__)
+        logger.warning(f"Remotion batch indisponible ({e}), Ken Burns scène par scène")
+        return None
+
+    breaker.record_success()
+    fps = data.get("fps", KB_FPS)
+    logger.info(f"Remotion Ken Burns batch OK : {len(scenes)} scènes → {output_path}")
+    return [(output_path, scene["start_frame"] / fps) for scene in data["scenes"]]
+
+
+async def _ffmpeg_ken_burns(image_path: str, duration_ms: int, output_path: str, direction: int = 0) -> str:
+    """FFmpeg Ken Burns rapide : image pré-redimensionnée + crop linéaire (slot de l'ordonnanceur FFmpeg)."""
     duration_sec = max(1, duration_ms / 1000)
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
 
-    # Scale à 110% pour avoir de la marge de pan (2112x1188 ≈ 1920*1.1)
-    # Puis crop 1920x1080 qui se déplace linéairement selon t
-    pan_x = 192  # pixels disponibles en X (2112 - 1920)
-    pan_y = 108  # pixels disponibles en Y (1188 - 1080)
+    # Image déjà à 110% (2112x1188), décodée une fois et répétée en mémoire :
+    # le filtre par frame se limite au crop 1920x1080 qui se déplace linéairement selon t
+    try:
+        still_path = await still_cache.prescale(image_path, KB_WIDTH, KB_HEIGHT)
+    except Exception as e:
+        logger.warning(f"Pré-redimensionnement impossible ({e}), Ken Burns statique pour {image_path}")
+        return await _ffmpeg_static(image_path, duration_ms, output_path)
+
+    pan_x = KB_WIDTH - 1920  # pixels disponibles en X
+    pan_y = KB_HEIGHT - 1080  # pixels disponibles en Y
 
     if direction == 1:
         # Pan haut-gauche → bas-droite
-        crop_filter = (
-            f"scale=2112:1188:force_original_aspect_ratio=increase,"
-            f"crop=1920:1080:x='min({pan_x}*t/{duration_sec},{pan_x})':y='min({pan_y}*t/{duration_sec},{pan_y})'"
-        )
+        crop_filter = f"crop=1920:1080:x='min({pan_x}*t/{duration_sec},{pan_x})':y='min({pan_y}*t/{duration_sec},{pan_y})'"
     elif direction == 2:
         # Pan bas-droite → haut-gauche
-        crop_filter = (
-            f"scale=2112:1188:force_original_aspect_ratio=increase,"
-            f"crop=1920:1080:x='{pan_x}-min({pan_x}*t/{duration_sec},{pan_x})':y='{pan_y}-min({pan_y}*t/{duration_sec},{pan_y})'"
-        )
+        crop_filter = f"crop=1920:1080:x='{pan_x}-min({pan_x}*t/{duration_sec},{pan_x})':y='{pan_y}-min({pan_y}*t/{duration_sec},{pan_y})'"
     else:
         # Zoom progressif au centre (crop qui rétrécit du bord vers centre)
-        crop_filter = (
-            f"scale=2112:1188:force_original_aspect_ratio=increase,"
-            f"crop=1920:1080:x='{pan_x}/2-min({pan_x}/2*t/{duration_sec},{pan_x}/2)':y='{pan_y}/2-min({pan_y}/2*t/{duration_sec},{pan_y}/2)'"
-        )
+        crop_filter = f"crop=1920:1080:x='{pan_x}/2-min({pan_x}/2*t/{duration_sec},{pan_x}/2)':y='{pan_y}/2-min({pan_y}/2*t/{duration_sec},{pan_y}/2)'"
 
     cmd = [
         "ffmpeg", "-y",
-        "-loop", "1",
-        "-i", image_path,
+        "-i", still_path,
+        "-vf", f"{ken_burns_loop_filter(KB_FPS)},{crop_filter}",
         "-t", str(duration_sec),
-        "-vf", crop_filter,
         "-c:v", "libx264", "-preset", "ultrafast",
         "-pix_fmt", "yuv420p",
-        "-r", "25",
+        "-r", str(KB_FPS),
         "-an",
         output_path,
     ]
 
-    proc = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-    _, stderr = await proc.communicate()
+    returncode, stderr = await run_ffmpeg(cmd)
 
-    if proc.returncode != 0:
-        logger.warning(f"FFmpeg Ken Burns failed, retrying static: {stderr.decode()[-200:]}")
+    if returncode != 0:
+        logger.warning(f"FFmpeg Ken Burns failed, retrying static: {stderr[-200:]}")
         return await _ffmpeg_static(image_path, duration_ms, output_path)
 
     logger.info(f"FFmpeg Ken Burns OK (dir={direction}): {output_path}")
@@ -134,15 +281,10 @@ async def _ffmpeg_static(image_path: str, duration_ms: int, output_path: str) ->
         output_path,
     ]
 
-    proc = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-    _, stderr = await proc.communicate()
+    returncode, stderr = await run_ffmpeg(cmd)
 
-    if proc.returncode != 0:
-        raise RuntimeError(f"FFmpeg static fallback failed: {stderr.decode()[-500:]}")
+    if returncode != 0:
+        raise RuntimeError(f"FFmpeg static fallback failed: {stderr[-500:]}")
 
     logger.info(f"FFmpeg static fallback OK: {output_path}")
     return output_path
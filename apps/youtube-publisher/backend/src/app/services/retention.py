@@ -0,0 +1,109 @@
+import logging
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.video import Video, VideoStatus
+from app.services.audio import AUDIO_ROOT
+from app.services.image import IMAGES_DIR
+from app.services.video import VIDEO_DIR, TEMP_DIR, THUMBNAIL_DIR, HLS_DIR
+from app.services.workspace import workspaces
+from shared.retention import RetentionEngine, RetentionPolicy, REPORT_MAX_ACTIONS
+
+logger = logging.getLogger(__name__)
+
+PUBLISHED = VideoStatus.PUBLISHED.value
+FAILED = VideoStatus.FAILED.value
+
+
+def _build_engine() -> RetentionEngine:
+    """
+    Politiques par classe d'artefacts. Les vidéos en cours de génération, prêtes ou
+    en upload ne sont jamais touchées : seuls les statuts listés déclenchent une action.
+    """
+    # Intermédiaires (narrations, visuels, clips de scène) : inutiles une fois la vidéo
+    # publiée ; conservés RETENTION_FAILED_DAYS jours après un échec pour la reprise
+    scratch = {PUBLISHED: 0, FAILED: settings.RETENTION_FAILED_DAYS * 24}
+    finals = {PUBLISHED: settings.RETENTION_ARCHIVE_DAYS * 24} if settings.RETENTION_ARCHIVE_DAYS > 0 else {}
+
+    policies = [
+        RetentionPolicy("audio", AUDIO_ROOT, r"video_(?P<owner>\d+)", expire_after=scratch),
+        RetentionPolicy("temp", TEMP_DIR, r"video_(?P<owner>\d+)_.+", expire_after=scratch),
+        # Images Flux (scene_{n}_{task_id}.jpg) : propriétaire retrouvé via scenes_images / manifeste
+        RetentionPolicy("images", IMAGES_DIR, r"scene_\d+_.+\.jpg", expire_after=scratch),
+        RetentionPolicy("previews", VIDEO_DIR, r"video_(?P<owner>\d+)_preview\.mp4", expire_after={PUBLISHED: 0}),
+        RetentionPolicy("finals", VIDEO_DIR, r"video_(?P<owner>\d+)\.(mp4|srt|vtt)", action="archive", expire_after=finals),
+        # Échelle HLS : sert la lecture du rendu final, supprimée quand celui-ci est archivé
+        RetentionPolicy("hls", HLS_DIR, r"video_(?P<owner>\d+)", expire_after=finals),
+        # Miniatures : légères et affichées par le front, seules les orphelines partent
+        RetentionPolicy("thumbnails", THUMBNAIL_DIR, r"video_(?P<owner>\d+)_thumbnail\.jpg"),
+    ]
+    for root in sorted({workspaces.root, workspaces.shared_root}):
+        policies.append(
+            RetentionPolicy("workspace", root, r"video_(?P<owner>\d+)(_preview)?", expire_after=scratch)
+        )
+
+    return RetentionEngine(
+        policies,
+        archive_dir=settings.RETENTION_ARCHIVE_DIR,
+        orphan_grace_hours=settings.RETENTION_ORPHAN_HOURS,
+        lock_path=f"{TEMP_DIR}/.retention.lock",
+    )
+
+
+engine = _build_engine()
+
+
+def _local_references(video) -> list:
+    """Chemins locaux référencés par une vidéo (visuels hors TEMP_DIR)."""
+    paths = [p for p in (video.scenes_images or []) if p]
+    for kinds in ((video.scene_manifest or {}).get("scenes") or {}).values():
+        image = kinds.get("image") or {}
+        paths += [image.get("url"), image.get("path")]
+    return [p for p in paths if isinstance(p, str) and p.startswith("/")]
+
+
+def _owners_and_references(db) -> tuple[dict, dict]:
+    owners, references = {}, {}
+    rows = db.query(Video.id, Video.status, Video.scenes_images, Video.scene_manifest).all()
+    for video in rows:
+        owner = str(video.id)
+        owners[owner] = video.status.value if video.status else None
+        for path in _local_references(video):
+            references[path] = owner
+    return owners, references
+
+
+def run_retention(dry_run: bool = False) -> dict | None:
+    """
+    Une passe de rétention sur /app/outputs. Les rendus finaux archivés sont
+    repointés en base. Rapport tronqué à REPORT_MAX_ACTIONS actions.
+    """
+    db = SessionLocal()
+    try:
+        owners, references = _owners_and_references(db)
+        report = engine.run(owners, references, dry_run=dry_run)
+        if report is None:
+            return None
+
+        archived = {
+            a["path"]: a["target"] for a in report["actions"]
+            if a["action"] == "archive" and "target" in a
+        }
+        if archived:
+            for video in db.query(Video).filter(Video.final_video_path.in_(list(archived))).all():
+                video.final_video_path = archived[video.final_video_path]
+            db.commit()
+
+        report["actions_total"] = len(report["actions"])
+        report["actions"] = report["actions"][:REPORT_MAX_ACTIONS]
+        return report
+    finally:
+        db.close()
+
+
+def purge_video_files(video) -> int:
+    """Supprime tous les fichiers d'une vidéo (suppression de la ligne en base)."""
+    references = {path: str(video.id) for path in _local_references(video)}
+    freed = engine.purge(str(video.id), references)
+    if freed:
+        logger.info(f"Vidéo {video.id} — {freed / 1024 / 1024:.0f} Mo de fichiers supprimés")
+    return freed
@@ -1,8 +1,16 @@
+import re
 import json
+import logging
+from typing import Callable
 import anthropic
 from app.core.config import settings
 
-client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+logger = logging.getLogger(__name__)
+
+client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+
+SCRIPT_MODEL = "claude-opus-4-5"
+SCRIPT_MAX_TOKENS = 8000
 
 # ── Personnages fixes pour toute la chaîne ──────────────────────
 CHARACTERS = {
@@ -25,12 +33,12 @@ CHARACTER_VISUAL_BASE = (
 )
 
 
-async def generate_script(
+def build_script_prompt(
     topic: str,
     style: str = "cinematique",
     episode_number: int = 1,
     previous_summary: str = None
-) -> dict:
+) -> str:
 
     # Construction du contexte de continuité
     continuity_context = ""
@@ -89,12 +97,131 @@ Réponds UNIQUEMENT en JSON strict, sans texte avant ou après :
   ]
 }}"""
 
-    message = client.messages.create(
-        model="claude-opus-4-5",
-        max_tokens=8000,
+    return prompt
+
+
+# ══════════════════════════════════════════════════════
+# 🧩 PARSING INCRÉMENTAL DES SCÈNES
+# ══════════════════════════════════════════════════════
+
+class SceneStreamParser:
+    """
+    Parser JSON incrémental : reçoit le texte au fil du streaming et renvoie
+    chaque objet du tableau "scenes" dès que son accolade fermante arrive.
+    Suit l'état chaîne / échappement et la profondeur d'imbrication, sans
+    jamais re-scanner le texte déjà lu.
+    """
+
+    SCENES_KEY = re.compile(r'"scenes"\s*:\s*\[')
+
+    def __init__(self):
+        self.buffer = ""
+        self.emitted = 0
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None
+
+    def feed(self, chunk: str) -> list[dict]:
+        self.buffer += chunk
+        scenes = []
+        if self._done:
+            return scenes
+        if not self._in_array:
+            match = self.SCENES_KEY.search(self.buffer)
+            if not match:
+                return scenes
+            self._in_array = True
+            self._pos = match.end()
+
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf):
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in "{[":
+                if self._depth == 0 and c == "{":
+                    self._start = i
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 0:
+                    # Fin du tableau "scenes"
+                    self._done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._start is not None:
+                    try:
+                        scenes.append(json.loads(buf[self._start:i + 1]))
+                    except json.JSONDecodeError as e:
+                        # On s'arrête là pour garder l'ordre : la suite viendra du parsing final
+                        logger.warning(f"Scène {self.emitted + 1} illisible en streaming : {e}")
+                        self._done = True
+                        break
+                    self.emitted += 1
+                    self._start = None
+            i += 1
+        self._pos = i
+        return scenes
+
+
+def parse_script(response: str) -> dict:
+    cleaned = response.replace("```json", "").replace("```", "").strip()
+    return json.loads(cleaned)
+
+
+# ══════════════════════════════════════════════════════
+# ✍️ GÉNÉRATION
+# ══════════════════════════════════════════════════════
+
+async def stream_script(
+    topic: str,
+    style: str = "cinematique",
+    episode_number: int = 1,
+    previous_summary: str = None,
+    on_scene: Callable[[dict], None] | None = None
+) -> dict:
+    """
+    Génère le script en streaming. `on_scene(scene)` est appelé dès qu'une
+    scène est complète (dans l'ordre), pendant que Claude écrit les suivantes.
+    Les scènes que le parser incrémental n'a pas pu émettre le sont après le
+    parsing final. Retourne le script complet.
+    """
+    prompt = build_script_prompt(topic, style, episode_number, previous_summary)
+    parser = SceneStreamParser()
+
+    async with client.messages.stream(
+        model=SCRIPT_MODEL,
+        max_tokens=SCRIPT_MAX_TOKENS,
         messages=[{"role": "user", "content": prompt}]
-    )
+    ) as stream:
+        async for text in stream.text_stream:
+            for scene in parser.feed(text):
+                logger.info(f"Script — scène {scene.get('scene_number', parser.emitted)} reçue")
+                if on_scene:
+                    on_scene(scene)
 
-    response = message.content[0].text
-    cleaned = response.replace("```json", "").replace("```", "").strip()
-    return json.loads(cleaned)
\ No newline at end of file
+    script_data = parse_script(parser.buffer)
+    if on_scene:
+        for scene in script_data["scenes"][parser.emitted:]:
+            on_scene(scene)
+    return script_data
+
+
+async def generate_script(
+    topic: str,
+    style: str = "cinematique",
+    episode_number: int = 1,
+    previous_summary: str = None
+) -> dict:
+    return await stream_script(topic, style, episode_number, previous_summary)
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.season import Season, SeasonStatus
+from app.models.video import Video, VideoStatus
+from app.services.script import stream_script
+from app.services.pipeline import save_script, run_pipeline_media, run_pipeline_resume
+from shared.encode_scheduler import EncodeScheduler, PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+# Statuts à partir desquels un épisode ne bouge plus sans action manuelle
+FINISHED_STATUSES = {VideoStatus.READY, VideoStatus.UPLOADING, VideoStatus.PUBLISHED, VideoStatus.FAILED}
+
+
+def season_videos(db: Session, season_id: int) -> list:
+    return (
+        db.query(Video)
+        .filter(Video.season_id == season_id)
+        .order_by(Video.episode_number, Video.id)
+        .all()
+    )
+
+
+async def run_season(season_id: int):
+    """
+    Génère une saison en lot.
+
+    Les scripts sont écrits l'un après l'autre (l'épisode n reçoit le résumé de
+    l'épisode n-1), mais les médias d'un épisode partent dès que son script est
+    sauvegardé : jobs 'media' en priorité basse répartis sur les workers, ou,
+    file désactivée, tâches de ce processus (WORKER_CONCURRENCY épisodes max).
+    Les limites globales restent celles des services (KIE, TTS, slots FFmpeg).
+    Relancée après un échec, la saison reprend au premier script manquant.
+    """
+    from app.services.jobs import enqueue_job  # import local : jobs référence ce module
+
+    db = SessionLocal()
+    renders = []
+    limit = asyncio.Semaphore(max(settings.WORKER_CONCURRENCY, 1))
+
+    async def render(video_id: int, resume: bool):
+        async with limit:
+            with EncodeScheduler.priority(PRIORITY_BULK):
+                await (run_pipeline_resume if resume else run_pipeline_media)(video_id)
+
+    def dispatch_media(video):
+        resume = video.status == VideoStatus.FAILED
+        if settings.JOB_QUEUE_ENABLED:
+            enqueue_job(db, "resume" if resume else "media", video.id, priority=PRIORITY_BULK)
+        else:
+            renders.append(asyncio.create_task(render(video.id, resume)))
+
+    try:
+        season = db.query(Season).filter(Season.id == season_id).first()
+        if not season:
+            raise Exception(f"Saison {season_id} introuvable")
+
+        season.status = SeasonStatus.SCRIPTING
+        season.error_message = None
+        db.commit()
+
+        videos = season_videos(db, season_id)
+        previous_summary = None
+        for video in videos:
+            if video.script:
+                # Script déjà écrit (reprise) : relancer seulement les médias non aboutis
+                previous_summary = video.previous_summary
+                if video.status in (VideoStatus.DRAFT, VideoStatus.SCRIPTING, VideoStatus.FAILED):
+                    dispatch_media(video)
+                continue
+
+            if previous_summary:
+                video.previous_summary = previous_summary
+            video.status = VideoStatus.SCRIPTING
+            video.error_message = None
+            db.commit()
+
+            try:
+                script_data = await stream_script(
+                    topic=video.topic,
+                    style=video.style or "cinematique",
+                    episode_number=video.episode_number or 1,
+                    previous_summary=video.previous_summary,
+                )
+            except Exception as e:
+                video.status = VideoStatus.FAILED
+                video.error_message = str(e)
+                db.commit()
+                raise Exception(f"Script de l'épisode {video.episode_number} échoué : {e}")
+
+            save_script(video, script_data, db)
+            previous_summary = video.previous_summary
+            season.scripted = sum(1 for v in videos if v.script)
+            db.commit()
+            logger.info(f"Saison {season_id} — script {season.scripted}/{len(videos)} écrit, médias lancés")
+            dispatch_media(video)
+
+        season.scripted = len(videos)
+        season.status = SeasonStatus.RENDERING
+        db.commit()
+        logger.info(f"Saison {season_id} — {len(videos)} scripts écrits")
+
+        if renders:
+            await asyncio.gather(*renders)
+            db.expire_all()
+            failed = [v.episode_number for v in season_videos(db, season_id) if v.status == VideoStatus.FAILED]
+            if failed:
+                # Épisodes à relancer via /season/{id}/resume : la saison n'est pas terminée
+                season.status = SeasonStatus.FAILED
+                season.error_message = f"{len(failed)} épisode(s) en échec : {', '.join(map(str, failed))}"
+                logger.error(f"Saison {season_id} — {season.error_message}")
+            else:
+                season.status = SeasonStatus.DONE
+            db.commit()
+
+    except Exception as e:
+        logger.error(f"Saison {season_id} échouée : {e}")
+        db.rollback()
+        season = db.query(Season).filter(Season.id == season_id).first()
+        if season:
+            season.status = SeasonStatus.FAILED
+            season.error_message = str(e)
+            db.commit()
+        # Les médias des épisodes déjà scriptés continuent
+        if renders:
+            await asyncio.gather(*renders, return_exceptions=True)
+    finally:
+        db.close()
+
+
+def season_progress(db: Session, season: Season) -> dict:
+    """Avancement global : scripts écrits + épisodes terminés, et détail par épisode."""
+    videos = season_videos(db, season.id)
+    total = len(videos)
+    scripted = sum(1 for v in videos if v.script)
+    finished = sum(1 for v in videos if v.status in FINISHED_STATUSES)
+
+    counts = {}
+    for v in videos:
+        counts[v.status.value] = counts.get(v.status.value, 0) + 1
+
+    status = season.status
+    if status == SeasonStatus.RENDERING and finished == total:
+        status = SeasonStatus.DONE
+
+    return {
+        "season_id": season.id,
+        "serie_id": season.serie_id,
+        "status": status,
+        "error_message": season.error_message,
+        "episodes_total": total,
+        "scripted": scripted,
+        "finished": finished,
+        "failed": counts.get(VideoStatus.FAILED.value, 0),
+        "progress": round((scripted + finished) / (2 * total), 3) if total else 0.0,
+        "by_status": counts,
+        "episodes": [
+            {
+                "video_id": v.id,
+                "episode_number": v.episode_number,
+                "topic": v.topic,
+                "title": v.title,
+                "status": v.status,
+                "error_message": v.error_message,
+            }
+            for v in videos
+        ],
+    }
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class TaskGraph:
+    """
+    Exécuteur de graphe de dépendances asynchrone.
+
+    Chaque nœud démarre dès que ses dépendances sont terminées et reçoit leurs
+    résultats en arguments (dans l'ordre de `deps`). Des nœuds peuvent être
+    ajoutés pendant l'exécution. Au premier échec, tous les nœuds encore en
+    cours sont annulés et l'exception est propagée par `run()`.
+    Avec keep_going=True, les nœuds indépendants de l'échec vont à leur terme
+    (leur résultat reste acquis, ex. checkpoint) avant la propagation — sauf pour
+    les exceptions de `fatal` (ex. quota épuisé) : inutile de continuer, tout est annulé.
+    """
+
+    def __init__(
+        self,
+        name: str = "graph",
+        on_complete: Callable[[str, Any], None] | None = None,
+        keep_going: bool = False,
+        fatal: tuple[type[BaseException], ...] = (),
+    ):
+        self.name = name
+        self.on_complete = on_complete
+        self.keep_going = keep_going
+        self.fatal = fatal
+        self._nodes: dict[str, tuple[Callable[..., Awaitable[Any]], tuple]] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._running = False
+        self._changed = asyncio.Event()
+
+    def add(self, key: str, func: Callable[..., Awaitable[Any]], deps: tuple | list = ()) -> None:
+        if key in self._nodes:
+            raise Exception(f"Nœud déjà présent dans {self.name} : {key}")
+        missing = [d for d in deps if d not in self._nodes]
+        if missing:
+            raise Exception(f"Dépendances inconnues pour {key} : {missing}")
+        self._nodes[key] = (func, tuple(deps))
+        if self._running:
+            self._start(key)
+            self._changed.set()
+
+    def _start(self, key: str) -> None:
+        self._tasks[key] = asyncio.create_task(self._run_node(key), name=f"{self.name}:{key}")
+
+    async def _run_node(self, key: str) -> Any:
+        func, deps = self._nodes[key]
+        args = [await self._tasks[d] for d in deps]
+        result = await func(*args)
+        if self.on_complete:
+            self.on_complete(key, result)
+        return result
+
+    async def run(self) -> dict[str, Any]:
+        """Exécute le graphe jusqu'à ce que tous les nœuds (y compris ajoutés en cours) soient terminés."""
+        self._running = True
+        for key in self._nodes:
+            if key not in self._tasks:
+                self._start(key)
+
+        try:
+            while True:
+                pending = [t for t in self._tasks.values() if not t.done()]
+                failed = [t for t in self._tasks.values() if t.done() and not t.cancelled() and t.exception()]
+                fatal = [t for t in failed if isinstance(t.exception(), self.fatal)]
+                if fatal:
+                    raise fatal[0].exception()
+                if failed and (not self.keep_going or not pending):
+                    raise failed[0].exception()
+                if not pending:
+                    break
+                self._changed.clear()
+                waiter = asyncio.create_task(self._changed.wait())
+                try:
+                    await asyncio.wait([*pending, waiter], return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    waiter.cancel()
+        finally:
+            self._running = False
+            for task in self._tasks.values():
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+        return {key: task.result() for key, task in self._tasks.items()}
@@ -1,19 +1,40 @@
 import os
+import math
 import asyncio
+import shutil
 import httpx
 import random
 import logging
 from PIL import Image, ImageDraw, ImageFont
 import textwrap
+from app.core.config import settings
 from app.services.remotion import render_ken_burns
+from app.services.workspace import workspaces
+from app.services.image import IMAGES_DIR
+from app.services.manifest import fingerprint, file_sha256
+from shared.mediaprobe import probe_duration
+from app.services.assembly import (
+    StageTimer, run_ffmpeg, escape_filter_path, concat_scenes,
+    VOICE_VOLUME, MUSIC_VOLUME, SCENE_VIDEO_FILTER, SCENE_VIDEO_ARGS, SCENE_AUDIO_ARGS,
+    PREVIEW_FPS, PREVIEW_VIDEO_FILTER, PREVIEW_VIDEO_ARGS, PREVIEW_AUDIO_ARGS, SCENE_TIMESCALE,
+    HLS_MASTER, hls_ladder_command,
+)
+from shared.stills import ken_burns_loop_filter
 
 logger = logging.getLogger(__name__)
 
 VIDEO_DIR = "/app/outputs/videos"
 TEMP_DIR = "/app/outputs/temp"
 THUMBNAIL_DIR = "/app/outputs/thumbnails"
+HLS_DIR = "/app/outputs/hls"
 MUSIC_DIR = "/app/assets/music"
 
+# Langue de la piste de sous-titres (mode SUBTITLES_MODE=soft)
+SUBTITLES_LANGUAGE = "fra"
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+OCTET_STREAM_TYPES = ("application/octet-stream", "binary/octet-stream")
+
 MUSIC_STYLES = {
     "educatif":     "calm.mp3",
     "storytelling": "inspiring.mp3",
@@ -119,6 +140,33 @@ def estimate_word_timings(text: str, duration: float) -> list:
     return timings
 
 
+def subtitle_cues(scenes: list, audio_durations: list) -> list:
+    """Répliques (début, fin, texte) : 8 mots par ligne, réparties sur la durée de chaque scène."""
+    cues = []
+    current_offset = 0.0
+
+    for i, scene in enumerate(scenes):
+        narration = scene.get("narration", "")
+        duration = audio_durations[i] if i < len(audio_durations) else scene.get("duration_seconds", 30)
+        words = narration.split()
+
+        chunk_size = 8
+        chunks = [words[j:j+chunk_size] for j in range(0, len(words), chunk_size)]
+
+        if chunks:
+            chunk_duration = duration / len(chunks)
+            for k, chunk in enumerate(chunks):
+                start = current_offset + k * chunk_duration
+                end = start + chunk_duration
+                text = " ".join(chunk)
+                text = text.replace("{", "").replace("}", "").replace("\\n", " ")
+                cues.append((start, end, text))
+
+        current_offset += duration
+
+    return cues
+
+
 def generate_ass_subtitles(video_id: int, scenes: list, audio_durations: list) -> str:
     os.makedirs(TEMP_DIR, exist_ok=True)
     ass_path = f"{TEMP_DIR}/video_{video_id}_subtitles.ass"
@@ -144,29 +192,10 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         sec = s % 60
         return f"{h}:{m:02d}:{sec:06.3f}".replace(".", ",")[:11]
 
-    events = []
-    current_offset = 0.0
-
-    for i, scene in enumerate(scenes):
-        narration = scene.get("narration", "")
-        duration = audio_durations[i] if i < len(audio_durations) else scene.get("duration_seconds", 30)
-        words = narration.split()
-
-        chunk_size = 8
-        chunks = [words[j:j+chunk_size] for j in range(0, len(words), chunk_size)]
-
-        if chunks:
-            chunk_duration = duration / len(chunks)
-            for k, chunk in enumerate(chunks):
-                start = current_offset + k * chunk_duration
-                end = start + chunk_duration
-                text = " ".join(chunk)
-                text = text.replace("{", "").replace("}", "").replace("\\n", " ")
-                events.append(
-                    f"Dialogue: 0,{sec_to_ass(start)},{sec_to_ass(end)},Default,,0,0,0,,{text}"
-                )
-
-        current_offset += duration
+    events = [
+        f"Dialogue: 0,{sec_to_ass(start)},{sec_to_ass(end)},Default,,0,0,0,,{text}"
+        for start, end, text in subtitle_cues(scenes, audio_durations)
+    ]
 
     with open(ass_path, "w", encoding="utf-8") as f:
         f.write(header)
@@ -176,6 +205,41 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
     return ass_path
 
 
+def _timestamp(s: float, separator: str) -> str:
+    ms = int(round(s * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    sec, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{sec:02d}{separator}{ms:03d}"
+
+
+def export_captions(output_path: str, scenes: list, audio_durations: list) -> dict:
+    """
+    Sous-titres SRT + WebVTT à côté de la vidéo (video_{id}.srt / .vtt) :
+    piste mov_text du MP4 et fichiers de captions pour l'upload YouTube (n8n).
+    """
+    cues = subtitle_cues(scenes, audio_durations)
+    base = os.path.splitext(output_path)[0]
+    srt_path, vtt_path = f"{base}.srt", f"{base}.vtt"
+
+    with open(srt_path, "w", encoding="utf-8") as f:
+        for n, (start, end, text) in enumerate(cues, 1):
+            f.write(f"{n}\n{_timestamp(start, ',')} --> {_timestamp(end, ',')}\n{text}\n\n")
+    with open(vtt_path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n\n")
+        for start, end, text in cues:
+            f.write(f"{_timestamp(start, '.')} --> {_timestamp(end, '.')}\n{text}\n\n")
+
+    logger.info(f"Captions exportées : {srt_path}, {vtt_path} ({len(cues)} lignes)")
+    return {"srt": srt_path, "vtt": vtt_path}
+
+
+def caption_files(video_id: int) -> dict:
+    """Captions SRT/VTT existantes de la vidéo finale (mode SUBTITLES_MODE=soft)."""
+    base = f"{VIDEO_DIR}/video_{video_id}"
+    return {fmt: f"{base}.{fmt}" for fmt in ("srt", "vtt") if os.path.exists(f"{base}.{fmt}")}
+
+
 # ══════════════════════════════════════════════════════
 # 🎵 ÉTAPE 3 — MUSIQUE DE FOND
 # ══════════════════════════════════════════════════════
@@ -199,220 +263,429 @@ def get_music_path(style: str) -> str | None:
 # ══════════════════════════════════════════════════════
 
 async def get_audio_duration(audio_path: str) -> float:
-    """Récupère la durée réelle d'un fichier audio via ffprobe — minimum 25s garanti"""
+    """Durée réelle d'un fichier audio (sonde pur Python, ffprobe en dernier recours) — minimum 20s garanti"""
+    duration = await probe_duration(audio_path)
+    if duration is None:
+        return 25.0  # fallback 25s au lieu de 20s
+    # Garantir un minimum de 20s par scène pour éviter les vidéos trop courtes
+    return max(duration, 20.0)
+
+
+# Seuls dossiers d'où un visuel local peut être repris (images Flux, visuels rapatriés)
+LOCAL_VISUAL_DIRS = (IMAGES_DIR, TEMP_DIR)
+
+
+def check_visual_source(url_or_path: str) -> str:
+    """
+    Valide la source d'un visuel : URL http(s), ou chemin local qui se résout
+    (liens symboliques compris) sous LOCAL_VISUAL_DIRS. Lève ValueError sinon.
+    """
+    if url_or_path.startswith(("http://", "https://")):
+        return url_or_path
+    real_path = os.path.realpath(url_or_path)
+    for root in LOCAL_VISUAL_DIRS:
+        if os.path.commonpath([real_path, os.path.realpath(root)]) == os.path.realpath(root):
+            return real_path
+    raise ValueError("visuel : URL http(s) ou fichier généré par l'application attendu")
+
+
+def link_or_copy(src: str, dest: str) -> None:
+    """Hardlink (aucune copie de données) ; copie si le lien est impossible (autre volume)."""
+    if os.path.exists(dest):
+        os.remove(dest)
     try:
-        process = await asyncio.create_subprocess_exec(
-            "ffprobe", "-v", "quiet", "-print_format", "json",
-            "-show_streams", audio_path,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, _ = await process.communicate()
-        import json
-        data = json.loads(stdout)
-        for stream in data.get("streams", []):
-            if stream.get("codec_type") == "audio":
-                duration = float(stream.get("duration", 25))
-                # Garantir un minimum de 20s par scène pour éviter les vidéos trop courtes
-                return max(duration, 20.0)
-    except Exception:
-        pass
-    return 25.0  # fallback 25s au lieu de 20s
-
-
-async def assemble_video(
-    video_id: int,
-    scenes: list,
-    image_urls: list,
-    audio_files: list,
-    style: str = "educatif",
-    title: str = "",
-    video_format: str = "premium"
-) -> dict:
-    os.makedirs(VIDEO_DIR, exist_ok=True)
-    os.makedirs(TEMP_DIR, exist_ok=True)
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+async def download_visual(client: httpx.AsyncClient, url: str, dest: str, scene_num: int, expected_type: str) -> int:
+    """
+    Télécharge un visuel en streaming (morceaux de DOWNLOAD_CHUNK_SIZE) dans dest.
+    Vérifie le content-type et la taille annoncée ; écriture atomique via fichier .part.
+    Retourne le nombre d'octets écrits.
+    """
+    part_path = f"{dest}.part"
+    written = 0
+    try:
+        async with client.stream("GET", url) as response:
+            if response.status_code != 200:
+                raise Exception(f"Téléchargement visuel scène {scene_num} échoué : HTTP {response.status_code} — URL: {url}")
+
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type and not (
+                content_type.startswith(f"{expected_type}/") or content_type in OCTET_STREAM_TYPES
+            ):
+                raise Exception(f"Visuel scène {scene_num} : content-type inattendu '{content_type}' — URL: {url}")
+
+            with open(part_path, "wb") as f:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    written += len(chunk)
+
+            expected_size = response.headers.get("content-length")
+            if expected_size and int(expected_size) != written:
+                raise Exception(f"Visuel scène {scene_num} incomplet : {written}/{expected_size} bytes")
+        if written == 0:
+            raise Exception(f"Visuel scène {scene_num} vide — URL: {url}")
+
+        os.replace(part_path, dest)
+        return written
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+
+async def fetch_visual(client: httpx.AsyncClient, video_id: int, index: int, url_or_path: str, is_premium: bool) -> str:
+    """Rapatrie le visuel d'une scène dans TEMP_DIR (hardlink si local, streaming si distant)."""
+    ext = "mp4" if is_premium else "jpg"
+    img_path = f"{TEMP_DIR}/video_{video_id}_scene_{index+1}.{ext}"
+    source = check_visual_source(url_or_path)
+    if not source.startswith(("http://", "https://")):
+        # Chemin local — hardlink, pas de copie
+        if source != img_path:
+            link_or_copy(source, img_path)
+        logger.info(f"Scène {index+1} — visuel lié depuis disque local")
+    else:
+        # URL distante — téléchargement en streaming
+        size = await download_visual(client, source, img_path, index + 1, "video" if is_premium else "image")
+        logger.info(f"Scène {index+1} — visuel téléchargé ({size} bytes)")
+    return img_path
 
-    is_premium = (video_format == "premium")
-
-    # ── Télécharger ou copier les visuels ────────────────────────────────────
-    image_files = []
-    async with httpx.AsyncClient(follow_redirects=True, timeout=120) as client:
-        for i, url_or_path in enumerate(image_urls):
-            ext = "mp4" if is_premium else "jpg"
-            img_path = f"{TEMP_DIR}/video_{video_id}_scene_{i+1}.{ext}"
-            if url_or_path.startswith("/") or url_or_path.startswith("./"):
-                # Chemin local — copie directe
-                import shutil
-                shutil.copy2(url_or_path, img_path)
-                logger.info(f"Scène {i+1} — visuel copié depuis disque local")
-            else:
-                # URL distante — téléchargement
-                response = await client.get(url_or_path)
-                if response.status_code != 200:
-                    raise Exception(f"Téléchargement visuel scène {i+1} échoué : HTTP {response.status_code} — URL: {url_or_path}")
-                with open(img_path, "wb") as f:
-                    f.write(response.content)
-                logger.info(f"Scène {i+1} — visuel téléchargé ({len(response.content)} bytes)")
-            image_files.append(img_path)
-
-    # ── Récupérer les durées réelles des audios ───────────────────
-    audio_durations = []
-    for audio_path in audio_files:
-        duration = await get_audio_duration(audio_path)
-        audio_durations.append(duration)
-    total_duration = sum(audio_durations)
-    logger.info(f"Durées audio : {audio_durations}")
-    logger.info(f"Durée totale estimée : {total_duration:.1f}s ({total_duration/60:.1f} min)")
 
-    # ── Générer les sous-titres ───────────────────────────────────
-    ass_path = generate_ass_subtitles(video_id, scenes, audio_durations)
+# ══════════════════════════════════════════════════════
+# 🧩 ASSEMBLAGE PAR CLIPS DE SCÈNE
+# ══════════════════════════════════════════════════════
 
-    # ── Générer la miniature (depuis la 1ère image) ───────────────
-    thumbnail_path = None
-    if image_files and title:
-        thumbnail_path = generate_thumbnail(video_id, title, image_files[0])
-
-    # ── Créer une vidéo par scène (en parallèle, max 4 simultanées) ──
-    semaphore = asyncio.Semaphore(4)
-
-    async def build_scene(i, img, audio):
-        scene_video = f"{TEMP_DIR}/video_{video_id}_scene_{i+1}_out.mp4"
-        async with semaphore:
-            if is_premium:
-                cmd = [
-                    "ffmpeg", "-y",
-                    "-stream_loop", "-1", "-i", img,
-                    "-i", audio,
-                    "-map", "0:v", "-map", "1:a",
-                    "-c:v", "libx264", "-preset", "ultrafast",
-                    "-c:a", "aac",
-                    "-shortest",
-                    "-pix_fmt", "yuv420p",
-                    "-r", "25",
-                    scene_video
-                ]
-            else:
-                # Format économique : Remotion génère le Ken Burns, puis FFmpeg mixe l'audio
-                duration_ms = int(audio_durations[i] * 1000)
-                ken_burns_path = f"{TEMP_DIR}/video_{video_id}_scene_{i+1}_kb.mp4"
-                await render_ken_burns(
-                    image_path=img,
-                    duration_ms=duration_ms,
-                    output_path=ken_burns_path,
-                    direction=i % 3,  # alterne les directions Ken Burns
-                )
-                # Merger la vidéo animée avec l'audio de narration
-                cmd = [
-                    "ffmpeg", "-y",
-                    "-i", ken_burns_path,
-                    "-i", audio,
-                    "-map", "0:v", "-map", "1:a",
-                    "-c:v", "libx264", "-preset", "ultrafast",
-                    "-c:a", "aac",
-                    "-shortest",
-                    "-pix_fmt", "yuv420p",
-                    scene_video
-                ]
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+async def build_scene_clip(
+    video_id: int,
+    index: int,
+    visual_path: str,
+    audio_path: str,
+    duration: float,
+    is_premium: bool,
+    preview: bool = False,
+    ken_burns_segment: tuple | None = None,
+    visual_sha256: str | None = None,
+) -> str:
+    """
+    Encode le clip d'une scène (visuel + narration) avec les paramètres SCENE_* :
+    tous les clips d'une vidéo sont concaténables en stream copy.
+    La narration est complétée par du silence jusqu'à `duration` (alignement sous-titres).
+    preview=True : profil PREVIEW_* (480p), image fixe sans Ken Burns en format économique.
+    ken_burns_segment : (mp4, début en s) de la scène dans un rendu Remotion groupé.
+    visual_sha256 : empreinte du visuel au manifeste (calculée si absente).
+    """
+    video_filter, video_args, audio_args = SCENE_VIDEO_FILTER, SCENE_VIDEO_ARGS, SCENE_AUDIO_ARGS
+    if preview:
+        scene_video = f"{TEMP_DIR}/video_{video_id}_scene_{index+1}_preview.mp4"
+        video_filter, video_args, audio_args = PREVIEW_VIDEO_FILTER, PREVIEW_VIDEO_ARGS, PREVIEW_AUDIO_ARGS
+    else:
+        scene_video = f"{TEMP_DIR}/video_{video_id}_scene_{index+1}_out.mp4"
+
+    if is_premium:
+        # Clip Kling (~5 s) encodé une seule fois puis répété en stream copy
+        try:
+            return await _build_looped_scene_clip(
+                video_id, index, visual_path, audio_path, duration, scene_video, preview, visual_sha256
             )
-            stdout, stderr = await process.communicate()
-            if process.returncode != 0:
-                raise Exception(f"FFmpeg scene {i+1} error: {stderr.decode()}")
-            logger.info(f"Scène {i+1} assemblée ✅")
-            return scene_video
-
-    scene_videos = await asyncio.gather(*[
-        build_scene(i, img, audio)
-        for i, (img, audio) in enumerate(zip(image_files, audio_files))
-    ])
-
-    # ── Concaténer toutes les scènes ─────────────────────────────
-    concat_file = f"{TEMP_DIR}/video_{video_id}_concat.txt"
-    with open(concat_file, "w") as f:
-        for sv in scene_videos:
-            f.write(f"file '{sv}'\n")
-
-    raw_video = f"{TEMP_DIR}/video_{video_id}_raw.mp4"
-    cmd_concat = [
+        except Exception as e:
+            logger.warning(f"Scène {index+1} — boucle en stream copy impossible, ré-encodage complet : {str(e)[:300]}")
+        video_input = ["-stream_loop", "-1", "-i", visual_path]
+    elif preview:
+        # Image décodée une seule fois et répétée en mémoire
+        video_input = ["-i", visual_path]
+        video_filter = f"{ken_burns_loop_filter(PREVIEW_FPS)},{video_filter}"
+    elif ken_burns_segment:
+        # Ken Burns déjà rendu avec les autres scènes de l'épisode : extrait de la scène
+        batch_path, start = ken_burns_segment
+        video_input = ["-ss", f"{start:.3f}", "-t", f"{duration:.3f}", "-i", batch_path]
+    else:
+        # Format économique : Remotion génère le Ken Burns, puis FFmpeg mixe l'audio
+        ken_burns_path = f"{workspaces.shared_path(video_id)}/scene_{index+1}_kb.mp4"
+        await render_ken_burns(
+            image_path=visual_path,
+            duration_ms=int(duration * 1000),
+            output_path=ken_burns_path,
+            direction=index % 3,  # alterne les directions Ken Burns
+        )
+        video_input = ["-i", ken_burns_path]
+
+    cmd = [
         "ffmpeg", "-y",
-        "-f", "concat", "-safe", "0", "-i", concat_file,
-        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac",
-        "-pix_fmt", "yuv420p",
-        "-movflags", "+faststart",
-        raw_video
+        *video_input,
+        "-i", audio_path,
+        "-map", "0:v", "-map", "1:a",
+        "-vf", video_filter,
+        "-af", "apad",
+        *video_args,
+        *audio_args,
+        "-t", f"{duration:.3f}",
+        scene_video
     ]
-    process = await asyncio.create_subprocess_exec(
-        *cmd_concat,
-        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await process.communicate()
-    if process.returncode != 0:
-        raise Exception(f"FFmpeg concat error: {stderr.decode()}")
-
-    # ── Incruster les sous-titres ─────────────────────────────────
-    subtitled_video = f"{TEMP_DIR}/video_{video_id}_subtitled.mp4"
-    ass_escaped = ass_path.replace("\\", "/").replace(":", "\\:")
-    cmd_subs = [
+    returncode, stderr = await run_ffmpeg(cmd)
+    if returncode != 0:
+        raise Exception(f"FFmpeg scene {index+1} error: {stderr}")
+    logger.info(f"Scène {index+1} assemblée ✅")
+    return scene_video
+
+
+def loop_unit_key(visual_sha256: str, video_filter: str, video_args: list) -> str:
+    """Empreinte d'une unité de boucle : contenu du visuel, profil d'encodage et mode de boucle."""
+    return fingerprint(visual_sha256, video_filter, video_args, settings.PREMIUM_LOOP_MODE)
+
+
+async def _encode_loop_unit(visual_path: str, unit_path: str, video_filter: str, video_args: list) -> None:
+    """
+    Normalise une seule fois le clip Kling au profil de scène (muet). Mode boomerang :
+    aller + retour encodés ensemble, la boucle n'a plus de saut à la jonction.
+    Le nom de `unit_path` porte l'empreinte du visuel et de l'encodage : un fichier
+    existant est réutilisé tel quel (ex. narration modifiée).
+    """
+    if os.path.exists(unit_path):
+        return
+
+    if settings.PREMIUM_LOOP_MODE == "boomerang":
+        filters = ["-filter_complex", f"[0:v]{video_filter},split[fwd][rev];[rev]reverse[back];[fwd][back]concat=n=2:v=1[v]",
+                   "-map", "[v]"]
+    else:
+        filters = ["-vf", video_filter, "-map", "0:v"]
+
+    part_path = f"{unit_path}.part"
+    cmd = ["ffmpeg", "-y", "-i", visual_path, *filters, "-an", *video_args, "-f", "mp4", part_path]
+    returncode, stderr = await run_ffmpeg(cmd)
+    if returncode != 0:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise Exception(f"FFmpeg boucle error: {stderr[-300:]}")
+    os.replace(part_path, unit_path)
+
+
+async def _build_looped_scene_clip(
+    video_id: int,
+    index: int,
+    visual_path: str,
+    audio_path: str,
+    duration: float,
+    scene_video: str,
+    preview: bool,
+    visual_sha256: str | None = None,
+) -> str:
+    """
+    Scène premium sans ré-encoder la vidéo répétée : unité de boucle encodée une fois,
+    répétée via le concat demuxer (-c:v copy), narration (AAC) posée par-dessus.
+    Chaque répétition commence par une image clé : la concat en copie reste valide.
+    """
+    if preview:
+        video_filter, video_args, audio_args = PREVIEW_VIDEO_FILTER, PREVIEW_VIDEO_ARGS, PREVIEW_AUDIO_ARGS
+    else:
+        video_filter, video_args, audio_args = SCENE_VIDEO_FILTER, SCENE_VIDEO_ARGS, SCENE_AUDIO_ARGS
+
+    workdir = workspaces.path(video_id, preview)
+    visual_sha256 = visual_sha256 or await asyncio.to_thread(file_sha256, visual_path)
+    # Hors workspace (libéré après chaque rendu) : l'unité sert encore aux modifications de
+    # scène ultérieures ; supprimée avec les autres intermédiaires par la rétention
+    unit_key = loop_unit_key(visual_sha256, video_filter, video_args)
+    unit_path = f"{TEMP_DIR}/video_{video_id}_scene_{index+1}_loop_{unit_key}.mp4"
+    await _encode_loop_unit(visual_path, unit_path, video_filter, video_args)
+
+    unit_duration = await probe_duration(unit_path)
+    if not unit_duration or unit_duration < 0.5:
+        raise Exception(f"durée de l'unité de boucle invalide ({unit_duration})")
+
+    repeats = math.ceil(duration / unit_duration)
+    loop_list = f"{workdir}/scene_{index+1}_loop.txt"
+    with open(loop_list, "w") as f:
+        f.write(f"file '{unit_path}'\n" * repeats)
+
+    cmd = [
         "ffmpeg", "-y",
-        "-i", raw_video,
-        "-vf", f"subtitles={ass_escaped}",
-        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "copy",
-        "-pix_fmt", "yuv420p",
-        subtitled_video
+        "-f", "concat", "-safe", "0", "-i", loop_list,
+        "-i", audio_path,
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "copy",
+        "-af", "apad",
+        *audio_args,
+        "-video_track_timescale", str(SCENE_TIMESCALE),
+        "-t", f"{duration:.3f}",
+        scene_video
     ]
-    process = await asyncio.create_subprocess_exec(
-        *cmd_subs,
-        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await process.communicate()
-    if process.returncode != 0:
-        logger.warning(f"Sous-titres échoués, on continue sans : {stderr.decode()[:300]}")
-        subtitled_video = raw_video
-
-    # ── Ajouter la musique de fond ────────────────────────────────
-    output_path = f"{VIDEO_DIR}/video_{video_id}.mp4"
-    music_path = get_music_path(style)
+    returncode, stderr = await run_ffmpeg(cmd)
+    if returncode != 0:
+        raise Exception(f"FFmpeg concat boucle error: {stderr[-300:]}")
+    logger.info(f"Scène {index+1} assemblée ✅ (boucle x{repeats} en stream copy)")
+    return scene_video
+
+
+def _final_mux_command(
+    raw_video: str,
+    output_path: str,
+    ass_path: str | None,
+    music_path: str | None,
+    srt_path: str | None = None,
+) -> list:
+    """
+    Sous-titres incrustés + musique en un seul passage ; vidéo copiée si pas de sous-titres.
+    srt_path : sous-titres en piste mov_text (non incrustés), vidéo copiée sans ré-encodage.
+    """
+    cmd = ["ffmpeg", "-y", "-i", raw_video]
+    if music_path:
+        cmd += ["-stream_loop", "-1", "-i", music_path]
+    if srt_path:
+        cmd += ["-i", srt_path]
 
+    filters = []
+    if ass_path:
+        filters.append(f"[0:v]subtitles={escape_filter_path(ass_path)}[vout]")
     if music_path:
-        logger.info(f"Ajout musique de fond : {music_path}")
-        cmd_music = [
-            "ffmpeg", "-y",
-            "-i", subtitled_video,
-            "-stream_loop", "-1", "-i", music_path,
-            "-filter_complex",
-            "[0:a]volume=1.0[voice];[1:a]volume=0.12[music];[voice][music]amix=inputs=2:duration=first:dropout_transition=3[aout]",
-            "-map", "0:v",
-            "-map", "[aout]",
-            "-c:v", "copy",
-            "-c:a", "aac",
-            "-shortest",
-            "-movflags", "+faststart",
-            output_path
+        filters.append(
+            f"[0:a]volume={VOICE_VOLUME}[voice];[1:a]volume={MUSIC_VOLUME}[music];"
+            f"[voice][music]amix=inputs=2:duration=first:dropout_transition=3[aout]"
+        )
+    if filters:
+        cmd += ["-filter_complex", ";".join(filters)]
+
+    cmd += ["-map", "[vout]" if ass_path else "0:v", "-map", "[aout]" if music_path else "0:a"]
+    if ass_path:
+        cmd += ["-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p"]
+    else:
+        cmd += ["-c:v", "copy"]
+    cmd += ["-c:a", "aac"] if music_path else ["-c:a", "copy"]
+    if srt_path:
+        cmd += [
+            "-map", f"{2 if music_path else 1}:s", "-c:s", "mov_text",
+            "-metadata:s:s:0", f"language={SUBTITLES_LANGUAGE}",
         ]
+    cmd += ["-movflags", "+faststart", output_path]
+    return cmd
+
+
+async def join_scene_clips(
+    video_id: int,
+    scene_clips: list,
+    ass_path: str | None,
+    music_path: str | None,
+    output_path: str,
+    timer: StageTimer,
+    srt_path: str | None = None,
+) -> None:
+    """
+    Concat des clips (stream copy si possible) puis un seul passage sous-titres + musique.
+    Seule l'incrustation (ass_path) ré-encode la vidéo : sans elle, chaque image n'a été
+    encodée qu'une fois, dans son clip de scène.
+    """
+    # Intermédiaires dans le workspace du rendu (rendu final et aperçu peuvent coexister)
+    stem = os.path.splitext(os.path.basename(output_path))[0]
+    workdir = workspaces.path(video_id, preview=stem.endswith("_preview"))
+    concat_file = f"{workdir}/{stem}_concat.txt"
+    raw_video = f"{workdir}/{stem}_raw.mp4"
+    with timer.stage("concat"):
+        await concat_scenes(scene_clips, concat_file, raw_video)
+
+    if music_path:
+        logger.info(f"Ajout musique de fond : {music_path}")
     else:
         logger.info("Pas de musique de fond disponible, vidéo sans musique")
-        cmd_music = [
-            "ffmpeg", "-y", "-i", subtitled_video,
-            "-c", "copy", "-movflags", "+faststart",
-            output_path
-        ]
 
-    process = await asyncio.create_subprocess_exec(
-        *cmd_music,
-        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await process.communicate()
-    if process.returncode != 0:
-        raise Exception(f"FFmpeg music mix error: {stderr.decode()}")
+    with timer.stage("final_mux"):
+        returncode, stderr = await run_ffmpeg(
+            _final_mux_command(raw_video, output_path, ass_path, music_path, srt_path)
+        )
+        if returncode != 0 and (ass_path or srt_path):
+            logger.warning(f"Sous-titres échoués, on continue sans : {stderr[:300]}")
+            returncode, stderr = await run_ffmpeg(_final_mux_command(raw_video, output_path, None, music_path))
+    if returncode != 0:
+        raise Exception(f"FFmpeg final mux error: {stderr}")
+
 
+async def finalize_video(
+    video_id: int,
+    scenes: list,
+    scene_clips: list,
+    visual_files: list,
+    audio_durations: list,
+    style: str = "educatif",
+    title: str = "",
+    timer: StageTimer | None = None,
+    preview: bool = False,
+) -> dict:
+    """
+    Étape finale à partir de clips de scène déjà encodés : sous-titres, miniature, join + mux.
+    preview=True : sortie séparée (video_{id}_preview.mp4), sans miniature ni musique.
+    """
+    os.makedirs(VIDEO_DIR, exist_ok=True)
+    timer = timer or StageTimer(video_id)
+
+    with timer.stage("subtitles"):
+        ass_path = generate_ass_subtitles(video_id, scenes, audio_durations)
+
+    thumbnail_path = None
+    if visual_files and title and not preview:
+        with timer.stage("thumbnail"):
+            thumbnail_path = generate_thumbnail(video_id, title, visual_files[0])
+
+    if preview:
+        # Narration seule : pas de mixage musique, l'audio des clips est copié
+        output_path = f"{VIDEO_DIR}/video_{video_id}_preview.mp4"
+        music_path = None
+    else:
+        output_path = f"{VIDEO_DIR}/video_{video_id}.mp4"
+        music_path = get_music_path(style)
+
+    captions = {}
+    if settings.SUBTITLES_MODE == "soft":
+        # Piste de sous-titres + SRT/VTT : la vidéo n'est pas ré-encodée pour l'incrustation
+        with timer.stage("captions"):
+            captions = export_captions(output_path, scenes, audio_durations)
+        await join_scene_clips(
+            video_id, scene_clips, None, music_path, output_path, timer, srt_path=captions["srt"]
+        )
+    else:
+        await join_scene_clips(video_id, scene_clips, ass_path, music_path, output_path, timer)
+
+    hls_path = None
+    if settings.HLS_PREVIEW_ENABLED and not preview:
+        with timer.stage("hls"):
+            hls_path = await export_hls_ladder(video_id, output_path)
+
+    total_duration = sum(audio_durations)
     logger.info(f"Vidéo finale assemblée : {output_path}")
     logger.info(f"Durée totale : {total_duration:.1f}s ({total_duration/60:.1f} min)")
+    timer.log()
 
     return {
         "video_path": output_path,
         "thumbnail_path": thumbnail_path,
         "subtitles_path": ass_path,
-    }
\ No newline at end of file
+        "captions": captions,
+        "hls_path": hls_path,
+        "timings": timer.timings,
+    }
+
+
+async def export_hls_ladder(video_id: int, video_path: str) -> str | None:
+    """
+    Échelle HLS fMP4 (480p/240p) du rendu final pour le dashboard : lecture immédiate
+    et seek sans télécharger le MP4. Écrite à côté puis substituée à l'ancienne.
+    Retourne le chemin du master playlist, None en cas d'échec (non bloquant).
+    """
+    final_dir = f"{HLS_DIR}/video_{video_id}"
+    part_dir = f"{final_dir}.part"
+    shutil.rmtree(part_dir, ignore_errors=True)
+    os.makedirs(part_dir)
+
+    version = f"{os.stat(video_path).st_mtime_ns:x}"[-10:]
+    returncode, stderr = await run_ffmpeg(hls_ladder_command(video_path, part_dir, version))
+    if returncode != 0:
+        shutil.rmtree(part_dir, ignore_errors=True)
+        logger.warning(f"Échelle HLS échouée pour vidéo {video_id} : {stderr[-300:]}")
+        return None
+
+    old_dir = f"{final_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.isdir(final_dir):
+        os.replace(final_dir, old_dir)
+    os.replace(part_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    logger.info(f"Échelle HLS prête : {final_dir}/{HLS_MASTER}")
+    return f"{final_dir}/{HLS_MASTER}"
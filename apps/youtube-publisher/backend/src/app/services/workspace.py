@@ -0,0 +1,114 @@
+import os
+import shutil
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Dossier partagé avec le service Remotion (volume video_outputs) : ses rendus y sont écrits
+SHARED_WORKSPACE_DIR = "/app/outputs/temp/work"
+
+
+def _dir_bytes(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+class WorkspaceManager:
+    """
+    Dossiers de travail par rendu (video_{id}, video_{id}_preview) pour les fichiers
+    purement intermédiaires : listes de concat, vidéo brute, rendus Ken Burns.
+    `root` peut être un tmpfs (I/O en RAM) ; les rendus Remotion vont dans
+    `shared_root`, visible du service.
+
+    Les artefacts réutilisables (visuels, clips encodés suivis par le manifeste,
+    unités de boucle premium) restent dans TEMP_DIR, sur le volume des sorties :
+    ils servent aux reprises et aux modifications de scène.
+    Un rendu réussi libère son dossier ; en cas d'échec il est conservé pour la reprise.
+    """
+
+    def __init__(self, root: str, shared_root: str, min_free_bytes: int):
+        self.root = root
+        self.shared_root = shared_root
+        self.min_free_bytes = min_free_bytes
+        self.released_bytes = 0
+        self.refused = 0
+
+    @staticmethod
+    def key(video_id: int, preview: bool = False) -> str:
+        return f"video_{video_id}_preview" if preview else f"video_{video_id}"
+
+    def path(self, video_id: int, preview: bool = False) -> str:
+        path = os.path.join(self.root, self.key(video_id, preview))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def shared_path(self, video_id: int, preview: bool = False) -> str:
+        path = os.path.join(self.shared_root, self.key(video_id, preview))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def release(self, video_id: int, preview: bool = False) -> int:
+        """Supprime les intermédiaires d'un rendu terminé ; retourne les octets libérés."""
+        freed = 0
+        for root in {self.root, self.shared_root}:
+            path = os.path.join(root, self.key(video_id, preview))
+            if not os.path.isdir(path):
+                continue
+            freed += _dir_bytes(path)
+            shutil.rmtree(path, ignore_errors=True)
+        if freed:
+            self.released_bytes += freed
+            logger.info(f"Workspace {self.key(video_id, preview)} libéré ({freed / 1024 / 1024:.0f} Mo)")
+        return freed
+
+    def free_bytes(self) -> int:
+        """Espace libre minimal entre le dossier de travail et le volume des sorties."""
+        free = []
+        for path in (self.root, self.shared_root):
+            probe = path
+            while probe and not os.path.exists(probe):
+                probe = os.path.dirname(probe)
+            if probe:
+                free.append(shutil.disk_usage(probe).free)
+        return min(free) if free else 0
+
+    def has_room(self) -> bool:
+        """False si l'espace libre passe sous le seuil : aucun nouveau rendu ne doit démarrer."""
+        if self.min_free_bytes <= 0:
+            return True
+        if self.free_bytes() >= self.min_free_bytes:
+            return True
+        self.refused += 1
+        return False
+
+    def stats(self) -> dict:
+        active = {}
+        for root in {self.root, self.shared_root}:
+            if not os.path.isdir(root):
+                continue
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                if os.path.isdir(path):
+                    active[name] = active.get(name, 0) + _dir_bytes(path)
+        return {
+            "root": self.root,
+            "free_mb": self.free_bytes() // (1024 * 1024),
+            "min_free_mb": self.min_free_bytes // (1024 * 1024),
+            "active_mb": {k: round(v / 1024 / 1024, 1) for k, v in sorted(active.items())},
+            "released_mb": self.released_bytes // (1024 * 1024),
+            "refused": self.refused,
+        }
+
+
+workspaces = WorkspaceManager(
+    settings.WORKSPACE_DIR or SHARED_WORKSPACE_DIR,
+    SHARED_WORKSPACE_DIR,
+    settings.WORKSPACE_MIN_FREE_MB * 1024 * 1024,
+)
@@ -0,0 +1,207 @@
+"""
+Worker des pipelines vidéo : consomme la table `jobs`.
+
+    python -m app.worker
+
+Plusieurs workers peuvent tourner en parallèle (SKIP LOCKED) ; un job dont le
+worker disparaît (crash, redéploiement) est repris à l'expiration de son bail.
+"""
+import os
+import socket
+import signal
+import time
+import asyncio
+import logging
+from app.core.config import settings
+from app.core.database import SessionLocal, init_db
+from app.models.video import Video, VideoStatus
+from app.models.season import Season, SeasonStatus
+from app.services.assembly import encoder
+from app.services import kie_tasks, remotion, retention
+from app.services.workspace import workspaces
+from app.services.jobs import (
+    JOB_HANDLERS, RESUMABLE_KINDS, job_argument, claim_job, heartbeat_job, finish_job, release_job, write_worker_stats,
+)
+from shared.encode_scheduler import EncodeScheduler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+STATS_INTERVAL = 10
+
+
+def _job_error(kind: str, target_id: int | None) -> str | None:
+    """
+    Les pipelines capturent leurs erreurs : le statut de la vidéo fait foi, celui
+    de la saison pour un job "season" (script ou mise en file d'un épisode échoué).
+    """
+    if target_id is None:
+        return None
+    db = SessionLocal()
+    try:
+        if kind == "season":
+            season = db.query(Season).filter(Season.id == target_id).first()
+            if season and season.status == SeasonStatus.FAILED:
+                return season.error_message or "Saison échouée"
+            return None
+        video = db.query(Video).filter(Video.id == target_id).first()
+        if video and video.status == VideoStatus.FAILED:
+            return video.error_message or "Pipeline échoué"
+        return None
+    finally:
+        db.close()
+
+
+async def _heartbeat(job_id: int, task: asyncio.Task) -> None:
+    while True:
+        await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+        db = SessionLocal()
+        try:
+            alive = heartbeat_job(db, job_id, WORKER_ID)
+        except Exception as e:
+            logger.warning(f"Heartbeat job {job_id} échoué : {e}")
+            continue
+        finally:
+            db.close()
+        if not alive:
+            logger.error(f"Job {job_id} repris par un autre worker, arrêt local")
+            task.cancel()
+            return
+
+
+async def run_job(
+    job_id: int, kind: str, video_id: int | None, payload: dict | None, attempts: int, priority: int
+) -> None:
+    # Après une perte de worker : reprise depuis l'étape atteinte, pas depuis le début
+    if attempts > 1 and kind in RESUMABLE_KINDS:
+        kind = "resume"
+    handler = JOB_HANDLERS[kind]
+    logger.info(f"▶ Job {job_id} ({kind}, tentative {attempts}) — vidéo {video_id}")
+
+    # Priorité du job héritée par tous les encodages FFmpeg du pipeline
+    target_id = job_argument(kind, video_id, payload)
+    with EncodeScheduler.priority(priority):
+        task = asyncio.create_task(handler(target_id))
+    heartbeat = asyncio.create_task(_heartbeat(job_id, task))
+    error = None
+    try:
+        await task
+        error = _job_error(kind, target_id)
+    except asyncio.CancelledError:
+        # Arrêt du worker ou bail perdu : le job sera repris ailleurs
+        db = SessionLocal()
+        try:
+            release_job(db, job_id, WORKER_ID)
+        finally:
+            db.close()
+        return
+    except Exception as e:
+        error = str(e)
+        logger.error(f"Job {job_id} échoué : {e}")
+    finally:
+        heartbeat.cancel()
+
+    db = SessionLocal()
+    try:
+        finish_job(db, job_id, WORKER_ID, error)
+    finally:
+        db.close()
+    logger.info(f"{'❌' if error else '✅'} Job {job_id} terminé")
+
+
+async def _run_retention() -> None:
+    try:
+        await asyncio.to_thread(retention.run_retention)
+    except Exception as e:
+        logger.error(f"Passe de rétention échouée : {e}")
+
+
+async def main() -> None:
+    init_db()
+    if kie_tasks.callbacks_enabled():
+        try:
+            kie_tasks.start_task_listener()
+        except Exception as e:
+            logger.warning(f"Écoute des callbacks Kie.ai impossible, polling seul : {e}")
+    logger.info(f"Worker {WORKER_ID} démarré (concurrence {settings.WORKER_CONCURRENCY})")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    running: set[asyncio.Task] = set()
+    last_stats = 0.0
+    last_disk_warning = 0.0
+    last_retention = None
+    retention_task = None
+    while not stop.is_set():
+        if time.monotonic() - last_stats > STATS_INTERVAL:
+            last_stats = time.monotonic()
+            try:
+                write_worker_stats(WORKER_ID, {
+                    "running_jobs": len(running),
+                    "encoder": encoder.stats(),
+                    "kie": kie_tasks.kie.stats(),
+                    "remotion": remotion.breaker.stats(),
+                    "workspace": workspaces.stats(),
+                    "retention": retention.engine.stats(),
+                })
+            except OSError as e:
+                logger.warning(f"Écriture des stats worker impossible : {e}")
+
+        # Rétention périodique (une passe à la fois, verrou partagé entre workers)
+        if (
+            settings.RETENTION_ENABLED
+            and (last_retention is None or time.monotonic() - last_retention > settings.RETENTION_INTERVAL_HOURS * 3600)
+            and (retention_task is None or retention_task.done())
+        ):
+            last_retention = time.monotonic()
+            retention_task = asyncio.create_task(_run_retention())
+
+        job = None
+        if len(running) < settings.WORKER_CONCURRENCY and not workspaces.has_room():
+            # Disque presque plein : les jobs restent en file (autres workers ou place libérée)
+            if time.monotonic() - last_disk_warning > STATS_INTERVAL:
+                last_disk_warning = time.monotonic()
+                logger.warning(
+                    f"Espace libre insuffisant ({workspaces.free_bytes() // (1024 * 1024)} Mo "
+                    f"< {settings.WORKSPACE_MIN_FREE_MB} Mo), aucun nouveau job"
+                )
+        elif len(running) < settings.WORKER_CONCURRENCY:
+            db = SessionLocal()
+            try:
+                claimed = claim_job(db, WORKER_ID)
+                if claimed:
+                    job = (
+                        claimed.id, claimed.kind, claimed.video_id, claimed.payload,
+                        claimed.attempts, claimed.priority or 0,
+                    )
+            except Exception as e:
+                logger.error(f"Lecture de la file échouée : {e}")
+            finally:
+                db.close()
+
+        if job:
+            task = asyncio.create_task(run_job(*job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            continue
+
+        # Rien à prendre (ou worker plein) : attendre un slot, un signal ou le prochain poll
+        waiters = [asyncio.create_task(stop.wait()), *running]
+        await asyncio.wait(waiters, timeout=settings.JOB_POLL_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+        waiters[0].cancel()
+
+    if running:
+        logger.info(f"Arrêt demandé — attente de {len(running)} job(s) ({settings.WORKER_SHUTDOWN_TIMEOUT}s max)")
+        _, pending = await asyncio.wait(running, timeout=settings.WORKER_SHUTDOWN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    logger.info(f"Worker {WORKER_ID} arrêté")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,15 @@
+import os
+import sys
+
+# Tests unitaires hors conteneur : src/ (package app) et racine du dépôt (shared/)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(BACKEND_DIR, "src"), os.path.abspath(os.path.join(BACKEND_DIR, "..", "..", ".."))]
+
+for name, value in {
+    "DATABASE_URL": "sqlite://",
+    "ANTHROPIC_API_KEY": "test",
+    "KIE_AI_API_KEY": "test",
+    "ELEVENLABS_API_KEY": "test",
+    "JOB_QUEUE_ENABLED": "false",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,108 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import audio
+
+MP3 = b"ID3" + b"\x00" * 200
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Délais de retry enregistrés au lieu d'être attendus."""
+    recorded = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        recorded.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(audio.asyncio, "sleep", fake_sleep)
+    return recorded
+
+
+def make_client(responses, calls=None):
+    responses = iter(responses)
+
+    def handler(request):
+        if calls is not None:
+            calls.append(request)
+        return next(responses)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def generate(client, tmp_path):
+    scene = {"scene_number": 1, "narration": "Bonjour"}
+    return asyncio.run(audio.generate_single_audio(client, scene, str(tmp_path / "scene_1.mp3")))
+
+
+def test_rate_limit_delay_honours_retry_after():
+    response = httpx.Response(429, headers={"retry-after": "7"})
+    assert audio._rate_limit_delay(response, 1) == 7
+    response = httpx.Response(429, headers={"retry-after": "3600"})
+    assert audio._rate_limit_delay(response, 1) == audio.RATE_LIMIT_MAX_DELAY
+
+
+@pytest.mark.parametrize("retry", [1, 2, 3, 10])
+def test_rate_limit_delay_backs_off_with_jitter(retry):
+    base = min(audio.RATE_LIMIT_BASE_DELAY * 2 ** (retry - 1), audio.RATE_LIMIT_MAX_DELAY)
+    delay = audio._rate_limit_delay(httpx.Response(429), retry)
+    assert base <= delay <= base * 1.5
+
+
+def test_429_retries_without_consuming_attempts(tmp_path, sleeps):
+    calls = []
+    responses = [httpx.Response(429, headers={"retry-after": "1"})] * 4 + [
+        httpx.Response(200, content=MP3, headers={"content-type": "audio/mpeg"})
+    ]
+    path = generate(make_client(responses, calls), tmp_path)
+
+    assert open(path, "rb").read() == MP3
+    assert len(calls) == 5
+    assert sleeps == [1, 1, 1, 1]
+
+
+def test_quota_exceeded_is_not_retried(tmp_path, sleeps):
+    calls = []
+    quota = httpx.Response(401, json={"detail": {"status": "quota_exceeded", "message": "plus de crédits"}})
+    with pytest.raises(audio.QuotaExceededError):
+        generate(make_client([quota] * 3, calls), tmp_path)
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_other_errors_use_the_retry_budget(tmp_path, sleeps):
+    calls = []
+    error = httpx.Response(500, json={"detail": {"status": "server_error", "message": "oups"}})
+    with pytest.raises(Exception, match="échouée après"):
+        generate(make_client([error] * audio.MAX_RETRIES, calls), tmp_path)
+    assert len(calls) == audio.MAX_RETRIES
+    assert sleeps == audio.RETRY_DELAYS[:audio.MAX_RETRIES - 1]
+
+
+def test_scene_audio_respects_the_global_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio, "AUDIO_ROOT", str(tmp_path))
+    monkeypatch.setattr(audio, "tts_cache", None)
+    active, peak = 0, 0
+
+    async def fake_single(client, scene, output_path):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return output_path
+
+    monkeypatch.setattr(audio, "generate_single_audio", fake_single)
+
+    async def main():
+        # Sémaphore recréé dans la boucle du test
+        monkeypatch.setattr(audio, "_tts_semaphore", asyncio.Semaphore(2))
+        scenes = [{"scene_number": n, "narration": f"n{n}"} for n in range(1, 7)]
+        return await asyncio.gather(*[audio.generate_scene_audio(None, 1, s) for s in scenes])
+
+    paths = asyncio.run(main())
+    assert paths == [f"{tmp_path}/video_1/scene_{n}.mp3" for n in range(1, 7)]
+    assert peak == 2
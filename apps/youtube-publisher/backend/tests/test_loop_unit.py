@@ -0,0 +1,59 @@
+import asyncio
+import glob
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from app.core.config import settings
+from app.services import video
+from app.services.workspace import workspaces
+
+
+def test_loop_unit_key_depends_on_visual_profile_and_mode(monkeypatch):
+    key = video.loop_unit_key("sha-a", video.SCENE_VIDEO_FILTER, video.SCENE_VIDEO_ARGS)
+
+    assert key == video.loop_unit_key("sha-a", video.SCENE_VIDEO_FILTER, list(video.SCENE_VIDEO_ARGS))
+    assert key != video.loop_unit_key("sha-b", video.SCENE_VIDEO_FILTER, video.SCENE_VIDEO_ARGS)
+    assert key != video.loop_unit_key("sha-a", video.PREVIEW_VIDEO_FILTER, video.SCENE_VIDEO_ARGS)
+    assert key != video.loop_unit_key("sha-a", video.SCENE_VIDEO_FILTER, video.PREVIEW_VIDEO_ARGS)
+
+    other_mode = "boomerang" if settings.PREMIUM_LOOP_MODE == "loop" else "loop"
+    monkeypatch.setattr(settings, "PREMIUM_LOOP_MODE", other_mode)
+    assert key != video.loop_unit_key("sha-a", video.SCENE_VIDEO_FILTER, video.SCENE_VIDEO_ARGS)
+
+
+@pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg requis")
+def test_loop_unit_survives_workspace_release_and_follows_the_visual(tmp_path, monkeypatch):
+    monkeypatch.setattr(video, "TEMP_DIR", str(tmp_path))
+    monkeypatch.setattr(workspaces, "root", str(tmp_path / "work"))
+    monkeypatch.setattr(workspaces, "shared_root", str(tmp_path / "work"))
+
+    def ffmpeg(*args):
+        subprocess.run(["ffmpeg", "-y", "-loglevel", "error", *args], check=True)
+
+    visual, audio = str(tmp_path / "kling.mp4"), str(tmp_path / "scene.mp3")
+    ffmpeg("-f", "lavfi", "-i", "testsrc=size=320x240:rate=25", "-t", "1", visual)
+    ffmpeg("-f", "lavfi", "-i", "sine", "-t", "2", audio)
+
+    def units():
+        return sorted(glob.glob(f"{tmp_path}/video_1_scene_1_loop_*.mp4"))
+
+    async def build():
+        await video._build_looped_scene_clip(1, 0, visual, audio, 2.0, str(tmp_path / "out.mp4"), True)
+
+    asyncio.run(build())
+    first = units()
+    mtime = os.path.getmtime(first[0])
+
+    # Rendu terminé (workspace libéré) puis narration modifiée : unité réutilisée
+    workspaces.release(1, preview=True)
+    asyncio.run(build())
+    assert units() == first
+    assert os.path.getmtime(first[0]) == mtime
+
+    # Nouveau visuel : nouvelle unité
+    ffmpeg("-f", "lavfi", "-i", "testsrc2=size=320x240:rate=25", "-t", "1", visual)
+    asyncio.run(build())
+    assert len(units()) == 2
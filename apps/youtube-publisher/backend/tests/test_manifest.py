@@ -0,0 +1,76 @@
+import asyncio
+import os
+
+from app.services.manifest import MANIFEST_VERSION, SceneManifest, file_sha256, fingerprint
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def write(path, data: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_fingerprint_is_stable_and_input_sensitive():
+    assert fingerprint("PREMIUM", "prompt", "") == fingerprint("PREMIUM", "prompt", "")
+    assert fingerprint("PREMIUM", "prompt", "") != fingerprint("PREMIUM", "prompt 2", "")
+    # Séparateur : ("ab", "c") et ("a", "bc") ne se confondent pas
+    assert fingerprint("ab", "c") != fingerprint("a", "bc")
+
+
+def test_recorded_artifact_is_reusable(tmp_path):
+    manifest = SceneManifest()
+    path = write(tmp_path / "scene_1.mp3", b"narration")
+    entry = run(manifest.record(0, "audio", path, "key", duration=21.5))
+
+    assert entry["sha256"] == file_sha256(path)
+    assert run(manifest.reusable(0, "audio", "key")) == entry
+
+
+def test_changed_fingerprint_or_inputs_are_not_reusable(tmp_path):
+    manifest = SceneManifest()
+    path = write(tmp_path / "clip.mp4", b"clip")
+    run(manifest.record(0, "clip", path, "clip-key", inputs={"image": "a", "audio": "b"}))
+
+    assert run(manifest.reusable(0, "clip", "other-key")) is None
+    assert run(manifest.reusable(0, "clip", "clip-key", {"image": "a", "audio": "c"})) is None
+    assert run(manifest.reusable(0, "clip", "clip-key", {"image": "a", "audio": "b"})) is not None
+
+
+def test_missing_or_modified_file_is_not_reusable(tmp_path):
+    manifest = SceneManifest()
+    path = write(tmp_path / "image.jpg", b"image")
+    run(manifest.record(0, "image", path, "key"))
+
+    # Même taille, contenu différent, mtime changé : le hash tranche
+    write(path, b"IMAGE")
+    os.utime(path, ns=(1, 1))
+    assert run(manifest.reusable(0, "image", "key")) is None
+
+    os.remove(path)
+    assert run(manifest.reusable(0, "image", "key")) is None
+
+
+def test_touched_but_identical_file_stays_reusable(tmp_path):
+    manifest = SceneManifest()
+    path = write(tmp_path / "image.jpg", b"image")
+    run(manifest.record(0, "image", path, "key"))
+    os.utime(path, ns=(1, 1))
+    assert run(manifest.reusable(0, "image", "key")) is not None
+
+
+def test_failed_entries_and_other_versions_are_ignored(tmp_path):
+    manifest = SceneManifest()
+    path = write(tmp_path / "scene.mp3", b"narration")
+    run(manifest.record(1, "audio", path, "key"))
+    manifest.fail(0, "audio", "quota")
+
+    assert run(manifest.reusable(0, "audio", "key")) is None
+    assert manifest.summary(2)["audio"] == 1
+
+    restored = SceneManifest(manifest.to_json())
+    assert run(restored.reusable(1, "audio", "key")) is not None
+    assert SceneManifest({**manifest.to_json(), "version": MANIFEST_VERSION + 1}).scenes == {}
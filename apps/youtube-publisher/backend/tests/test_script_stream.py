@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from app.services.script import SceneStreamParser
+
+SCRIPT = {
+    "title": "Le \"secret\" des {anciens}",
+    "scenes": [
+        {"scene_number": 1, "narration": "Il dit : \"{ouvre} [la porte]\"", "meta": {"tags": ["a", "}"]}},
+        {"scene_number": 2, "narration": "Antislash \\ puis guillemet \\\" fin", "image_prompt": "ciel ]"},
+        {"scene_number": 3, "narration": "Dernière scène", "extra": [{"k": "v"}, []]},
+    ],
+    "summary": "{ pas une scène }",
+}
+TEXT = json.dumps(SCRIPT, ensure_ascii=False, indent=2)
+
+
+def feed_chunks(parser, text, size):
+    scenes = []
+    for i in range(0, len(text), size):
+        scenes += parser.feed(text[i:i + size])
+    return scenes
+
+
+def test_whole_document_at_once():
+    assert SceneStreamParser().feed(TEXT) == SCRIPT["scenes"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_chunk_boundaries_anywhere(size):
+    """Chaînes, échappements et accolades coupés entre deux morceaux."""
+    parser = SceneStreamParser()
+    assert feed_chunks(parser, TEXT, size) == SCRIPT["scenes"]
+    assert parser.emitted == 3
+
+
+def test_scene_emitted_as_soon_as_it_closes():
+    parser = SceneStreamParser()
+    first_end = TEXT.index('"scene_number": 2')
+    scenes = parser.feed(TEXT[:first_end])
+    assert [s["scene_number"] for s in scenes] == [1]
+    assert [s["scene_number"] for s in parser.feed(TEXT[first_end:])] == [2, 3]
+
+
+def test_scenes_key_split_across_chunks():
+    parser = SceneStreamParser()
+    cut = TEXT.index('"scenes"') + 4
+    assert parser.feed(TEXT[:cut]) == []
+    assert len(parser.feed(TEXT[cut:])) == 3
+
+
+def test_text_after_the_array_is_ignored():
+    parser = SceneStreamParser()
+    parser.feed('{"scenes": [{"scene_number": 1}], "other": [{"scene_number": 99}]}')
+    assert parser.feed('{"scene_number": 100}') == []
+    assert parser.emitted == 1
+
+
+def test_malformed_scene_stops_streaming():
+    parser = SceneStreamParser()
+    scenes = parser.feed('{"scenes": [{"scene_number": 1}, {"scene_number": 2,}, {"scene_number": 3}]}')
+    assert scenes == [{"scene_number": 1}]
+    assert parser.feed('{"scene_number": 4}') == []
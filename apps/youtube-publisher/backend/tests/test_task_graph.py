@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from app.services.audio import QuotaExceededError
+from app.services.task_graph import TaskGraph
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_dependencies_receive_results_in_order():
+    async def main():
+        order = []
+
+        async def node(name, *args):
+            order.append(name)
+            return f"{name}({','.join(args)})"
+
+        graph = TaskGraph()
+        graph.add("a", lambda: node("a"))
+        graph.add("b", lambda: node("b"))
+        graph.add("c", lambda a, b: node("c", a, b), deps=["a", "b"])
+        results = await graph.run()
+        return order, results
+
+    order, results = run(main())
+    assert order[-1] == "c"
+    assert results["c"] == "c(a(),b())"
+
+
+def test_nodes_added_while_running():
+    async def main():
+        graph = TaskGraph()
+
+        async def parent():
+            graph.add("child", lambda p: asyncio.sleep(0, result=p + 1), deps=["parent"])
+            return 1
+
+        graph.add("parent", parent)
+        return await graph.run()
+
+    assert run(main()) == {"parent": 1, "child": 2}
+
+
+def test_add_rejects_duplicates_and_unknown_deps():
+    graph = TaskGraph()
+    graph.add("a", lambda: asyncio.sleep(0))
+    with pytest.raises(Exception):
+        graph.add("a", lambda: asyncio.sleep(0))
+    with pytest.raises(Exception):
+        graph.add("b", lambda x: asyncio.sleep(0), deps=["missing"])
+
+
+async def _failing_graph(error, **kwargs):
+    """Un nœud échoue vite, un nœud indépendant est lent ; retourne (exception, nœuds terminés)."""
+    done = []
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise error
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        done.append("slow")
+
+    completed = []
+    graph = TaskGraph(on_complete=lambda key, _: completed.append(key), **kwargs)
+    graph.add("fail", fail)
+    graph.add("slow", slow)
+    graph.add("after_fail", lambda _: asyncio.sleep(0), deps=["fail"])
+    with pytest.raises(type(error)) as raised:
+        await graph.run()
+    return raised.value, done, completed
+
+
+def test_first_failure_cancels_everything_by_default():
+    error, done, completed = run(_failing_graph(ValueError("x")))
+    assert str(error) == "x"
+    assert done == []
+
+
+def test_keep_going_lets_independent_nodes_finish():
+    error, done, completed = run(_failing_graph(ValueError("x"), keep_going=True))
+    assert done == ["slow"]
+    assert completed == ["slow"]
+    assert "after_fail" not in completed
+
+
+def test_fatal_error_cancels_even_with_keep_going():
+    error, done, completed = run(
+        _failing_graph(QuotaExceededError("quota"), keep_going=True, fatal=(QuotaExceededError,))
+    )
+    assert isinstance(error, QuotaExceededError)
+    assert done == []
+
+
+def test_pending_nodes_are_cancelled_not_left_running():
+    async def main():
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        graph = TaskGraph()
+        graph.add("slow", slow)
+        graph.add("fail", fail)
+        with pytest.raises(RuntimeError):
+            await graph.run()
+        return cancelled.is_set()
+
+    assert run(main()) is True
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from app.services import video
+
+
+@pytest.fixture
+def visual_dirs(tmp_path, monkeypatch):
+    images = tmp_path / "images"
+    images.mkdir()
+    monkeypatch.setattr(video, "LOCAL_VISUAL_DIRS", (str(images),))
+    return images
+
+
+def test_http_urls_are_accepted(visual_dirs):
+    assert video.check_visual_source("https://cdn.example.com/a.jpg") == "https://cdn.example.com/a.jpg"
+    assert video.check_visual_source("http://cdn.example.com/a.mp4") == "http://cdn.example.com/a.mp4"
+
+
+def test_generated_files_are_accepted(visual_dirs):
+    image = visual_dirs / "scene_1_task.jpg"
+    image.write_bytes(b"jpg")
+    assert video.check_visual_source(str(image)) == os.path.realpath(image)
+
+
+@pytest.mark.parametrize("source", [
+    "/etc/passwd",
+    "/proc/self/environ",
+    "./.env",
+    "file:///etc/passwd",
+    "ftp://example.com/a.jpg",
+    "gopher://localhost:6379/_INFO",
+])
+def test_other_sources_are_rejected(visual_dirs, source):
+    with pytest.raises(ValueError):
+        video.check_visual_source(source)
+
+
+def test_traversal_and_symlinks_out_of_the_dirs_are_rejected(visual_dirs, tmp_path):
+    secret = tmp_path / "secret.env"
+    secret.write_text("KEY=1")
+    (visual_dirs / "link.jpg").symlink_to(secret)
+
+    with pytest.raises(ValueError):
+        video.check_visual_source(f"{visual_dirs}/../secret.env")
+    with pytest.raises(ValueError):
+        video.check_visual_source(str(visual_dirs / "link.jpg"))
+    with pytest.raises(ValueError):
+        video.check_visual_source(f"{visual_dirs}_other/a.jpg")
+
+
+def test_edit_scene_request_rejects_local_files():
+    from pydantic import ValidationError
+    from app.api.routes.generate import EditSceneRequest
+
+    assert EditSceneRequest(visual_url="https://cdn.example.com/a.jpg").visual_url
+    with pytest.raises(ValidationError):
+        EditSceneRequest(visual_url="/app/.env")
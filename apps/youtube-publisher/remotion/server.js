@@ -8,6 +8,13 @@ app.use(express.json({ limit: "10mb" }));
 const PORT = process.env.PORT || 3001;
 const BROWSER_EXECUTABLE = process.env.PUPPETEER_EXECUTABLE_PATH || "/usr/bin/chromium";
 const OUTPUTS_DIR = "/app/outputs";
+const FPS = 25;
+// Onglets Chromium par rendu (vide = valeur par défaut de Remotion, moitié des cœurs)
+const RENDER_CONCURRENCY = process.env.RENDER_CONCURRENCY ? Number(process.env.RENDER_CONCURRENCY) : null;
+const CHROMIUM_OPTIONS = {
+  disableWebSecurity: true,
+  disableSandbox: true,
+};
 
 // Serve local output files over HTTP so Chromium can load them
 app.use("/outputs", express.static(OUTPUTS_DIR));
@@ -33,6 +40,143 @@ async function getBundle() {
   return bundlePromise;
 }
 
+// Chromium gardé ouvert entre les rendus (promise-safe singleton)
+let browserPromise = null;
+let currentBrowser = null;
+
+// Rendus en cours par navigateur : un navigateur retiré n'est fermé qu'après les siens
+const activeRenders = new Map();
+const retiredBrowsers = new Set();
+
+async function getBrowser() {
+  if (!browserPromise) {
+    const { openBrowser } = await import("@remotion/renderer");
+    console.log("Opening Chromium...");
+    browserPromise = openBrowser("chrome", {
+      browserExecutable: BROWSER_EXECUTABLE,
+      chromiumOptions: CHROMIUM_OPTIONS,
+    }).then((browser) => {
+      currentBrowser = browser;
+      return browser;
+    }).catch((err) => {
+      browserPromise = null;
+      throw err;
+    });
+  }
+  return browserPromise;
+}
+
+// Erreurs de navigateur mort (crash, cible fermée) : les autres sont propres au rendu
+const BROWSER_CRASH = /target closed|browser (has )?(closed|disconnected)|session closed|connection closed|protocol error|crashed/i;
+
+function isBrowserCrash(err) {
+  return BROWSER_CRASH.test(String((err && err.message) || err));
+}
+
+function closeIfIdle(browser) {
+  if (!retiredBrowsers.has(browser) || activeRenders.get(browser)) return;
+  retiredBrowsers.delete(browser);
+  activeRenders.delete(browser);
+  browser.close({ silent: true }).catch(() => {
+    // navigateur déjà fermé
+  });
+}
+
+// Navigateur planté : les rendus suivants en ouvrent un neuf, l'ancien est fermé une fois ses rendus terminés
+function retireBrowser(browser) {
+  if (browser === currentBrowser) {
+    browserPromise = null;
+    currentBrowser = null;
+    compositions.clear();
+    console.warn("Chromium crashed, a new instance will be opened");
+  }
+  retiredBrowsers.add(browser);
+  closeIfIdle(browser);
+}
+
+// Métadonnées des compositions (selectComposition une seule fois par id)
+const compositions = new Map();
+
+async function getComposition(id, inputProps) {
+  if (!compositions.has(id)) {
+    const { selectComposition } = await import("@remotion/renderer");
+    const promise = selectComposition({
+      serveUrl: await getBundle(),
+      id,
+      inputProps,
+      puppeteerInstance: await getBrowser(),
+      browserExecutable: BROWSER_EXECUTABLE,
+      chromiumOptions: CHROMIUM_OPTIONS,
+    }).catch((err) => {
+      compositions.delete(id);
+      throw err;
+    });
+    compositions.set(id, promise);
+  }
+  return compositions.get(id);
+}
+
+/**
+ * Rendu d'une composition à durée imposée, avec le navigateur et le bundle chauds.
+ * Seul un crash du navigateur le fait remplacer ; une erreur de rendu ordinaire
+ * laisse intacts les rendus concurrents.
+ */
+async function renderComposition(id, inputProps, durationInFrames, outputLocation) {
+  const { renderMedia } = await import("@remotion/renderer");
+  const serveUrl = await getBundle();
+  const browser = await getBrowser();
+  activeRenders.set(browser, (activeRenders.get(browser) || 0) + 1);
+
+  try {
+    const composition = await getComposition(id, inputProps);
+    await renderMedia({
+      composition: {
+        ...composition,
+        durationInFrames,
+        fps: FPS,
+        width: 1920,
+        height: 1080,
+        props: inputProps,
+      },
+      serveUrl,
+      codec: "h264",
+      outputLocation,
+      inputProps,
+      puppeteerInstance: browser,
+      browserExecutable: BROWSER_EXECUTABLE,
+      chromiumOptions: CHROMIUM_OPTIONS,
+      concurrency: RENDER_CONCURRENCY,
+      envVariables: {},
+      timeoutInMilliseconds: 120000,
+    });
+  } catch (err) {
+    if (isBrowserCrash(err)) retireBrowser(browser);
+    throw err;
+  } finally {
+    activeRenders.set(browser, activeRenders.get(browser) - 1);
+    closeIfIdle(browser);
+  }
+}
+
+// Convert absolute path to HTTP URL served by this Express server
+function toImageSrc(imagePath) {
+  const relPath = imagePath.startsWith(OUTPUTS_DIR)
+    ? imagePath.slice(OUTPUTS_DIR.length)
+    : imagePath;
+  return `http://localhost:${PORT}/outputs${relPath}`;
+}
+
+function toFrames(durationMs) {
+  return Math.max(25, Math.round((durationMs / 1000) * FPS));
+}
+
+function ensureDir(outputPath) {
+  const outputDir = path.dirname(outputPath);
+  if (!fs.existsSync(outputDir)) {
+    fs.mkdirSync(outputDir, { recursive: true });
+  }
+}
+
 app.get("/health", (req, res) => {
   res.json({ status: "ok" });
 });
@@ -57,57 +201,11 @@ app.post("/render", async (req, res) => {
     return res.status(400).json({ error: `Image non trouvée : ${image_path}` });
   }
 
-  const fps = 25;
-  const durationInFrames = Math.max(25, Math.round((duration_ms / 1000) * fps));
-
-  // Ensure output directory exists
-  const outputDir = path.dirname(output_path);
-  if (!fs.existsSync(outputDir)) {
-    fs.mkdirSync(outputDir, { recursive: true });
-  }
+  const durationInFrames = toFrames(duration_ms);
+  ensureDir(output_path);
 
   try {
-    const bundlePath = await getBundle();
-    const { renderMedia, selectComposition } = await import("@remotion/renderer");
-
-    // Convert absolute path to HTTP URL served by this Express server
-    const relPath = image_path.startsWith(OUTPUTS_DIR)
-      ? image_path.slice(OUTPUTS_DIR.length)
-      : image_path;
-    const imageSrc = `http://localhost:${PORT}/outputs${relPath}`;
-
-    const composition = await selectComposition({
-      serveUrl: bundlePath,
-      id: "KenBurns",
-      inputProps: { imageSrc, direction },
-      browserExecutable: BROWSER_EXECUTABLE,
-      chromiumOptions: {
-        disableWebSecurity: true,
-        disableSandbox: true,
-      },
-    });
-
-    await renderMedia({
-      composition: {
-        ...composition,
-        durationInFrames,
-        fps,
-        width: 1920,
-        height: 1080,
-      },
-      serveUrl: bundlePath,
-      codec: "h264",
-      outputLocation: output_path,
-      inputProps: { imageSrc, direction },
-      browserExecutable: BROWSER_EXECUTABLE,
-      chromiumOptions: {
-        disableWebSecurity: true,
-        disableSandbox: true,
-      },
-      envVariables: {},
-      timeoutInMilliseconds: 120000,
-    });
-
+    await renderComposition("KenBurns", { imageSrc: toImageSrc(image_path), direction }, durationInFrames, output_path);
     console.log(`Rendered: ${output_path} (${durationInFrames} frames)`);
     res.json({ success: true, output_path });
   } catch (err) {
@@ -116,8 +214,64 @@ app.post("/render", async (req, res) => {
   }
 });
 
+/**
+ * POST /render-batch
+ * Body: {
+ *   scenes: [{ image_path, duration_ms, direction? }],  // toutes les scènes d'un épisode
+ *   output_path: string                                 // MP4 unique (muet), scènes bout à bout
+ * }
+ * Un seul renderMedia (composition KenBurnsBatch, une <Sequence> par scène) :
+ * coût fixe navigateur / composition / encodeur payé une fois par épisode.
+ * Réponse : position de chaque scène dans le MP4 (start_frame, duration_frames, fps).
+ */
+app.post("/render-batch", async (req, res) => {
+  const { scenes, output_path } = req.body;
+
+  if (!Array.isArray(scenes) || scenes.length === 0 || !output_path) {
+    return res.status(400).json({ error: "scenes (non vide) et output_path sont requis" });
+  }
+  for (const scene of scenes) {
+    if (!scene.image_path || !scene.duration_ms) {
+      return res.status(400).json({ error: "image_path et duration_ms sont requis pour chaque scène" });
+    }
+    if (!fs.existsSync(scene.image_path)) {
+      return res.status(400).json({ error: `Image non trouvée : ${scene.image_path}` });
+    }
+  }
+
+  let startFrame = 0;
+  const sequences = scenes.map((scene) => {
+    const durationInFrames = toFrames(scene.duration_ms);
+    const sequence = {
+      imageSrc: toImageSrc(scene.image_path),
+      direction: scene.direction || 0,
+      from: startFrame,
+      durationInFrames,
+    };
+    startFrame += durationInFrames;
+    return sequence;
+  });
+
+  ensureDir(output_path);
+
+  try {
+    await renderComposition("KenBurnsBatch", { scenes: sequences }, startFrame, output_path);
+    console.log(`Rendered batch: ${output_path} (${scenes.length} scènes, ${startFrame} frames)`);
+    res.json({
+      success: true,
+      output_path,
+      fps: FPS,
+      scenes: sequences.map((s) => ({ start_frame: s.from, duration_frames: s.durationInFrames })),
+    });
+  } catch (err) {
+    console.error("Remotion batch render error:", err);
+    res.status(500).json({ error: String(err.message || err) });
+  }
+});
+
 app.listen(PORT, () => {
   console.log(`Remotion renderer listening on port ${PORT}`);
-  // Pre-warm the bundle on startup
+  // Pre-warm the bundle and the browser on startup
   getBundle().catch((err) => console.error("Bundle pre-warm failed:", err));
+  getBrowser().catch((err) => console.error("Browser pre-warm failed:", err));
 });
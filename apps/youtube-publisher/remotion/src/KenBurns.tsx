@@ -1,14 +1,17 @@
-import { AbsoluteFill, interpolate, spring, useCurrentFrame, useVideoConfig, Img } from "remotion";
+import { AbsoluteFill, interpolate, spring, useCurrentFrame, useVideoConfig, Img, Sequence } from "remotion";
 
 interface KenBurnsProps {
   imageSrc: string;
   // Ken Burns direction: 0=zoom-in center, 1=zoom-in top-left, 2=zoom-in bottom-right
   direction?: number;
+  // Durée de la scène quand elle est une <Sequence> d'une composition plus longue
+  sceneDurationInFrames?: number;
 }
 
-export const KenBurns: React.FC<KenBurnsProps> = ({ imageSrc, direction = 0 }) => {
+export const KenBurns: React.FC<KenBurnsProps> = ({ imageSrc, direction = 0, sceneDurationInFrames }) => {
   const frame = useCurrentFrame();
-  const { durationInFrames, fps } = useVideoConfig();
+  const config = useVideoConfig();
+  const durationInFrames = sceneDurationInFrames ?? config.durationInFrames;
 
   const progress = frame / durationInFrames;
 
@@ -62,3 +65,27 @@ export const KenBurns: React.FC<KenBurnsProps> = ({ imageSrc, direction = 0 }) =
     </AbsoluteFill>
   );
 };
+
+interface BatchScene {
+  imageSrc: string;
+  direction: number;
+  from: number;
+  durationInFrames: number;
+}
+
+// Toutes les scènes d'un épisode bout à bout : un seul rendu pour l'épisode
+export const KenBurnsBatch: React.FC<{ scenes: BatchScene[] }> = ({ scenes }) => {
+  return (
+    <AbsoluteFill style={{ backgroundColor: "#000" }}>
+      {scenes.map((scene, i) => (
+        <Sequence key={i} from={scene.from} durationInFrames={scene.durationInFrames}>
+          <KenBurns
+            imageSrc={scene.imageSrc}
+            direction={scene.direction}
+            sceneDurationInFrames={scene.durationInFrames}
+          />
+        </Sequence>
+      ))}
+    </AbsoluteFill>
+  );
+};
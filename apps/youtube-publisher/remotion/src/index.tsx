@@ -1,5 +1,5 @@
 import { registerRoot, Composition } from "remotion";
-import { KenBurns } from "./KenBurns";
+import { KenBurns, KenBurnsBatch } from "./KenBurns";
 
 const RemotionRoot: React.FC = () => {
   return (
@@ -16,6 +16,17 @@ const RemotionRoot: React.FC = () => {
           direction: 0,
         }}
       />
+      <Composition
+        id="KenBurnsBatch"
+        component={KenBurnsBatch}
+        durationInFrames={750} // overridden at render time
+        fps={25}
+        width={1920}
+        height={1080}
+        defaultProps={{
+          scenes: [],
+        }}
+      />
     </>
   );
 };
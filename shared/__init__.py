@@ -0,0 +1,6 @@
+"""
+Modules Python partagés entre les apps (youtube-publisher, facebook-publisher, ...).
+
+Copiés dans chaque image backend sous /app/shared via le contexte de build
+nommé `shared` (voir `additional_contexts` dans les docker-compose.yml).
+"""
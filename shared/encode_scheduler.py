@@ -0,0 +1,159 @@
+import os
+import time
+import heapq
+import shutil
+import asyncio
+import logging
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# Priorités : plus grand = servi avant (aperçus / reprises avant la production de masse)
+PRIORITY_BULK = 0
+PRIORITY_NORMAL = 5
+PRIORITY_HIGH = 10
+
+# Priorité héritée par toutes les tâches asyncio créées dans le contexte courant
+encode_priority: ContextVar[int] = ContextVar("encode_priority", default=PRIORITY_NORMAL)
+
+
+def available_cores() -> int:
+    """Cœurs réellement utilisables (affinité CPU / cgroup), pas ceux de la machine hôte."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class EncodeScheduler:
+    """
+    Ordonnanceur unique des processus FFmpeg d'un processus Python.
+
+    - slots = cœurs disponibles // threads par encodage (FFMPEG_THREADS)
+    - file d'attente à priorité (heap), FIFO à priorité égale
+    - `-threads N` injecté dans les commandes ffmpeg qui ne le fixent pas
+    - encodeurs lancés sous `nice` / `ionice` pour garder l'API réactive
+    - compteurs : profondeur de file, encodages en cours, temps d'attente
+    """
+
+    def __init__(self, threads: int = 2, slots: int = 0, nice: int = 10, name: str = "ffmpeg"):
+        self.name = name
+        self.threads = max(threads, 0)
+        self.cores = available_cores()
+        self.slots = slots or max(1, self.cores // max(self.threads, 1))
+        self.nice = nice
+        self._prefix = self._build_prefix(nice)
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._running = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        logger.info(
+            f"{name} : {self.slots} encodage(s) simultané(s) "
+            f"({self.cores} cœurs, {self.threads or 'auto'} threads/encodage, nice {nice})"
+        )
+
+    @staticmethod
+    def _build_prefix(nice: int) -> list:
+        if nice <= 0:
+            return []
+        prefix = []
+        if shutil.which("nice"):
+            prefix += ["nice", "-n", str(nice)]
+        if shutil.which("ionice"):
+            prefix += ["ionice", "-t", "-c", "2", "-n", "7"]
+        return prefix
+
+    @staticmethod
+    @contextmanager
+    def priority(value: int):
+        """Fixe la priorité des encodages lancés dans ce bloc (et des tâches qu'il crée)."""
+        token = encode_priority.set(value)
+        try:
+            yield
+        finally:
+            encode_priority.reset(token)
+
+    def _prepare(self, cmd: list) -> list:
+        cmd = list(cmd)
+        if self.threads and os.path.basename(cmd[0]) == "ffmpeg" and "-threads" not in cmd:
+            # Option de sortie : juste avant le fichier de sortie (dernier argument)
+            cmd[-1:-1] = ["-threads", str(self.threads)]
+        return self._prefix + cmd
+
+    async def acquire(self, priority: int | None = None) -> float:
+        """Attend un slot ; renvoie le temps d'attente en secondes."""
+        priority = encode_priority.get() if priority is None else priority
+        start = time.perf_counter()
+        if self._running < self.slots and not self._heap:
+            self._running += 1
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (-priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Slot déjà transmis juste avant l'annulation : le rendre
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        return time.perf_counter() - start
+
+    def release(self) -> None:
+        """Transmet le slot au prochain en file, sinon le libère."""
+        while self._heap:
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._running -= 1
+
+    async def run(self, cmd: list, priority: int | None = None, **kwargs) -> tuple[int, bytes, bytes]:
+        """Exécute une commande dans un slot. Retourne (returncode, stdout, stderr)."""
+        wait = await self.acquire(priority)
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        if wait > 1:
+            logger.info(f"{self.name} : {wait:.1f}s d'attente de slot ({len(self._heap)} en file)")
+
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self._prepare(cmd),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **kwargs,
+            )
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            if process and process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        finally:
+            self.release()
+
+        if process.returncode == 0:
+            self.completed += 1
+        else:
+            self.failed += 1
+        return process.returncode, stdout, stderr
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "slots": self.slots,
+            "cores": self.cores,
+            "threads_per_encode": self.threads,
+            "running": self._running,
+            "queued": sum(1 for _, _, f in self._heap if not f.done()),
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_s": round(self.total_wait / finished, 3) if finished else 0.0,
+            "max_wait_s": round(self.max_wait, 3),
+        }
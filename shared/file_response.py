@@ -0,0 +1,144 @@
+import os
+import re
+import email.utils
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+
+CHUNK_SIZE = 256 * 1024
+
+# Fichiers régénérés sous le même nom (nouveau rendu) : revalidation via ETag
+CACHE_REVALIDATE = "public, max-age=3600, must-revalidate"
+# Fichiers dont le nom change à chaque rendu (segments HLS versionnés)
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_NO_CACHE = "no-cache"
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def file_etag(st: os.stat_result) -> str:
+    """ETag fort : inode + taille + mtime (ns) changent dès que le fichier est réécrit ou remplacé."""
+    return f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    return etag in [t.strip().removeprefix("W/") for t in header.split(",")]
+
+
+def _not_modified_since(header: str, st: os.stat_result) -> bool:
+    try:
+        since = email.utils.parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return since is not None and int(st.st_mtime) <= since.timestamp()
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Plage (début, fin incluse) d'un en-tête Range à plage unique.
+    None : en-tête ignoré (plages multiples ou syntaxe invalide → réponse complète).
+    Lève ValueError si la plage est hors du fichier (416).
+    """
+    match = _RANGE_RE.fullmatch(header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-N : les N derniers octets
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError("plage vide")
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("plage hors du fichier")
+    return start, end
+
+
+class FileRangeResponse(Response):
+    """Envoie `length` octets d'un fichier à partir de `start`, par blocs (lecture anyio hors boucle)."""
+
+    def __init__(self, path: str, start: int, length: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.length = length
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            async with await anyio.open_file(self.path, "rb") as f:
+                await f.seek(self.start)
+                remaining = self.length
+                while remaining > 0:
+                    chunk = await f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break  # fichier tronqué entre-temps
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+
+def ranged_file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: str | None = None,
+    cache_control: str = CACHE_REVALIDATE,
+) -> Response:
+    """
+    Réponse fichier pour les médias volumineux :
+    - GET conditionnel : If-None-Match / If-Modified-Since → 304 sans corps
+    - Range (plage unique) → 206 + Content-Range, If-Range respecté ; hors fichier → 416
+    - ETag fort, Last-Modified, Cache-Control, Accept-Ranges sur toutes les réponses
+    """
+    st = os.stat(path)
+    etag = file_etag(st)
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": email.utils.formatdate(st.st_mtime, usegmt=True),
+        "cache-control": cache_control,
+    }
+    if filename:
+        headers["content-disposition"] = f'attachment; filename="{filename}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        not_modified = bool(if_modified_since) and _not_modified_since(if_modified_since, st)
+    if not_modified:
+        headers.pop("content-disposition", None)
+        return Response(status_code=304, headers=headers)
+
+    size = st.st_size
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header:
+        # If-Range : la plage n'est servie que si le fichier n'a pas changé depuis
+        if_range = request.headers.get("if-range")
+        if if_range is None or if_range.strip() == etag or if_range.strip() == headers["last-modified"]:
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                headers["content-range"] = f"bytes */{size}"
+                return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        headers["content-length"] = str(size)
+        return FileRangeResponse(path, 0, size, 200, headers, media_type)
+
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    headers["content-length"] = str(end - start + 1)
+    return FileRangeResponse(path, start, end - start + 1, 206, headers, media_type)
@@ -0,0 +1,21 @@
+from shared.kie.client import (
+    KIE_BASE_URL,
+    KieClient,
+    KieError,
+    TaskResult,
+    TokenBucket,
+    get_client,
+    normalize_record,
+)
+from shared.kie.uploads import UploadCache
+
+__all__ = [
+    "KIE_BASE_URL",
+    "KieClient",
+    "KieError",
+    "TaskResult",
+    "TokenBucket",
+    "UploadCache",
+    "get_client",
+    "normalize_record",
+]
@@ -0,0 +1,424 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import mimetypes
+import importlib.util
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import httpx
+
+logger = logging.getLogger(__name__)
+
+KIE_BASE_URL = "https://api.kie.ai"
+
+# Lecture de l'état d'une tâche selon la famille d'API
+RECORD_PATHS = {
+    "jobs": "/api/v1/jobs/recordInfo",
+    "gpt4o-image": "/api/v1/gpt4o-image/record-info",
+    "veo": "/api/v1/veo/record-info",
+}
+
+# successFlag / status des API historiques (gpt4o-image, veo)
+FAILED_FLAGS = {-1, 2, 3}
+FAILED_STATUSES = {"FAILED", "CREATE_TASK_FAILED", "GENERATE_FAILED"}
+
+# Bornes (secondes) des histogrammes de latence par modèle
+LATENCY_BUCKETS = (10, 20, 30, 60, 120, 300, 600)
+
+# HTTP/2 si le paquet h2 est installé (httpx[http2]), HTTP/1.1 keep-alive sinon
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class KieError(Exception):
+    pass
+
+
+@dataclass
+class TaskResult:
+    task_id: str
+    state: str                      # "pending", "success" ou "fail"
+    urls: list = field(default_factory=list)
+    error: str | None = None
+    record: dict = field(default_factory=dict)
+
+    @property
+    def done(self) -> bool:
+        return self.state != "pending"
+
+
+def normalize_record(kind: str, task_id: str, data: dict | None) -> TaskResult:
+    """État d'une tâche, quelle que soit la famille d'API (jobs, gpt4o-image, veo)."""
+    data = data or {}
+    if kind == "jobs":
+        state = data.get("state")
+        if state == "success":
+            urls = json.loads(data["resultJson"]).get("resultUrls", []) if data.get("resultJson") else []
+            if not urls:
+                return TaskResult(task_id, "fail", error="aucune URL dans le résultat", record=data)
+            return TaskResult(task_id, "success", urls, record=data)
+        if state == "fail":
+            return TaskResult(task_id, "fail", error=data.get("failMsg"), record=data)
+        return TaskResult(task_id, "pending", record=data)
+
+    flag = data.get("successFlag")
+    status = data.get("status")
+    if flag == 1 or status == "SUCCESS":
+        response = data.get("response") or {}
+        urls = response.get("resultUrls") or response.get("originUrls") or []
+        if not urls:
+            return TaskResult(task_id, "fail", error="aucune URL dans le résultat", record=data)
+        return TaskResult(task_id, "success", list(urls), record=data)
+    if flag in FAILED_FLAGS or status in FAILED_STATUSES:
+        error = data.get("errorMessage") or f"successFlag={flag}, status={status}"
+        return TaskResult(task_id, "fail", error=error, record=data)
+    return TaskResult(task_id, "pending", record=data)
+
+
+class TokenBucket:
+    """Limiteur de débit : `rate` requêtes/s en régime établi, rafales jusqu'à `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+
+# Un seul bucket par clé API : les quotas Kie.ai sont par compte, pas par client
+_buckets: dict[str, TokenBucket] = {}
+
+
+def _bucket_for(api_key: str, rate: float, burst: int) -> TokenBucket:
+    bucket = _buckets.get(api_key)
+    if bucket is None:
+        bucket = _buckets[api_key] = TokenBucket(rate, burst)
+    return bucket
+
+
+@dataclass
+class _PendingTask:
+    task_id: str
+    kind: str
+    model: str
+    future: asyncio.Future
+    started: float
+    next_poll: float
+    poll_floor: float
+
+
+class KieClient:
+    """
+    Client Kie.ai partagé par les apps d'un processus.
+
+    - un seul httpx.AsyncClient (HTTP/2 si disponible) : connexions TLS réutilisées
+    - débit borné par un token bucket par clé API
+    - multiplexeur de polling : toutes les tâches en attente sont vérifiées par
+      une seule boucle, à un intervalle qui croît avec l'âge de chaque tâche
+      (min_poll → max_poll) ; `resolve()` termine une tâche sans attendre le
+      prochain poll (callbacks)
+    - téléchargement des résultats en streaming vers un fichier
+    - histogrammes de latence (création → résultat) par modèle
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = KIE_BASE_URL,
+        rate: float = 2.0,
+        burst: int = 10,
+        min_poll: float = 2.0,
+        max_poll: float = 15.0,
+        max_connections: int = 20,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.min_poll = min_poll
+        self.max_poll = max_poll
+        self.max_connections = max_connections
+        self.bucket = _bucket_for(api_key, rate, burst)
+        self._http: httpx.AsyncClient | None = None
+        self._pending: dict[str, _PendingTask] = {}
+        # Callbacks reçus avant l'appel à wait() (réponse du createTask pas encore traitée)
+        self._early: OrderedDict = OrderedDict()
+        self._wake: asyncio.Event | None = None
+        self._poller: asyncio.Task | None = None
+        self.counters = {
+            "requests": 0, "polls": 0, "callbacks": 0, "completed": 0, "failed": 0,
+            "timeouts": 0, "downloads": 0, "download_bytes": 0,
+        }
+        self.latency: dict[str, dict] = {}
+
+    # ── HTTP ────────────────────────────────────────────────────
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=120,
+                ),
+                timeout=httpx.Timeout(60.0, connect=15.0),
+                follow_redirects=True,
+            )
+        return self._http
+
+    async def request(self, method: str, path: str, **kwargs) -> dict:
+        """Appel à l'API Kie.ai (débit limité). La clé n'est jamais envoyée aux CDN de résultats."""
+        await self.bucket.acquire()
+        self.counters["requests"] += 1
+        headers = {"Authorization": f"Bearer {self.api_key}", **kwargs.pop("headers", {})}
+        response = await self.http.request(method, path, headers=headers, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def submit(self, path: str, payload: dict) -> str:
+        """Crée une tâche sur un endpoint de génération ; retourne son taskId."""
+        data = await self.request("POST", path, json=payload)
+        if data.get("code") != 200:
+            raise KieError(f"Kie.ai : création de tâche refusée ({data.get('msg')})")
+        return data["data"]["taskId"]
+
+    async def create_task(self, model: str, input: dict, callback_url: str | None = None) -> str:
+        """API jobs (/jobs/createTask) : Kling, Flux, Nano Banana..."""
+        payload = {"model": model, "input": input}
+        if callback_url:
+            payload["callBackUrl"] = callback_url
+        return await self.submit("/api/v1/jobs/createTask", payload)
+
+    async def record(self, task_id: str, kind: str = "jobs") -> TaskResult:
+        """Lit l'état courant d'une tâche (un seul appel, sans attente)."""
+        data = await self.request("GET", RECORD_PATHS[kind], params={"taskId": task_id})
+        if data.get("code") != 200:
+            raise KieError(f"Kie.ai : lecture de la tâche {task_id} refusée ({data.get('msg')})")
+        return normalize_record(kind, task_id, data.get("data"))
+
+    async def upload_file(self, path: str, upload_path: str = "uploads") -> str:
+        """Upload d'un fichier local (file-stream-upload) ; retourne son URL de téléchargement."""
+        filename = os.path.basename(path)
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        with open(path, "rb") as f:
+            # Fichier passé tel quel : envoyé par blocs, sans le charger en mémoire
+            data = await self.request(
+                "POST",
+                "/api/file-stream-upload",
+                files={"file": (filename, f, content_type)},
+                data={"uploadPath": upload_path},
+            )
+        if not data.get("success") and data.get("code") != 200:
+            raise KieError(f"Kie.ai : upload de {filename} échoué ({data.get('msg')})")
+        return data["data"]["downloadUrl"]
+
+    async def download(self, url: str, dest: str, timeout: float = 120.0) -> int:
+        """Télécharge un résultat en streaming (écriture atomique) ; retourne la taille en octets."""
+        directory = os.path.dirname(dest) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".part")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async with self.http.stream("GET", url, timeout=timeout) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes(256 * 1024):
+                        f.write(chunk)
+                        size += len(chunk)
+            os.replace(tmp, dest)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self.counters["downloads"] += 1
+        self.counters["download_bytes"] += size
+        return size
+
+    # ── Attente des tâches ──────────────────────────────────────
+
+    async def wait(
+        self,
+        task_id: str,
+        kind: str = "jobs",
+        model: str | None = None,
+        timeout: float = 600.0,
+        poll_floor: float | None = None,
+    ) -> TaskResult:
+        """
+        Attend la fin d'une tâche (polling multiplexé ou `resolve()`).
+        `poll_floor` relève l'intervalle minimal de polling, par exemple quand
+        un callback est attendu et que le polling n'est qu'un filet de sécurité.
+        Lève KieError en cas d'échec ou de timeout.
+        """
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        floor = max(poll_floor or 0.0, self.min_poll)
+        entry = _PendingTask(task_id, kind, model or kind, loop.create_future(), now, now + floor, floor)
+        self._pending[task_id] = entry
+        if task_id in self._early:
+            self._settle(entry, self._early.pop(task_id))
+        self._ensure_poller()
+
+        try:
+            result = await asyncio.wait_for(asyncio.shield(entry.future), timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise KieError(f"Kie.ai : tâche {task_id} sans résultat après {timeout:.0f}s")
+        finally:
+            self._pending.pop(task_id, None)
+
+        if result.state == "fail":
+            raise KieError(f"Kie.ai : tâche {task_id} échouée ({result.error})")
+        return result
+
+    def resolve(self, task_id: str, data: dict | None, kind: str = "jobs") -> bool:
+        """
+        Termine l'attente d'une tâche à partir d'un callback. `data` = record de
+        la tâche ; None = forcer un poll immédiat. True si une attente a été servie.
+        """
+        entry = self._pending.get(task_id)
+        if data is None:
+            if entry is None:
+                return False
+            entry.next_poll = 0.0
+            self._wake_poller()
+            return True
+
+        result = normalize_record(entry.kind if entry else kind, task_id, data)
+        if not result.done:
+            return False
+        self.counters["callbacks"] += 1
+        if entry is None:
+            self._early[task_id] = result
+            while len(self._early) > 256:
+                self._early.popitem(last=False)
+            return False
+        self._settle(entry, result)
+        return True
+
+    def _settle(self, entry: _PendingTask, result: TaskResult) -> None:
+        if entry.future.done():
+            return
+        self._observe(entry.model, time.monotonic() - entry.started)
+        self.counters["completed" if result.state == "success" else "failed"] += 1
+        entry.future.set_result(result)
+
+    def _wake_poller(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    def _ensure_poller(self) -> None:
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_loop(), name="kie-poller")
+        self._wake_poller()
+
+    def _interval(self, entry: _PendingTask, now: float) -> float:
+        # Tâche jeune : polling serré (images en ~20 s) ; tâche ancienne : espacé (vidéos)
+        ceiling = max(self.max_poll, entry.poll_floor)
+        return min(max(entry.poll_floor, (now - entry.started) * 0.1), ceiling)
+
+    async def _poll_one(self, entry: _PendingTask) -> None:
+        try:
+            result = await self.record(entry.task_id, entry.kind)
+            self.counters["polls"] += 1
+        except Exception as e:
+            logger.warning(f"Kie.ai : poll de {entry.task_id} échoué : {e}")
+            result = None
+        if result is not None and result.done:
+            self._settle(entry, result)
+        else:
+            now = time.monotonic()
+            entry.next_poll = now + self._interval(entry, now)
+
+    async def _poll_loop(self) -> None:
+        """Boucle unique : interroge les tâches arrivées à échéance, dort jusqu'à la prochaine."""
+        while True:
+            now = time.monotonic()
+            waiting = [e for e in self._pending.values() if not e.future.done()]
+            if not waiting:
+                return
+            due = [e for e in waiting if e.next_poll <= now]
+            if due:
+                await asyncio.gather(*(self._poll_one(e) for e in due))
+                continue
+
+            self._wake.clear()
+            delay = min(e.next_poll for e in waiting) - now
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(delay, 0.0))
+            except asyncio.TimeoutError:
+                pass
+
+    # ── Statistiques ────────────────────────────────────────────
+
+    def _observe(self, model: str, seconds: float) -> None:
+        hist = self.latency.setdefault(
+            model, {"count": 0, "sum_s": 0.0, "max_s": 0.0, "buckets": [0] * (len(LATENCY_BUCKETS) + 1)}
+        )
+        hist["count"] += 1
+        hist["sum_s"] += seconds
+        hist["max_s"] = max(hist["max_s"], seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+                break
+        else:
+            hist["buckets"][-1] += 1
+
+    def stats(self) -> dict:
+        labels = [f"<={b}s" for b in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+        return {
+            **self.counters,
+            "pending": len(self._pending),
+            "http2": HTTP2_AVAILABLE,
+            "rate_limit_wait_s": round(self.bucket.waited, 3),
+            "latency": {
+                model: {
+                    "count": h["count"],
+                    "avg_s": round(h["sum_s"] / h["count"], 2) if h["count"] else 0.0,
+                    "max_s": round(h["max_s"], 2),
+                    "buckets": dict(zip(labels, h["buckets"])),
+                }
+                for model, h in self.latency.items()
+            },
+        }
+
+    async def aclose(self) -> None:
+        if self._poller and not self._poller.done():
+            self._poller.cancel()
+        if self._http is not None:
+            await self._http.aclose()
+
+
+# Un client par clé API et par processus
+_clients: dict[str, KieClient] = {}
+
+
+def get_client(api_key: str, **options) -> KieClient:
+    """Client partagé pour `api_key` (les options ne s'appliquent qu'à la première création)."""
+    client = _clients.get(api_key)
+    if client is None:
+        client = _clients[api_key] = KieClient(api_key, **options)
+    return client
@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadCache:
+    """
+    URLs Kie.ai des fichiers déjà uploadés, par hash de contenu.
+
+    Un fichier n'est ré-uploadé que si son contenu change ou si l'URL connue
+    expire (Kie.ai supprime les uploads après quelques jours). Index JSON
+    partagé entre processus (écriture atomique) ; au pire deux processus
+    uploadent le même fichier une fois chacun.
+    """
+
+    def __init__(self, index_path: str, ttl_seconds: float, min_remaining: float = 3600):
+        self.index_path = index_path
+        self.ttl_seconds = ttl_seconds
+        # Une URL utilisée par une tâche doit rester valide jusqu'à la fin de celle-ci
+        self.min_remaining = min_remaining
+        self.hits = 0
+        self.uploads = 0
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _load(self) -> dict:
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries: dict) -> None:
+        directory = os.path.dirname(self.index_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f, indent=1)
+            os.replace(tmp, self.index_path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    async def url_for(self, client, path: str, upload_path: str = "uploads") -> str:
+        """URL Kie.ai de `path` : depuis l'index si encore valide, sinon upload via `client`."""
+        digest = await asyncio.to_thread(_sha256, path)
+        lock = self._locks.setdefault(digest, asyncio.Lock())
+        async with lock:
+            entry = self._load().get(digest)
+            if entry and entry["expires_at"] - time.time() > self.min_remaining:
+                self.hits += 1
+                return entry["url"]
+
+            url = await client.upload_file(path, upload_path)
+            self.uploads += 1
+            now = time.time()
+            entries = {k: v for k, v in self._load().items() if v.get("expires_at", 0) > now}
+            entries[digest] = {
+                "url": url,
+                "name": os.path.basename(path),
+                "uploaded_at": now,
+                "expires_at": now + self.ttl_seconds,
+            }
+            self._save(entries)
+            logger.info(f"Kie.ai : {os.path.basename(path)} uploadé ({digest[:12]})")
+            return url
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "uploads": self.uploads, "ttl_hours": round(self.ttl_seconds / 3600, 1)}
@@ -0,0 +1,404 @@
+"""
+Lecture de la durée et des flux d'un fichier média sans lancer de processus.
+
+- MP3 : en-têtes de frames (Xing/Info/VBRI si présents, sinon CBR estimé ou parcours des frames)
+- MP4 / MOV : atomes moov → mvhd (durée) et trak → tkhd / mdhd / hdlr / stsd (flux)
+- WAV : chunks RIFF fmt + data
+
+Les autres formats passent par ffprobe (asynchrone). Résultats mis en cache par
+(chemin, mtime, taille) : un fichier déjà sondé ne coûte qu'une lecture de dict.
+"""
+import os
+import json
+import stat
+import struct
+import asyncio
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_ENTRIES = 4096
+
+_cache: OrderedDict = OrderedDict()
+
+
+# ══════════════════════════════════════════════════════
+# 🎵 MP3
+# ══════════════════════════════════════════════════════
+
+_MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 25: [11025, 12000, 8000]}
+_MP3_VERSIONS = {3: 1, 2: 2, 0: 25}       # bits → MPEG 1 / 2 / 2.5
+_MP3_LAYERS = {3: 1, 2: 2, 1: 3}          # bits → Layer I / II / III
+
+# Au-delà, un MP3 sans en-tête Xing est parcouru frame par frame plutôt qu'estimé CBR
+_MP3_CBR_CHECK_FRAMES = 8
+
+
+def _mp3_frame(header: bytes) -> dict | None:
+    """Décode un en-tête de frame MPEG audio (4 octets) ; None si invalide."""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = _MP3_VERSIONS.get((header[1] >> 3) & 0x03)
+    layer = _MP3_LAYERS.get((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    channels = 1 if (header[3] >> 6) == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or version == 1) else 576
+        length = (samples // 8) * bitrate // sample_rate + padding
+
+    return {
+        "version": version,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "samples": samples,
+        "length": length,
+    }
+
+
+def _id3v2_size(data: bytes) -> int:
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _probe_mp3(f, file_size: int) -> dict | None:
+    head = f.read(10)
+    offset = _id3v2_size(head)
+
+    # Première frame valide (suivie d'une seconde frame valide, pour éviter les faux sync)
+    f.seek(offset)
+    window = f.read(64 * 1024)
+    first = None
+    for i in range(len(window) - 4):
+        if window[i] != 0xFF:
+            continue
+        frame = _mp3_frame(window[i:i + 4])
+        if not frame:
+            continue
+        following = _mp3_frame(window[i + frame["length"]:i + frame["length"] + 4])
+        if following or i + frame["length"] >= len(window):
+            first, offset = frame, offset + i
+            break
+    if not first:
+        return None
+
+    stream = {
+        "codec_type": "audio",
+        "codec_name": "mp3",
+        "sample_rate": first["sample_rate"],
+        "channels": first["channels"],
+    }
+
+    # En-tête VBR (Xing / Info) dans la première frame
+    f.seek(offset)
+    frame_data = f.read(first["length"])
+    if first["version"] == 1:
+        side_info = 17 if first["channels"] == 1 else 32
+    else:
+        side_info = 9 if first["channels"] == 1 else 17
+    tag = frame_data[4 + side_info:4 + side_info + 4]
+    frames = None
+    if tag in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", frame_data[8 + side_info:12 + side_info])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", frame_data[12 + side_info:16 + side_info])[0]
+    elif frame_data[36:40] == b"VBRI":
+        frames = struct.unpack(">I", frame_data[50:54])[0]
+
+    if frames:
+        duration = frames * first["samples"] / first["sample_rate"]
+        stream["bit_rate"] = first["bitrate"] if tag == b"Info" else None
+        return {"format": "mp3", "duration": duration, "streams": [stream]}
+
+    # Sans en-tête VBR : CBR si les premières frames ont le même débit, sinon parcours complet
+    f.seek(offset)
+    position = offset
+    bitrates = set()
+    frames = 0
+    samples = 0
+    audio_end = file_size
+    f.seek(max(file_size - 128, 0))
+    if f.read(3) == b"TAG":
+        audio_end -= 128
+
+    while position + 4 <= audio_end:
+        f.seek(position)
+        frame = _mp3_frame(f.read(4))
+        if not frame or frame["length"] <= 0:
+            break
+        bitrates.add(frame["bitrate"])
+        frames += 1
+        samples += frame["samples"]
+        position += frame["length"]
+        if frames == _MP3_CBR_CHECK_FRAMES and len(bitrates) == 1:
+            duration = (audio_end - offset) * 8 / first["bitrate"]
+            stream["bit_rate"] = first["bitrate"]
+            return {"format": "mp3", "duration": duration, "streams": [stream]}
+
+    if not frames:
+        return None
+    return {"format": "mp3", "duration": samples / first["sample_rate"], "streams": [stream]}
+
+
+# ══════════════════════════════════════════════════════
+# 🎬 MP4 / MOV
+# ══════════════════════════════════════════════════════
+
+def _iter_boxes(f, start: int, end: int):
+    """Itère (type, offset_contenu, taille_contenu) des atomes entre start et end."""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size:
+            return
+        yield box_type, position + header_size, size - header_size
+        position += size
+
+
+def _find_box(f, start: int, end: int, box_type: bytes) -> tuple[int, int] | None:
+    for kind, offset, size in _iter_boxes(f, start, end):
+        if kind == box_type:
+            return offset, size
+    return None
+
+
+def _read_time_header(f, offset: int) -> tuple[int, int]:
+    """(timescale, durée) d'un mvhd / mdhd (versions 0 et 1)."""
+    f.seek(offset)
+    version = f.read(1)[0]
+    if version == 1:
+        f.seek(offset + 20)
+        timescale, duration = struct.unpack(">IQ", f.read(12))
+    else:
+        f.seek(offset + 12)
+        timescale, duration = struct.unpack(">II", f.read(8))
+    return timescale, duration
+
+
+def _probe_trak(f, offset: int, size: int) -> dict | None:
+    end = offset + size
+    mdia = _find_box(f, offset, end, b"mdia")
+    if not mdia:
+        return None
+    mdia_end = mdia[0] + mdia[1]
+
+    hdlr = _find_box(f, mdia[0], mdia_end, b"hdlr")
+    handler = b""
+    if hdlr:
+        f.seek(hdlr[0] + 8)
+        handler = f.read(4)
+    codec_type = {b"vide": "video", b"soun": "audio"}.get(handler)
+    if not codec_type:
+        return None
+
+    stream = {"codec_type": codec_type}
+    mdhd = _find_box(f, mdia[0], mdia_end, b"mdhd")
+    if mdhd:
+        timescale, duration = _read_time_header(f, mdhd[0])
+        if timescale:
+            stream["duration"] = duration / timescale
+            stream["time_base"] = f"1/{timescale}"
+
+    # Codec = premier sample entry du stsd (avc1, hvc1, mp4a…)
+    minf = _find_box(f, mdia[0], mdia_end, b"minf")
+    stbl = _find_box(f, minf[0], minf[0] + minf[1], b"stbl") if minf else None
+    stsd = _find_box(f, stbl[0], stbl[0] + stbl[1], b"stsd") if stbl else None
+    if stsd:
+        f.seek(stsd[0] + 8)
+        entry = f.read(8 + 28)
+        if len(entry) >= 8:
+            stream["codec_tag"] = entry[4:8].decode("latin-1")
+        if codec_type == "audio" and len(entry) >= 36:
+            stream["channels"] = struct.unpack(">H", entry[24:26])[0]
+            stream["sample_rate"] = struct.unpack(">I", entry[32:36])[0] >> 16
+
+    if codec_type == "video":
+        tkhd = _find_box(f, offset, end, b"tkhd")
+        if tkhd:
+            f.seek(tkhd[0])
+            version = f.read(1)[0]
+            f.seek(tkhd[0] + (88 if version == 1 else 76))
+            width, height = struct.unpack(">II", f.read(8))
+            stream["width"] = width >> 16
+            stream["height"] = height >> 16
+    return stream
+
+
+def _probe_mp4(f, file_size: int) -> dict | None:
+    moov = _find_box(f, 0, file_size, b"moov")
+    if not moov:
+        return None
+    moov_end = moov[0] + moov[1]
+
+    mvhd = _find_box(f, moov[0], moov_end, b"mvhd")
+    if not mvhd:
+        return None
+    timescale, duration = _read_time_header(f, mvhd[0])
+    if not timescale:
+        return None
+
+    streams = []
+    for kind, offset, size in _iter_boxes(f, moov[0], moov_end):
+        if kind == b"trak":
+            stream = _probe_trak(f, offset, size)
+            if stream:
+                streams.append(stream)
+
+    total = duration / timescale
+    if not total and streams:
+        # mvhd sans durée (fMP4) : plus long des flux
+        total = max(s.get("duration", 0) for s in streams)
+    return {"format": "mp4", "duration": total, "streams": streams}
+
+
+# ══════════════════════════════════════════════════════
+# 🔊 WAV
+# ══════════════════════════════════════════════════════
+
+def _probe_wav(f, file_size: int) -> dict | None:
+    fmt = None
+    data_size = None
+    data_offset = None
+    position = 12
+    while position + 8 <= file_size:
+        f.seek(position)
+        chunk_id, size = struct.unpack("<4sI", f.read(8))
+        if chunk_id == b"fmt ":
+            audio_format, channels, sample_rate, byte_rate, _, bits = struct.unpack("<HHIIHH", f.read(16))
+            fmt = {
+                "codec_type": "audio",
+                "codec_name": "pcm" if audio_format in (1, 0xFFFE) else f"wav_{audio_format}",
+                "channels": channels,
+                "sample_rate": sample_rate,
+                "bits_per_sample": bits,
+                "bit_rate": byte_rate * 8,
+            }
+        elif chunk_id == b"data":
+            data_offset = position + 8
+            data_size = size
+            break
+        position += 8 + size + (size & 1)
+
+    if not fmt or data_offset is None or not fmt["bit_rate"]:
+        return None
+    # Taille inconnue (WAV écrit en flux) : jusqu'à la fin du fichier
+    if data_size in (0, 0xFFFFFFFF) or data_offset + data_size > file_size:
+        data_size = file_size - data_offset
+    return {"format": "wav", "duration": data_size * 8 / fmt["bit_rate"], "streams": [fmt]}
+
+
+# ══════════════════════════════════════════════════════
+# 🔎 API
+# ══════════════════════════════════════════════════════
+
+def probe_file(path: str) -> dict | None:
+    """Sonde en pur Python. None si le format n'est pas reconnu."""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        magic = f.read(12)
+        try:
+            if magic[:4] == b"RIFF" and magic[8:12] == b"WAVE":
+                return _probe_wav(f, file_size)
+            if magic[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide"):
+                return _probe_mp4(f, file_size)
+            if magic[:3] == b"ID3" or (len(magic) >= 2 and magic[0] == 0xFF and (magic[1] & 0xE0) == 0xE0):
+                return _probe_mp3(f, file_size)
+        except (struct.error, IndexError, ValueError) as e:
+            logger.warning(f"Sonde interne échouée pour {path} : {e}")
+    return None
+
+
+async def _ffprobe(path: str) -> dict | None:
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "quiet", "-print_format", "json",
+        "-show_format", "-show_streams", path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, _ = await process.communicate()
+    if process.returncode != 0:
+        return None
+    data = json.loads(stdout)
+    try:
+        duration = float(data.get("format", {}).get("duration", 0))
+    except (TypeError, ValueError):
+        duration = 0.0
+    return {
+        "format": data.get("format", {}).get("format_name", "unknown"),
+        "duration": duration,
+        "streams": data.get("streams", []),
+    }
+
+
+async def probe(path: str) -> dict | None:
+    """
+    Durée + flux d'un fichier : {"format", "duration", "streams"}.
+    Pur Python pour MP3 / MP4 / WAV, ffprobe asynchrone sinon ; None si illisible.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    key = (os.path.realpath(path), st.st_mtime_ns, st.st_size)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    info = probe_file(path)
+    if info is None:
+        try:
+            info = await _ffprobe(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"ffprobe indisponible pour {path} : {e}")
+            info = None
+    if info is None:
+        return None
+
+    _cache[key] = info
+    if len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+    return info
+
+
+async def probe_duration(path: str, default: float | None = None) -> float | None:
+    """Durée en secondes, ou `default` si le fichier est illisible."""
+    info = await probe(path)
+    if not info or not info.get("duration"):
+        return default
+    return info["duration"]
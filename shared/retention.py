@@ -0,0 +1,280 @@
+import os
+import re
+import gzip
+import time
+import shutil
+import fcntl
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Formats déjà compressés : archivés tels quels (gzip ne gagnerait rien)
+COMPRESSED_EXTENSIONS = {".mp4", ".mp3", ".m4a", ".wav", ".jpg", ".jpeg", ".png", ".webp", ".gz"}
+
+# Détail des actions renvoyé par les API (les compteurs du rapport restent exacts au-delà)
+REPORT_MAX_ACTIONS = 500
+
+
+def _entry_bytes(entry: os.DirEntry) -> int:
+    if not entry.is_dir(follow_symlinks=False):
+        return entry.stat(follow_symlinks=False).st_size
+    total = 0
+    for dirpath, _, filenames in os.walk(entry.path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+class RetentionPolicy:
+    """
+    Règle de rétention d'une classe d'artefacts : entrées (fichiers ou dossiers)
+    au premier niveau de `root` dont le nom correspond à `pattern`.
+
+    Le propriétaire (ligne en base) est le groupe nommé `owner` du motif ; sans ce
+    groupe, il est retrouvé par chemin dans les références fournies à run().
+    L'action (delete ou archive) s'applique quand le statut du propriétaire figure dans
+    `expire_after` (statut → âge minimal en heures, d'après le mtime). Une entrée sans
+    propriétaire connu est orpheline : supprimée après le délai de grâce du moteur.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        root: str,
+        pattern: str,
+        action: str = "delete",
+        expire_after: dict | None = None,
+    ):
+        if action not in ("delete", "archive"):
+            raise ValueError(f"Action de rétention inconnue : {action}")
+        self.name = name
+        self.root = root
+        self.pattern = re.compile(pattern)
+        self.action = action
+        self.expire_after = expire_after or {}
+
+    def owner_of(self, name: str, path: str, references: dict) -> str | None:
+        match = self.pattern.fullmatch(name)
+        if "owner" in self.pattern.groupindex:
+            return match.group("owner")
+        return references.get(path)
+
+    def applies(self, status: str | None, age_hours: float) -> bool:
+        if status not in self.expire_after:
+            return False
+        return age_hours >= self.expire_after[status]
+
+
+class RetentionEngine:
+    """
+    Moteur de rétention des sorties générées : une passe parcourt le premier
+    niveau de chaque dossier de politique (os.scandir, sans récursion hors
+    dossiers concernés), confronte chaque entrée aux lignes en base et
+    supprime ou archive ce qui a expiré.
+
+    - run(owners, references, dry_run=True) : rapport seul, rien n'est touché
+    - archive : déplacé sous archive_dir/<politique>/ (volume froid), gzip pour
+      les formats non compressés ; le rapport donne le nouveau chemin
+    - un verrou fichier (flock) évite deux passes simultanées entre workers
+    """
+
+    def __init__(
+        self,
+        policies: list,
+        archive_dir: str | None = None,
+        orphan_grace_hours: float = 24,
+        lock_path: str | None = None,
+    ):
+        self.policies = policies
+        self.archive_dir = archive_dir
+        self.orphan_grace_hours = orphan_grace_hours
+        self.lock_path = lock_path
+        self.runs = 0
+        self.freed_bytes = 0
+        self.archived_bytes = 0
+        self.last_run = None
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        """Descripteur verrouillé, None si une passe tourne déjà (ici ou dans un autre process)."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        if not self.lock_path:
+            return -1
+        fd = None
+        try:
+            os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except OSError:
+            if fd is not None:
+                os.close(fd)
+            self._lock.release()
+            return None
+
+    def _release(self, fd) -> None:
+        if fd is not None and fd >= 0:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        self._lock.release()
+
+    def scan(self, policy: RetentionPolicy):
+        """Entrées (fichiers ou dossiers) du dossier de la politique dont le nom correspond au motif."""
+        try:
+            with os.scandir(policy.root) as it:
+                for entry in it:
+                    if policy.pattern.fullmatch(entry.name):
+                        yield entry
+        except FileNotFoundError:
+            return
+
+    def _archive(self, policy: RetentionPolicy, entry: os.DirEntry) -> str:
+        target_dir = os.path.join(self.archive_dir, policy.name)
+        os.makedirs(target_dir, exist_ok=True)
+        ext = os.path.splitext(entry.name)[1].lower()
+        if entry.is_file(follow_symlinks=False) and ext not in COMPRESSED_EXTENSIONS:
+            target = os.path.join(target_dir, f"{entry.name}.gz")
+            part = f"{target}.part"
+            with open(entry.path, "rb") as src, gzip.open(part, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(part, target)
+            os.remove(entry.path)
+        else:
+            target = os.path.join(target_dir, entry.name)
+            shutil.move(entry.path, target)
+        return target
+
+    @staticmethod
+    def _delete(entry: os.DirEntry) -> None:
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        else:
+            os.remove(entry.path)
+
+    def run(self, owners: dict, references: dict | None = None, dry_run: bool = True) -> dict | None:
+        """
+        Une passe de rétention. `owners` : id propriétaire → statut ; `references` :
+        chemin → id propriétaire (artefacts dont le nom ne contient pas l'id).
+        Retourne le rapport, None si une autre passe est en cours.
+        """
+        fd = self._acquire()
+        if fd is None:
+            logger.info("Rétention déjà en cours, passe ignorée")
+            return None
+        try:
+            return self._run(owners, references or {}, dry_run)
+        finally:
+            self._release(fd)
+
+    def _run(self, owners: dict, references: dict, dry_run: bool) -> dict:
+        started = time.monotonic()
+        now = time.time()
+        report = {
+            "dry_run": dry_run,
+            "scanned": 0,
+            "policies": {},
+            "orphans": {"count": 0, "bytes": 0},
+            "freed_bytes": 0,
+            "archived_bytes": 0,
+            "actions": [],
+            "errors": [],
+        }
+
+        for policy in self.policies:
+            usage = report["policies"].setdefault(
+                policy.name, {"entries": 0, "bytes": 0, "delete": 0, "archive": 0}
+            )
+            for entry in self.scan(policy):
+                report["scanned"] += 1
+                try:
+                    size = _entry_bytes(entry)
+                    age_hours = (now - entry.stat(follow_symlinks=False).st_mtime) / 3600
+                except OSError:
+                    continue  # supprimé entre-temps
+                usage["entries"] += 1
+                usage["bytes"] += size
+
+                owner = policy.owner_of(entry.name, entry.path, references)
+                if owner is None or owner not in owners:
+                    if age_hours < self.orphan_grace_hours:
+                        continue
+                    action, reason = "delete", "orphelin"
+                    report["orphans"]["count"] += 1
+                    report["orphans"]["bytes"] += size
+                elif policy.applies(owners[owner], age_hours):
+                    action, reason = policy.action, f"{owners[owner]}, {age_hours / 24:.1f} j"
+                    if action == "archive" and not self.archive_dir:
+                        continue
+                else:
+                    continue
+
+                item = {
+                    "policy": policy.name, "path": entry.path, "owner": owner,
+                    "action": action, "reason": reason, "bytes": size,
+                }
+                if not dry_run:
+                    try:
+                        if action == "archive":
+                            item["target"] = self._archive(policy, entry)
+                        else:
+                            self._delete(entry)
+                    except OSError as e:
+                        report["errors"].append(f"{entry.path} : {e}")
+                        continue
+                usage[action] += 1
+                report["archived_bytes" if action == "archive" else "freed_bytes"] += size
+                report["actions"].append(item)
+
+        report["duration_ms"] = int((time.monotonic() - started) * 1000)
+        if not dry_run:
+            self.runs += 1
+            self.freed_bytes += report["freed_bytes"]
+            self.archived_bytes += report["archived_bytes"]
+            self.last_run = int(now)
+            logger.info(
+                f"Rétention : {len(report['actions'])} action(s), "
+                f"{report['freed_bytes'] / 1024 / 1024:.0f} Mo libérés, "
+                f"{report['archived_bytes'] / 1024 / 1024:.0f} Mo archivés "
+                f"({report['orphans']['count']} orphelin(s), {report['duration_ms']} ms)"
+            )
+        return report
+
+    def purge(self, owner: str, references: dict | None = None) -> int:
+        """Supprime tout ce qui appartient à un propriétaire (archives comprises) ; retourne les octets libérés."""
+        references = references or {}
+        freed = 0
+        roots = [(p, p.root) for p in self.policies]
+        if self.archive_dir:
+            roots += [(p, os.path.join(self.archive_dir, p.name)) for p in self.policies if p.action == "archive"]
+        for policy, root in roots:
+            try:
+                entries = list(os.scandir(root))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                name = entry.name[:-3] if root != policy.root and entry.name.endswith(".gz") else entry.name
+                if not policy.pattern.fullmatch(name):
+                    continue
+                if policy.owner_of(name, entry.path, references) != owner:
+                    continue
+                try:
+                    size = _entry_bytes(entry)
+                    self._delete(entry)
+                    freed += size
+                except OSError as e:
+                    logger.warning(f"Suppression impossible {entry.path} : {e}")
+        self.freed_bytes += freed
+        return freed
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "freed_mb": self.freed_bytes // (1024 * 1024),
+            "archived_mb": self.archived_bytes // (1024 * 1024),
+        }
@@ -0,0 +1,118 @@
+import os
+import asyncio
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Version du redimensionnement : à incrémenter si _prescale change (invalide le cache)
+PRESCALE_VERSION = 1
+
+
+def _prescale(src: str, root: str, width: int, height: int) -> str:
+    """
+    Exécuté dans le pool de processus : hash du contenu source, puis
+    décodage + redimensionnement (cover + crop centré) uniquement si absent du cache.
+    """
+    from PIL import Image, ImageOps
+
+    digest = hashlib.sha256(f"v{PRESCALE_VERSION}:{width}x{height}:".encode())
+    with open(src, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    key = digest.hexdigest()
+    dest = os.path.join(root, key[:2], f"{key}.png")
+
+    if os.path.exists(dest):
+        os.utime(dest)
+        return dest
+
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img = ImageOps.fit(img, (width, height), Image.LANCZOS)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                # PNG peu compressé : décodage rapide, aucune perte avant l'encodage vidéo
+                img.save(out, format="PNG", compress_level=1)
+            os.replace(tmp, dest)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+    return dest
+
+
+class StillCache:
+    """
+    Images fixes pré-redimensionnées à la résolution de travail d'un rendu Ken Burns.
+
+    Le décodage + redimensionnement (Pillow, LANCZOS) est fait une seule fois, dans
+    un pool de processus, puis stocké par hash de contenu (source + résolution) :
+    le filtre FFmpeg par frame n'a plus qu'à recadrer. Éviction LRU (mtime)
+    au-delà de max_bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int, workers: int = 2):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.workers = max(workers, 1)
+        self.prescaled = 0
+        self._pool = None
+        self._puts_since_evict = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def prescale(self, src: str, width: int, height: int) -> str:
+        """Chemin d'une copie de `src` exactement en width x height (cover + crop centré)."""
+        loop = asyncio.get_running_loop()
+        path = await loop.run_in_executor(self._executor(), _prescale, src, self.root, width, height)
+        self.prescaled += 1
+        self._puts_since_evict += 1
+        if self._puts_since_evict >= 20:
+            self._puts_since_evict = 0
+            await loop.run_in_executor(None, self._evict)
+        return path
+
+    def _evict(self) -> None:
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= target:
+                break
+        logger.info(f"Cache images : éviction jusqu'à {total / 1024 / 1024:.0f} Mo")
+
+    def stats(self) -> dict:
+        return {"prescaled": self.prescaled, "workers": self.workers, "max_mb": self.max_bytes // (1024 * 1024)}
+
+
+def ken_burns_loop_filter(fps: int) -> str:
+    """Répète en mémoire une image décodée une seule fois (au lieu de -loop 1 qui la redécode par frame)."""
+    return f"loop=loop=-1:size=1,setpts=N/{fps}/TB"
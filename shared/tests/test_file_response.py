@@ -0,0 +1,78 @@
+import os
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from shared.file_response import file_etag, parse_range, ranged_file_response
+
+
+@pytest.mark.parametrize("header, size, expected", [
+    ("bytes=0-99", 1000, (0, 99)),
+    ("bytes=100-", 1000, (100, 999)),
+    ("bytes=900-5000", 1000, (900, 999)),
+    ("bytes=-100", 1000, (900, 999)),
+    ("bytes=-5000", 1000, (0, 999)),
+    ("bytes=0-0", 1, (0, 0)),
+    (" bytes=0-9 ", 1000, (0, 9)),
+])
+def test_valid_ranges(header, size, expected):
+    assert parse_range(header, size) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-9", "bytes=-", "items=0-9", "bytes=a-b", "0-9"])
+def test_unsupported_ranges_are_ignored(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),
+    ("bytes=2000-3000", 1000),
+    ("bytes=10-5", 1000),
+    ("bytes=-0", 1000),
+    ("bytes=0-", 0),
+    ("bytes=-100", 0),
+])
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
+
+
+@pytest.fixture
+def client(tmp_path):
+    files = {"video": tmp_path / "video.mp4", "empty": tmp_path / "empty.mp4"}
+    files["video"].write_bytes(bytes(range(256)) * 4)
+    files["empty"].write_bytes(b"")
+
+    async def endpoint(request):
+        return ranged_file_response(request, str(files[request.path_params["name"]]), "video/mp4")
+
+    app = Starlette(routes=[Route("/{name}", endpoint, methods=["GET", "HEAD"])])
+    return TestClient(app), files
+
+
+def test_partial_content(client):
+    http, files = client
+    response = http.get("/video", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+    assert response.content == files["video"].read_bytes()[10:20]
+
+
+def test_empty_file_suffix_range_is_416(client):
+    http, _ = client
+    response = http.get("/empty", headers={"Range": "bytes=-500"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */0"
+
+
+def test_conditional_requests(client):
+    http, files = client
+    etag = file_etag(os.stat(files["video"]))
+    assert http.get("/video", headers={"If-None-Match": etag}).status_code == 304
+
+    # If-Range périmé : fichier complet au lieu de la plage
+    response = http.get("/video", headers={"Range": "bytes=0-9", "If-Range": '"ancien"'})
+    assert response.status_code == 200
+    assert len(response.content) == 1024
@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from shared.kie import client
+from shared.kie.client import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge simulée : asyncio.sleep avance le temps sans attendre."""
+    state = {"now": 1000.0, "sleeps": []}
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        state["sleeps"].append(delay)
+        state["now"] += delay
+        await real_sleep(0)
+
+    monkeypatch.setattr(client, "time", SimpleNamespace(monotonic=lambda: state["now"]))
+    monkeypatch.setattr(client, "asyncio", SimpleNamespace(sleep=fake_sleep, Lock=asyncio.Lock))
+    return state
+
+
+def test_burst_is_served_without_waiting(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+
+    async def main():
+        for _ in range(3):
+            await bucket.acquire()
+
+    asyncio.run(main())
+    assert clock["sleeps"] == []
+    assert bucket.waited == 0
+
+
+def test_steady_state_follows_rate(clock):
+    bucket = TokenBucket(rate=2, burst=1)
+    start = clock["now"]
+
+    async def main():
+        for _ in range(5):
+            await bucket.acquire()
+
+    asyncio.run(main())
+    # 1 jeton immédiat, puis un toutes les 0,5 s
+    assert clock["now"] - start == pytest.approx(2.0)
+    assert bucket.waited == pytest.approx(2.0)
+
+
+def test_tokens_refill_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+
+    async def main():
+        await bucket.acquire()
+        await bucket.acquire()
+        clock["now"] += 60  # longue pause : pas plus de `burst` jetons accumulés
+        for _ in range(3):
+            await bucket.acquire()
+
+    asyncio.run(main())
+    assert clock["sleeps"] == [pytest.approx(1.0)]
+
+
+def test_concurrent_acquires_are_serialized(clock):
+    bucket = TokenBucket(rate=10, burst=1)
+    start = clock["now"]
+
+    async def main():
+        await asyncio.gather(*[bucket.acquire() for _ in range(4)])
+
+    asyncio.run(main())
+    assert clock["now"] - start == pytest.approx(0.3)
+
+
+def test_burst_below_one_still_allows_requests():
+    assert TokenBucket(rate=1, burst=0).capacity == 1
+
+
+def test_one_bucket_per_api_key(monkeypatch):
+    monkeypatch.setattr(client, "_buckets", {})
+    first = client._bucket_for("key-a", 5, 10)
+    assert client._bucket_for("key-a", 1, 1) is first
+    assert client._bucket_for("key-b", 5, 10) is not first
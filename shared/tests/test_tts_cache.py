@@ -0,0 +1,73 @@
+import os
+
+from shared.tts_cache import TTSCache, write_atomic
+
+
+def make_cache(tmp_path, max_bytes=10 * 1024 * 1024):
+    return TTSCache(str(tmp_path / "cache"), max_bytes)
+
+
+def test_make_key_depends_on_every_input():
+    base = TTSCache.make_key("Bonjour", "voice", "model", {"stability": 0.5})
+    assert base == TTSCache.make_key("Bonjour", "voice", "model", {"stability": 0.5})
+    assert base != TTSCache.make_key("Bonsoir", "voice", "model", {"stability": 0.5})
+    assert base != TTSCache.make_key("Bonjour", "other", "model", {"stability": 0.5})
+    assert base != TTSCache.make_key("Bonjour", "voice", "other", {"stability": 0.5})
+    assert base != TTSCache.make_key("Bonjour", "voice", "model", {"stability": 0.6})
+
+
+def test_materialize_miss_then_hit(tmp_path):
+    cache = make_cache(tmp_path)
+    dest = str(tmp_path / "out" / "scene_1.mp3")
+
+    assert cache.materialize("a" * 64, dest) is False
+    cache.store("a" * 64, b"voix A", dest)
+    os.remove(dest)
+    assert cache.materialize("a" * 64, dest) is True
+
+    with open(dest, "rb") as f:
+        assert f.read() == b"voix A"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_miss_on_materialized_dest_keeps_old_entry(tmp_path):
+    """Une narration modifiée réécrit dest sans toucher l'entrée liée auparavant."""
+    cache = make_cache(tmp_path)
+    old_key, new_key = "a" * 64, "b" * 64
+    dest = str(tmp_path / "out" / "scene_1.mp3")
+    cache.put(old_key, b"ancienne narration")
+
+    assert cache.materialize(old_key, dest) is True
+    assert cache.materialize(new_key, dest) is False
+    cache.store(new_key, b"nouvelle narration", dest)
+
+    with open(dest, "rb") as f:
+        assert f.read() == b"nouvelle narration"
+    with open(cache.path_for(old_key), "rb") as f:
+        assert f.read() == b"ancienne narration"
+
+
+def test_write_atomic_replaces_a_linked_dest(tmp_path):
+    cache = make_cache(tmp_path)
+    dest = str(tmp_path / "out" / "voiceover.mp3")
+    cache.put("a" * 64, b"voix A")
+    cache.materialize("a" * 64, dest)
+
+    write_atomic(dest, b"voix B")
+
+    with open(cache.path_for("a" * 64), "rb") as f:
+        assert f.read() == b"voix A"
+
+
+def test_eviction_keeps_recent_entries(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=250)
+    for i, key in enumerate(("a" * 64, "b" * 64, "c" * 64)):
+        path = cache.put(key, b"x" * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+
+    cache.put("d" * 64, b"x" * 100)
+
+    assert cache.get("a" * 64) is None
+    assert cache.get("d" * 64) is not None
+    assert cache.stats()["size_bytes"] <= 250
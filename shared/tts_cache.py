@@ -0,0 +1,190 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """
+    Écrit `path` via un fichier temporaire + os.replace : le fichier existant n'est
+    jamais tronqué en place (il peut être un hardlink vers une entrée du cache).
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _place(source: str, dest: str) -> None:
+    """Lie (hardlink, sinon copie) `source` à `dest` en remplaçant atomiquement `dest`."""
+    directory = os.path.dirname(dest) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{os.path.basename(dest)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        try:
+            os.link(source, tmp_path)
+        except FileExistsError:
+            os.remove(tmp_path)
+            os.link(source, tmp_path)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class TTSCache:
+    """
+    Cache disque des narrations TTS, adressé par contenu.
+
+    Clé = sha256(texte, voice_id, model_id, voice_settings) : une narration déjà
+    synthétisée n'est jamais redemandée à ElevenLabs. Écritures atomiques
+    (fichier temporaire + os.replace), éviction LRU (mtime) au-delà de max_bytes.
+    Les compteurs hits/misses sont propres au processus.
+    """
+
+    def __init__(self, root: str, max_bytes: int, extension: str = "mp3"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None  # calculé paresseusement au premier put()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text: str, voice_id: str, model_id: str, voice_settings: dict | None = None) -> str:
+        payload = json.dumps(
+            {
+                "text": text,
+                "voice_id": voice_id,
+                "model_id": model_id,
+                "voice_settings": voice_settings or {},
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{self.extension}")
+
+    def get(self, key: str) -> str | None:
+        """Chemin de l'entrée si présente (et la marque comme récemment utilisée)."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def materialize(self, key: str, dest: str) -> bool:
+        """Place l'entrée en cache à `dest` (hardlink, sinon copie). False si absente."""
+        path = self.get(key)
+        if path is None:
+            return False
+        try:
+            _place(path, dest)
+        except FileNotFoundError:
+            # Entrée évincée entre-temps par un autre processus
+            self.hits -= 1
+            self.misses += 1
+            return False
+        return True
+
+    def store(self, key: str, data: bytes, dest: str) -> str:
+        """
+        Met en cache une narration fraîchement synthétisée et la place à `dest`.
+        `dest` est remplacé (jamais réécrit en place) : s'il s'agissait d'un lien
+        vers une autre entrée, celle-ci reste intacte.
+        """
+        path = self.put(key, data)
+        try:
+            _place(path, dest)
+        except FileNotFoundError:
+            write_atomic(dest, data)  # évincée aussitôt par un autre processus
+        return dest
+
+    def put(self, key: str, data: bytes) -> str:
+        path = self.path_for(key)
+        write_atomic(path, data)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _entries(self) -> list:
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(f".{self.extension}"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        """Supprime les entrées les moins récemment utilisées jusqu'à 90% de max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._size = total
+        self.evictions += removed
+        if removed:
+            logger.info(f"Cache TTS : {removed} entrée(s) évincée(s), {total / 1024 / 1024:.1f} MB restants")